@@ -0,0 +1,70 @@
+import hashlib
+from math import ceil
+
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+from .versions import get_version_timestamp, get_versions, relations_version
+
+
+def build_validators(request, version_names, modified=None):
+    """ETag и время изменения (timestamp) по версиям ресурсов.
+
+    В ETag входят адрес запроса и пользователь, так как от них зависит
+    представление; версия связей пользователя учитывается всегда.
+    """
+    version_names = list(version_names)
+    if request.user.is_authenticated:
+        version_names.append(relations_version(request.user.pk))
+    versions = get_versions(*version_names)
+    timestamps = [get_version_timestamp(version) for version in versions]
+    if modified is not None:
+        timestamps.append(modified.timestamp())
+    etag = hashlib.md5('|'.join((
+        request.build_absolute_uri(),
+        str(request.user.pk),
+        str(modified),
+        *versions,
+    )).encode()).hexdigest()
+    return etag, ceil(max(timestamps)) if timestamps else None
+
+
+class ConditionalGetMixin:
+    """Ответ 304 Not Modified на условные запросы list и retrieve.
+
+    Валидаторы строятся из версий ресурсов, поэтому для их проверки
+    не выполняются ни основной запрос к базе, ни сериализация.
+    """
+
+    version_names = ()
+
+    def get_validators(self, request, *args, **kwargs):
+        return build_validators(request, self.version_names)
+
+    def conditional_response(self, handler, request, *args, **kwargs):
+        validators = self.get_validators(request, *args, **kwargs)
+        if validators is None:
+            return handler(request, *args, **kwargs)
+        etag, last_modified = validators
+        etag = quote_etag(etag)
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
+        if response is None:
+            response = handler(request, *args, **kwargs)
+        if response.status_code in (200, 304):
+            response['ETag'] = etag
+            if last_modified is not None:
+                response['Last-Modified'] = http_date(last_modified)
+            patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(
+            super().list, request, *args, **kwargs
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_response(
+            super().retrieve, request, *args, **kwargs
+        )
@@ -3,3 +3,21 @@ MAX_NAME_FIELD_LENGTH = 150
 MAX_PASSWORD_LENGTH = 128
 MAX_CONFIRMATION_CODE_LENGTH = 8
 DEFAULT_COUNTER_NUMBER = 0
+SHOPPING_LIST_FETCH_SIZE = 2000
+SHOPPING_LIST_CHUNK_SIZE = 8192
+SHOPPING_LIST_CSV_HEADER = ('name', 'measurement_unit', 'amount')
+VERSION_CACHE_PREFIX = 'version'
+RECIPE_FRAGMENT_CACHE_PREFIX = 'recipe'
+RECIPE_IMAGE_SIZES = ((300, 300), (600, 600))
+AVATAR_IMAGE_SIZES = ((64, 64), (128, 128))
+IMAGE_DERIVATIVE_FORMATS = {'webp': 'WEBP', 'jpeg': 'JPEG'}
+IMAGE_DERIVATIVE_QUALITY = 80
+IMAGE_DERIVATIVES_DIR = 'derivatives'
+IMAGE_DERIVATIVE_WORKERS = 2
+MAX_IMAGE_PIXELS = 40_000_000
+MAX_IMAGE_SIDE = 10_000
+ALLOWED_IMAGE_FORMATS = ('JPEG', 'PNG', 'GIF', 'WEBP')
+MULTIPART_JSON_FIELD = 'data'
+MAX_BULK_RECIPES = 100
+MAX_BATCH_RECIPES = 100
+N_PLUS_ONE_THRESHOLD = 5
@@ -0,0 +1,137 @@
+from django.core.files.uploadedfile import UploadedFile
+from drf_extra_fields.fields import Base64ImageField
+from PIL import Image, UnidentifiedImageError
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+from rest_framework.relations import MANY_RELATION_KWARGS, ManyRelatedField
+
+from .constants import ALLOWED_IMAGE_FORMATS, MAX_IMAGE_PIXELS, MAX_IMAGE_SIDE
+from .images import get_srcset
+
+
+def validate_image_header(file):
+    """Проверка формата и размеров изображения по его заголовку.
+
+    Pillow при открытии читает только заголовок, поэтому огромное или
+    сжатое с расчётом на распаковку изображение отклоняется до того,
+    как его пиксели будут декодированы.
+    """
+    try:
+        with Image.open(file) as image:
+            image_format = image.format
+            width, height = image.size
+    except (OSError, UnidentifiedImageError, Image.DecompressionBombError):
+        raise ValidationError('Загрузите корректное изображение.')
+    finally:
+        file.seek(0)
+    if image_format not in ALLOWED_IMAGE_FORMATS:
+        raise ValidationError(
+            f'Допустимые форматы: {", ".join(ALLOWED_IMAGE_FORMATS)}.'
+        )
+    if (
+        max(width, height) > MAX_IMAGE_SIDE
+        or width * height > MAX_IMAGE_PIXELS
+    ):
+        raise ValidationError(
+            f'Изображение не должно быть больше {MAX_IMAGE_SIDE} пикселей '
+            f'по стороне и {MAX_IMAGE_PIXELS} пикселей всего.'
+        )
+
+
+def resolve_objects(queryset, pks):
+    """Объекты по списку ключей одним запросом IN с сохранением порядка.
+
+    Все отсутствующие ключи перечисляются в одной ошибке.
+    """
+    objects = queryset.in_bulk(set(pks))
+    missing = [pk for pk in dict.fromkeys(pks) if pk not in objects]
+    if missing:
+        raise ValidationError(
+            f'Не найдены объекты с id: {", ".join(map(str, missing))}.'
+        )
+    return [objects[pk] for pk in pks]
+
+
+class BulkManyRelatedField(ManyRelatedField):
+    """Список ссылок, объекты для которых загружаются одним запросом."""
+
+    def to_internal_value(self, data):
+        return resolve_objects(
+            self.child_relation.get_queryset(),
+            super().to_internal_value(data)
+        )
+
+
+class BulkPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """Первичный ключ, объект для которого загружается пакетно.
+
+    Поле проверяет только тип значения, а объекты ищет
+    BulkManyRelatedField или BulkRelatedListSerializer сразу для всех
+    переданных ключей.
+    """
+
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        return BulkManyRelatedField(
+            child_relation=cls(*args, **kwargs),
+            **{
+                key: value for key, value in kwargs.items()
+                if key in MANY_RELATION_KWARGS
+            }
+        )
+
+    def to_internal_value(self, data):
+        if isinstance(data, bool) or not isinstance(data, (int, str)):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        try:
+            return int(data)
+        except ValueError:
+            self.fail('incorrect_type', data_type=type(data).__name__)
+
+
+class BulkRelatedListSerializer(serializers.ListSerializer):
+    """Список вложенных объектов с пакетной загрузкой ссылок.
+
+    Значения всех полей BulkPrimaryKeyRelatedField дочернего
+    сериализатора заменяются объектами, по запросу на поле.
+    """
+
+    def to_internal_value(self, data):
+        items = super().to_internal_value(data)
+        for name, field in self.child.fields.items():
+            if not isinstance(field, BulkPrimaryKeyRelatedField):
+                continue
+            objects = resolve_objects(
+                field.get_queryset(), [item[name] for item in items]
+            )
+            for item, obj in zip(items, objects):
+                item[name] = obj
+        return items
+
+
+class HybridImageField(Base64ImageField):
+    """Изображение строкой base64 или файлом из multipart-запроса."""
+
+    def to_internal_value(self, data):
+        if isinstance(data, UploadedFile):
+            validate_image_header(data)
+            return serializers.ImageField.to_internal_value(self, data)
+        file = super().to_internal_value(data)
+        if file is not None:
+            validate_image_header(file)
+        return file
+
+
+class ImageSrcsetField(serializers.ReadOnlyField):
+    """Ссылки на производные изображения в виде карты srcset."""
+
+    def __init__(self, sizes, **kwargs):
+        self.sizes = sizes
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        return get_srcset(
+            value.name if value else None,
+            self.sizes,
+            self.context.get('request')
+        )
@@ -1,6 +1,18 @@
+from django import forms
+from django.db.models import Case, IntegerField, When
 from django_filters import rest_framework as filters
 
-from recipes.models import Ingredient, Recipe, Tag
+from recipes.models import Favorite, Ingredient, Recipe, ShoppingCart, Tag
+from recipes.pantry import pantry_index
+from recipes.search import search_recipes
+
+
+class IntegerFilter(filters.NumberFilter):
+    field_class = forms.IntegerField
+
+
+class IntegerInFilter(filters.BaseInFilter, IntegerFilter):
+    pass
 
 
 class RecipeFilter(filters.FilterSet):
@@ -10,6 +22,7 @@ class RecipeFilter(filters.FilterSet):
         field_name='tags__slug',
         to_field_name='slug',
         queryset=Tag.objects.all(),
+        method='filter_tags',
     )
     is_favorited = filters.BooleanFilter(
         method='filter_is_favorited',
@@ -17,21 +30,76 @@ class RecipeFilter(filters.FilterSet):
     is_in_shopping_cart = filters.BooleanFilter(
         method='filter_is_in_shopping_cart',
     )
+    search = filters.CharFilter(
+        method='filter_search',
+    )
+    pantry = IntegerInFilter(
+        method='filter_pantry',
+    )
+    missing = IntegerFilter(
+        method='filter_missing',
+        min_value=0,
+    )
 
     class Meta:
         model = Recipe
-        fields = ('author', 'tags', 'is_favorited', 'is_in_shopping_cart',)
+        fields = (
+            'author', 'tags', 'is_favorited', 'is_in_shopping_cart', 'search',
+            'pantry', 'missing',
+        )
 
-    def filter_is_favorited(self, queryset, name, value):
-        user = self.request.user
-        if value and user.is_authenticated:
-            return queryset.filter(favorites__user=user)
+    def filter_tags(self, queryset, name, value):
+        """Рецепты с любым из тегов через подзапрос IN без JOIN и DISTINCT."""
+        if not value:
+            return queryset
+        return queryset.filter(pk__in=Recipe.tags.through.objects.filter(
+            tag__in=value
+        ).values('recipe_id'))
+
+    def filter_user_recipes(self, queryset, model, value):
+        """Рецепты из списка пользователя через подзапрос IN.
+
+        Список пользователя читается по индексу, а рецепты ищутся по
+        первичному ключу; с коррелированным EXISTS база обходит все
+        рецепты, проверяя каждый.
+        """
+        if value and self.request.user.is_authenticated:
+            return queryset.filter(pk__in=model.objects.filter(
+                user=self.request.user
+            ).values('recipe_id'))
         return queryset
 
+    def filter_is_favorited(self, queryset, name, value):
+        return self.filter_user_recipes(queryset, Favorite, value)
+
     def filter_is_in_shopping_cart(self, queryset, name, value):
-        user = self.request.user
-        if value and user.is_authenticated:
-            return queryset.filter(shopping_carts__user=user)
+        return self.filter_user_recipes(queryset, ShoppingCart, value)
+
+    def filter_search(self, queryset, name, value):
+        if value.strip():
+            return search_recipes(queryset, value)
+        return queryset
+
+    def filter_pantry(self, queryset, name, value):
+        """Рецепты, которые можно приготовить из указанных ингредиентов.
+
+        Параметр missing задаёт, сколько ингредиентов может не хватать.
+        Рецепты упорядочены по доле имеющихся ингредиентов.
+        """
+        if not value:
+            return queryset
+        recipe_ids = pantry_index.match(
+            value, self.form.cleaned_data.get('missing') or 0
+        )
+        return queryset.filter(pk__in=recipe_ids).order_by(Case(
+            *(
+                When(pk=pk, then=position)
+                for position, pk in enumerate(recipe_ids)
+            ),
+            output_field=IntegerField()
+        )) if recipe_ids else queryset.none()
+
+    def filter_missing(self, queryset, name, value):
         return queryset
 
 
@@ -0,0 +1,85 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Prefetch, prefetch_related_objects
+
+from .constants import RECIPE_FRAGMENT_CACHE_PREFIX
+from .services import get_relationship_snapshot
+from .versions import INGREDIENTS, TAGS, get_versions, user_version
+from recipes.models import IngredientInRecipe, Tag
+
+
+def get_fragment_keys(recipes, request):
+    """Ключи кеша представлений рецептов.
+
+    Ключ включает время изменения рецепта и версии автора, тегов и
+    ингредиентов, поэтому любое из этих изменений делает фрагмент
+    недействительным без явного удаления.
+    """
+    author_ids = sorted({recipe.author_id for recipe in recipes})
+    versions = get_versions(
+        TAGS, INGREDIENTS, *(user_version(pk) for pk in author_ids)
+    )
+    common, author_versions = versions[:2], dict(zip(author_ids, versions[2:]))
+    host = request.build_absolute_uri('/') if request else ''
+    return {
+        recipe.pk: '{}:{}:{}'.format(
+            RECIPE_FRAGMENT_CACHE_PREFIX,
+            recipe.pk,
+            hashlib.md5('|'.join((
+                host,
+                recipe.modified.isoformat(),
+                author_versions[recipe.author_id],
+                *common,
+            )).encode()).hexdigest()
+        )
+        for recipe in recipes
+    }
+
+
+def render_recipes(recipes, serializer):
+    """Представления рецептов из кеша фрагментов с данными пользователя.
+
+    Кешируется не зависящая от пользователя часть представления; отметки
+    избранного, корзины и подписки на автора накладываются при каждом
+    ответе из снимка связей текущего пользователя.
+    """
+    request = serializer.context.get('request')
+    keys = get_fragment_keys(recipes, request)
+    fragments = cache.get_many(keys.values())
+    missing = [
+        recipe for recipe in recipes if keys[recipe.pk] not in fragments
+    ]
+    if missing:
+        prefetch_related_objects(
+            missing,
+            'author',
+            Prefetch('tags', queryset=Tag.objects.all()),
+            Prefetch(
+                'ingredient_in',
+                queryset=IngredientInRecipe.objects.select_related(
+                    'ingredients'
+                )
+            )
+        )
+        rendered = {
+            keys[recipe.pk]: serializer.to_fragment(recipe)
+            for recipe in missing
+        }
+        cache.set_many(rendered, settings.RECIPE_FRAGMENT_CACHE_TIMEOUT)
+        fragments.update(rendered)
+    snapshot = get_relationship_snapshot(request)
+    data = []
+    for recipe in recipes:
+        fragment = dict(fragments[keys[recipe.pk]])
+        fragment['author'] = dict(
+            fragment['author'],
+            is_subscribed=recipe.author_id in snapshot.subscribed_author_ids
+        )
+        fragment['is_favorited'] = recipe.pk in snapshot.favorite_recipe_ids
+        fragment['is_in_shopping_cart'] = (
+            recipe.pk in snapshot.cart_recipe_ids
+        )
+        data.append(fragment)
+    return data
@@ -0,0 +1,140 @@
+import logging
+import posixpath
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from .constants import (
+    IMAGE_DERIVATIVE_FORMATS, IMAGE_DERIVATIVE_QUALITY,
+    IMAGE_DERIVATIVE_WORKERS, IMAGE_DERIVATIVES_DIR
+)
+from .versions import set_versions
+
+logger = logging.getLogger(__name__)
+
+derivative_executor = ThreadPoolExecutor(
+    max_workers=IMAGE_DERIVATIVE_WORKERS,
+    thread_name_prefix='image-derivatives'
+)
+
+
+def get_derivative_name(name, size, image_format):
+    """Путь производного изображения в хранилище.
+
+    Путь однозначно выводится из имени исходного файла, поэтому
+    сериализаторам не нужно хранить список производных в базе.
+    """
+    stem = posixpath.splitext(name)[0]
+    width, height = size
+    return (
+        f'{IMAGE_DERIVATIVES_DIR}/{stem}_{width}x{height}.{image_format}'
+    )
+
+
+@lru_cache(maxsize=None)
+def get_derivative_formats():
+    """Форматы производных, которые умеет записывать установленный Pillow."""
+    Image.init()
+    return tuple(
+        image_format
+        for image_format, pil_format in IMAGE_DERIVATIVE_FORMATS.items()
+        if pil_format in Image.SAVE
+    )
+
+
+def has_derivatives(name, sizes):
+    return all(
+        default_storage.exists(get_derivative_name(name, sizes[-1], fmt))
+        for fmt in get_derivative_formats()
+    )
+
+
+def schedule_derivatives(file, sizes, version_names=()):
+    """Фоновое создание производных после фиксации транзакции.
+
+    Изображения обрабатываются в пуле потоков, поэтому ответ на запрос
+    не ждёт Pillow. После создания файлов меняются версии version_names,
+    чтобы закешированные представления получили ссылки srcset.
+    """
+    if not file or has_derivatives(file.name, sizes):
+        return
+    name = file.name
+    transaction.on_commit(lambda: derivative_executor.submit(
+        _generate_in_background, name, sizes, version_names
+    ))
+
+
+def _generate_in_background(name, sizes, version_names):
+    try:
+        if generate_derivatives(name, sizes) and version_names:
+            set_versions(*version_names)
+    except Exception:
+        logger.exception('Не удалось создать производные для %s', name)
+
+
+def _render(image, size, image_format):
+    thumbnail = ImageOps.fit(image, size, Image.LANCZOS)
+    if image_format == 'jpeg' or thumbnail.mode not in ('RGB', 'RGBA'):
+        thumbnail = thumbnail.convert(
+            'RGBA' if image_format == 'webp' and 'A' in thumbnail.mode
+            else 'RGB'
+        )
+    buffer = BytesIO()
+    thumbnail.save(
+        buffer,
+        IMAGE_DERIVATIVE_FORMATS[image_format],
+        quality=IMAGE_DERIVATIVE_QUALITY
+    )
+    return buffer.getvalue()
+
+
+def generate_derivatives(name, sizes):
+    """Миниатюры фиксированных размеров в форматах WebP и JPEG.
+
+    Возвращает количество созданных файлов; ошибки чтения исходного
+    изображения записываются в журнал и не прерывают обработку.
+    """
+    try:
+        with default_storage.open(name) as file:
+            image = ImageOps.exif_transpose(Image.open(file))
+            image.load()
+    except (OSError, UnidentifiedImageError, Image.DecompressionBombError):
+        logger.warning('Не удалось открыть изображение %s', name)
+        return 0
+    created = 0
+    for size in sizes:
+        for image_format in get_derivative_formats():
+            derivative = get_derivative_name(name, size, image_format)
+            if default_storage.exists(derivative):
+                default_storage.delete(derivative)
+            default_storage.save(
+                derivative, ContentFile(_render(image, size, image_format))
+            )
+            created += 1
+    return created
+
+
+def get_srcset(name, sizes, request=None):
+    """Ссылки на производные изображения по форматам и ширине.
+
+    Если производные ещё не созданы или их создание не удалось,
+    возвращается None, и клиент показывает исходное изображение.
+    """
+    if not name or not has_derivatives(name, sizes):
+        return None
+    srcset = {}
+    for image_format in get_derivative_formats():
+        srcset[image_format] = {}
+        for size in sizes:
+            url = default_storage.url(
+                get_derivative_name(name, size, image_format)
+            )
+            srcset[image_format][f'{size[0]}w'] = (
+                request.build_absolute_uri(url) if request else url
+            )
+    return srcset
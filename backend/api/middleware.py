@@ -0,0 +1,123 @@
+import logging
+import os
+import random
+import sys
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from rest_framework.serializers import BaseSerializer
+
+from .constants import N_PLUS_ONE_THRESHOLD
+
+logger = logging.getLogger(__name__)
+
+
+def describe_origin():
+    """Место в коде проекта и сериализаторы, из которых выполнен запрос."""
+    project_dir = str(settings.BASE_DIR)
+    location, serializers = None, []
+    frame = sys._getframe(1)
+    while frame is not None:
+        path = frame.f_code.co_filename
+        if (
+            location is None
+            and path.startswith(project_dir)
+            and path != __file__
+            and 'site-packages' not in path
+        ):
+            location = (
+                f'{os.path.relpath(path, project_dir)}:{frame.f_lineno} '
+                f'({frame.f_code.co_name})'
+            )
+        owner = frame.f_locals.get('self')
+        if isinstance(owner, BaseSerializer):
+            name = type(owner).__name__
+            if name not in serializers:
+                serializers.append(name)
+        frame = frame.f_back
+    return location, serializers
+
+
+def get_view_name(request):
+    match = request.resolver_match
+    if match is None:
+        return request.path
+    view_class = getattr(match.func, 'cls', None)
+    if view_class is None:
+        return f'{match.func.__module__}.{match.func.__name__}'
+    action = getattr(match.func, 'actions', {}).get(request.method.lower())
+    return f'{view_class.__name__}.{action}' if action else view_class.__name__
+
+
+class QueryRecorder:
+    """Обёртка выполнения SQL: число запросов, время и повторы.
+
+    Повтором считается запрос с тем же текстом SQL (параметры
+    передаются отдельно). Стек вызовов разбирается только один раз,
+    когда число повторов достигает N_PLUS_ONE_THRESHOLD.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.shapes = Counter()
+        self.repeated = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+            self.count += 1
+            self.shapes[sql] += 1
+            if self.shapes[sql] == N_PLUS_ONE_THRESHOLD:
+                self.repeated[sql] = describe_origin()
+
+
+class QueryInstrumentationMiddleware:
+    """Учёт SQL-запросов для доли SQL_INSTRUMENTATION_SAMPLE_RATE запросов.
+
+    В ответ добавляется заголовок Server-Timing с числом и временем
+    SQL-запросов, а повторяющиеся запросы (N+1) записываются в журнал
+    вместе с представлением и сериализаторами, из которых они
+    выполнены. Запросы при отдаче потокового ответа не учитываются.
+    При нулевой доле промежуточный слой отключается.
+    """
+
+    def __init__(self, get_response):
+        self.sample_rate = settings.SQL_INSTRUMENTATION_SAMPLE_RATE
+        if self.sample_rate <= 0:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if random.random() >= self.sample_rate:
+            return self.get_response(request)
+        recorder = QueryRecorder()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            response = self.get_response(request)
+        timing = (
+            f'db;desc="{recorder.count} SQL";'
+            f'dur={recorder.duration * 1000:.1f}, '
+            f'app;dur={(time.perf_counter() - started) * 1000:.1f}'
+        )
+        if response.has_header('Server-Timing'):
+            timing = f'{response["Server-Timing"]}, {timing}'
+        response['Server-Timing'] = timing
+        for sql, (location, serializers) in recorder.repeated.items():
+            logger.warning(
+                'N+1 в %s %s (%s): %d одинаковых запросов из %s, '
+                'сериализаторы: %s. SQL: %s',
+                request.method, request.path, get_view_name(request),
+                recorder.shapes[sql], location,
+                ', '.join(serializers) or '-', sql
+            )
+        return response
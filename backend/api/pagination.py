@@ -1,4 +1,16 @@
-from rest_framework.pagination import PageNumberPagination
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import (
+    BasePagination, PageNumberPagination, _positive_int
+)
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from recipes.feed import FEED_ORDERING
 
 
 class RecipeLimitPagination(PageNumberPagination):
@@ -6,3 +18,178 @@ class RecipeLimitPagination(PageNumberPagination):
 
     page_size = 6
     page_size_query_param = 'limit'
+
+
+class KeysetPagination(BasePagination):
+    """Курсорная пагинация по набору полей без подсчёта количества.
+
+    Курсор хранит значения полей сортировки последнего (или первого)
+    объекта страницы, поэтому следующая страница выбирается условием
+    по индексу, а не через OFFSET.
+    """
+
+    page_size = RecipeLimitPagination.page_size
+    page_size_query_param = RecipeLimitPagination.page_size_query_param
+    max_page_size = None
+    cursor_query_param = 'cursor'
+    mode_query_param = 'pagination'
+    mode = 'cursor'
+    ordering = None
+    ordering_query_params = ()
+    invalid_cursor_message = 'Неверный курсор.'
+    ordering_conflict_message = (
+        'Курсорная пагинация недоступна вместе с параметром {param}: '
+        'он задаёт собственный порядок выдачи.'
+    )
+
+    @classmethod
+    def is_requested(cls, request):
+        return (
+            cls.cursor_query_param in request.query_params
+            or request.query_params.get(cls.mode_query_param) == cls.mode
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.check_ordering_params(request)
+        self.page_size = self.get_page_size(request)
+        position, self.reverse = self.decode_cursor(request, queryset.model)
+        ordering = [
+            (field.lstrip('-'), field.startswith('-') != self.reverse)
+            for field in self.ordering
+        ]
+        queryset = queryset.order_by(*(
+            f'-{field}' if descending else field
+            for field, descending in ordering
+        ))
+        if position is not None:
+            queryset = queryset.filter(
+                self.get_position_filter(ordering, position)
+            )
+        self.page = list(queryset[:self.page_size + 1])
+        has_more = len(self.page) > self.page_size
+        del self.page[self.page_size:]
+        if self.reverse:
+            self.page.reverse()
+            self.has_next, self.has_previous = position is not None, has_more
+        else:
+            self.has_next, self.has_previous = has_more, position is not None
+        return self.page
+
+    def check_ordering_params(self, request):
+        """Запрет параметров, меняющих порядок выдачи.
+
+        Курсор хранит позицию в порядке self.ordering; фильтры, которые
+        сортируют выдачу иначе (например, по релевантности), сделали бы
+        страницы непоследовательными, поэтому такие запросы отклоняются.
+        """
+        for param in self.ordering_query_params:
+            if request.query_params.get(param, '').strip():
+                raise ValidationError({
+                    param: [self.ordering_conflict_message.format(param=param)]
+                })
+
+    def get_page_size(self, request):
+        try:
+            return _positive_int(
+                request.query_params[self.page_size_query_param],
+                strict=True,
+                cutoff=self.max_page_size
+            )
+        except (KeyError, ValueError):
+            return self.page_size
+
+    @staticmethod
+    def get_position_filter(ordering, position):
+        position_filter = Q()
+        equal = {}
+        for (field, descending), value in zip(ordering, position):
+            lookup = 'lt' if descending else 'gt'
+            position_filter |= Q(**equal, **{f'{field}__{lookup}': value})
+            equal[field] = value
+        return position_filter
+
+    def decode_cursor(self, request, model):
+        cursor = request.query_params.get(self.cursor_query_param)
+        if not cursor:
+            return None, False
+        try:
+            data = json.loads(urlsafe_b64decode(cursor.encode()))
+            position = [
+                model._meta.get_field(field.lstrip('-')).to_python(value)
+                for field, value in zip(self.ordering, data['position'])
+            ]
+            if len(position) != len(self.ordering):
+                raise ValueError
+            return position, bool(data['reverse'])
+        except (KeyError, TypeError, ValueError, DjangoValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, instance, reverse):
+        position = [
+            getattr(instance, field.lstrip('-')) for field in self.ordering
+        ]
+        cursor = urlsafe_b64encode(json.dumps(
+            {'position': position, 'reverse': reverse},
+            default=str
+        ).encode()).decode()
+        return replace_query_param(
+            self.request.build_absolute_uri(),
+            self.cursor_query_param,
+            cursor
+        )
+
+    def get_next_link(self):
+        if not (self.has_next and self.page):
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(
+                self.request.build_absolute_uri(), self.cursor_query_param
+            )
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+
+class RecipeKeysetPagination(KeysetPagination):
+    """Курсорная пагинация ленты рецептов."""
+
+    ordering = ('-pub_date', '-id')
+    ordering_query_params = ('search', 'pantry')
+
+
+class FeedKeysetPagination(KeysetPagination):
+    """Курсорная пагинация ленты подписок по записям FeedEntry."""
+
+    ordering = FEED_ORDERING
+
+
+class UserKeysetPagination(KeysetPagination):
+    """Курсорная пагинация списков пользователей."""
+
+    ordering = ('username', 'id')
+
+
+class KeysetPaginationMixin:
+    """Включение курсорной пагинации по параметру запроса."""
+
+    keyset_pagination_class = None
+
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator') and (
+            self.keyset_pagination_class is not None
+            and self.keyset_pagination_class.is_requested(self.request)
+        ):
+            self._paginator = self.keyset_pagination_class()
+        return super().paginator
@@ -0,0 +1,41 @@
+import json
+
+from django.utils.datastructures import MultiValueDict
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import DataAndFiles, MultiPartParser
+
+from .constants import MULTIPART_JSON_FIELD
+
+
+class UploadedFiles(MultiValueDict):
+    """Файлы запроса, которые при слиянии с dict дают файлы, а не списки.
+
+    dict.update копирует внутренние списки MultiValueDict напрямую, пока
+    в классе не переопределён __iter__.
+    """
+
+    def __iter__(self):
+        return super().__iter__()
+
+
+class MultiPartJSONParser(MultiPartParser):
+    """Multipart-запрос с вложенными полями в JSON-части.
+
+    Файлы записываются обработчиками загрузки Django на диск порциями,
+    а поля, которые нельзя передать формой (теги, ингредиенты), приходят
+    JSON-объектом в части data. Без этой части запрос разбирается как
+    обычная форма.
+    """
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        result = super().parse(stream, media_type, parser_context)
+        payload = result.data.get(MULTIPART_JSON_FIELD)
+        if payload is None:
+            return result
+        try:
+            data = json.loads(payload)
+        except ValueError as error:
+            raise ParseError(f'JSON parse error - {error}')
+        if not isinstance(data, dict):
+            raise ParseError('Часть data должна содержать объект JSON.')
+        return DataAndFiles(data, UploadedFiles(result.files.lists()))
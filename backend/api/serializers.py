@@ -1,22 +1,34 @@
 from django.db import transaction
+from django.db.models import Manager
 from djoser.serializers import UserSerializer as BaseUserSerializer
 from drf_extra_fields.fields import Base64ImageField
 from rest_framework import serializers
 from rest_framework.exceptions import ValidationError
 
-from .constants import DEFAULT_COUNTER_NUMBER
-from recipes.constants import MAX_AMOUNT_VALUE, MIN_AMOUNT_VALUE
-from recipes.models import (
-    Ingredient, IngredientInRecipe, Recipe, Tag,
-    ShoppingCart, Favorite
+from .constants import (
+    AVATAR_IMAGE_SIZES, DEFAULT_COUNTER_NUMBER, MAX_BULK_RECIPES,
+    RECIPE_IMAGE_SIZES
+)
+from .fields import (
+    BulkPrimaryKeyRelatedField, BulkRelatedListSerializer, HybridImageField,
+    ImageSrcsetField, resolve_objects
 )
+from .fragments import render_recipes
+from .services import (
+    get_recipes_limit, get_relationship_snapshot,
+    manual_shopping_list_updates, prefetch_latest_recipes,
+    update_recipe_in_shopping_lists
+)
+from recipes.constants import MAX_AMOUNT_VALUE, MIN_AMOUNT_VALUE
+from recipes.models import Ingredient, IngredientInRecipe, Recipe, Tag
+from recipes.pantry import publish_ingredient_changes
 from users.models import Subscriptions, User
 
 
 class SetAvatarSerializer(serializers.ModelSerializer):
     """Сериализатор для добавления аватара пользователя."""
 
-    avatar = Base64ImageField(
+    avatar = HybridImageField(
         max_length=None,
         use_url=True,
         required=True,
@@ -34,31 +46,32 @@ class UserSerializer(BaseUserSerializer, SetAvatarSerializer):
     """Сериализатор для запросов к данным пользователя."""
 
     is_subscribed = serializers.SerializerMethodField()
+    avatar_srcset = ImageSrcsetField(AVATAR_IMAGE_SIZES, source='avatar')
 
     class Meta(BaseUserSerializer.Meta):
         model = User
-        fields = BaseUserSerializer.Meta.fields + ('is_subscribed', 'avatar')
+        fields = BaseUserSerializer.Meta.fields + (
+            'is_subscribed', 'avatar', 'avatar_srcset'
+        )
 
     def get_is_subscribed(self, obj):
-        request = self.context.get('request')
-        return (
-            request and request.user.is_authenticated and (
-                request.user.user_subscriptions.filter(
-                    author=obj.id
-                ).exists()
-            )
-        )
+        return obj.id in get_relationship_snapshot(
+            self.context.get('request')
+        ).subscribed_author_ids
 
 
 class RecipeMinifiedSerializer(serializers.ModelSerializer):
     """Укороченный сериализатор для рецептов"""
 
+    image_srcset = ImageSrcsetField(RECIPE_IMAGE_SIZES, source='image')
+
     class Meta:
         model = Recipe
         fields = (
             'id',
             'name',
             'image',
+            'image_srcset',
             'cooking_time',
         )
 
@@ -76,18 +89,9 @@ class UserSubscriptionsSerializer(UserSerializer):
         fields = UserSerializer.Meta.fields + ('recipes_count', 'recipes')
 
     def get_recipes(self, obj):
-        request = self.context.get('request')
-        limit = request.query_params.get('recipes_limit') if request else None
-        queryset = obj.recipes.all()
-        if limit:
-            try:
-                limit_int = int(limit)
-                if limit_int > 0:
-                    queryset = queryset[:limit_int]
-            except (ValueError, TypeError):
-                pass
+        limit = get_recipes_limit(self.context.get('request'))
         return RecipeMinifiedSerializer(
-            queryset,
+            obj.recipes.all()[:limit],
             many=True,
             context=self.context
         ).data
@@ -110,6 +114,10 @@ class SubscriptionSerializer(serializers.ModelSerializer):
         return data
 
     def to_representation(self, instance):
+        prefetch_latest_recipes(
+            (instance.author,),
+            get_recipes_limit(self.context.get('request'))
+        )
         return UserSubscriptionsSerializer(
             instance.author,
             context=self.context
@@ -155,7 +163,7 @@ class IngredientInRecipeSerializer(serializers.ModelSerializer):
 class IngredientAddToRecipeSerializer(serializers.ModelSerializer):
     """Сериализатор для добавления ингридиентов в рецепт."""
 
-    id = serializers.PrimaryKeyRelatedField(queryset=Ingredient.objects.all())
+    id = BulkPrimaryKeyRelatedField(queryset=Ingredient.objects.all())
     amount = serializers.IntegerField(
         min_value=MIN_AMOUNT_VALUE,
         max_value=MAX_AMOUNT_VALUE,
@@ -171,6 +179,15 @@ class IngredientAddToRecipeSerializer(serializers.ModelSerializer):
             'id',
             'amount',
         )
+        list_serializer_class = BulkRelatedListSerializer
+
+
+class RecipesReadListSerializer(serializers.ListSerializer):
+    """Сериализатор списка рецептов с кешем фрагментов."""
+
+    def to_representation(self, data):
+        recipes = data.all() if isinstance(data, Manager) else data
+        return render_recipes(list(recipes), self.child)
 
 
 class RecipesReadSerializer(serializers.ModelSerializer):
@@ -183,15 +200,10 @@ class RecipesReadSerializer(serializers.ModelSerializer):
         source='ingredient_in',
         read_only=True
     )
-    is_favorited = serializers.BooleanField(
-        read_only=True,
-        default=False
-    )
-    is_in_shopping_cart = serializers.BooleanField(
-        read_only=True,
-        default=False
-    )
+    is_favorited = serializers.SerializerMethodField()
+    is_in_shopping_cart = serializers.SerializerMethodField()
     image = Base64ImageField(max_length=None, use_url=True)
+    image_srcset = ImageSrcsetField(RECIPE_IMAGE_SIZES, source='image')
 
     class Meta:
         model = Recipe
@@ -200,6 +212,7 @@ class RecipesReadSerializer(serializers.ModelSerializer):
             'author',
             'name',
             'image',
+            'image_srcset',
             'text',
             'cooking_time',
             'tags',
@@ -207,12 +220,30 @@ class RecipesReadSerializer(serializers.ModelSerializer):
             'is_favorited',
             'is_in_shopping_cart',
         )
+        list_serializer_class = RecipesReadListSerializer
+
+    def to_representation(self, instance):
+        return render_recipes((instance,), self)[0]
+
+    def to_fragment(self, instance):
+        """Представление рецепта без учёта кеша."""
+        return super().to_representation(instance)
+
+    def get_is_favorited(self, obj):
+        return obj.id in get_relationship_snapshot(
+            self.context.get('request')
+        ).favorite_recipe_ids
+
+    def get_is_in_shopping_cart(self, obj):
+        return obj.id in get_relationship_snapshot(
+            self.context.get('request')
+        ).cart_recipe_ids
 
 
 class RecipesWriteSerializer(serializers.ModelSerializer):
     """Сериализатор для произведений для POST и PATCH."""
 
-    tags = serializers.PrimaryKeyRelatedField(
+    tags = BulkPrimaryKeyRelatedField(
         many=True,
         queryset=Tag.objects.all(),
         required=True,
@@ -224,7 +255,7 @@ class RecipesWriteSerializer(serializers.ModelSerializer):
         allow_empty=False
     )
     author = UserSerializer(read_only=True,)
-    image = Base64ImageField(max_length=None, use_url=True)
+    image = HybridImageField(max_length=None, use_url=True)
     cooking_time = serializers.IntegerField(
         min_value=MIN_AMOUNT_VALUE,
         max_value=MAX_AMOUNT_VALUE,
@@ -282,21 +313,96 @@ class RecipesWriteSerializer(serializers.ModelSerializer):
         )
         recipe.tags.set(tags)
         self.create_ingredients(recipe, ingredients)
+        publish_ingredient_changes((
+            (recipe.id, (), [item['id'].id for item in ingredients]),
+        ))
         return recipe
 
     @transaction.atomic
     def update(self, instance, validated_data):
+        """Изменение рецепта с записью только отличающихся данных.
+
+        Теги и ингредиенты сравниваются с сохранёнными, в базу уходят
+        лишь нужные вставки, изменения количеств и удаления. Рецепт
+        сохраняется с update_fields только из изменённых полей и
+        modified; если ничего не изменилось, он не сохраняется, поэтому
+        сигналы не сбрасывают версии и не пересоздают изображения.
+        Присланное изображение всегда считается новым: файл с тем же
+        именем может отличаться содержимым.
+        """
         tags = validated_data.pop('tags', None)
         ingredients = validated_data.pop('ingredients', None)
-        if tags:
-            instance.tags.clear()
-            instance.tags.set(tags)
-        if ingredients:
-            instance.ingredient_in.all().delete()
-            self.create_ingredients(instance, ingredients)
-        instance = super().update(instance, validated_data)
+        changed_parts = {
+            field for field, value in validated_data.items()
+            if field == 'image' or getattr(instance, field) != value
+        }
+        if tags and self.update_tags(instance, tags):
+            changed_parts.add('tags')
+        if ingredients and self.update_ingredients(instance, ingredients):
+            changed_parts.add('ingredients')
+        if changed_parts:
+            for field in changed_parts.intersection(validated_data):
+                setattr(instance, field, validated_data[field])
+            instance.save(update_fields=(
+                *changed_parts.intersection(validated_data), 'modified'
+            ))
         return instance
 
+    @staticmethod
+    def update_tags(recipe, tags):
+        old_ids = set(recipe.tags.values_list('id', flat=True))
+        new_ids = {tag.id for tag in tags}
+        if old_ids == new_ids:
+            return False
+        recipe.tags.remove(*old_ids.difference(new_ids))
+        recipe.tags.add(*new_ids.difference(old_ids))
+        return True
+
+    @staticmethod
+    def update_ingredients(recipe, ingredients):
+        rows = {
+            ingredient_id: (pk, amount) for pk, ingredient_id, amount
+            in recipe.ingredient_in.values_list(
+                'id', 'ingredients_id', 'amount'
+            )
+        }
+        old_amounts = {
+            ingredient_id: amount for ingredient_id, (_, amount)
+            in rows.items()
+        }
+        new_amounts = {
+            item['id'].id: item['amount'] for item in ingredients
+        }
+        if old_amounts == new_amounts:
+            return False
+        with manual_shopping_list_updates():
+            IngredientInRecipe.objects.filter(pk__in=[
+                rows[ingredient_id][0]
+                for ingredient_id in old_amounts.keys() - new_amounts.keys()
+            ]).delete()
+        IngredientInRecipe.objects.bulk_update(
+            [
+                IngredientInRecipe(pk=rows[ingredient_id][0], amount=amount)
+                for ingredient_id, amount in new_amounts.items()
+                if ingredient_id in old_amounts
+                and old_amounts[ingredient_id] != amount
+            ],
+            ('amount',)
+        )
+        IngredientInRecipe.objects.bulk_create(
+            IngredientInRecipe(
+                recipe=recipe, ingredients_id=ingredient_id, amount=amount
+            )
+            for ingredient_id, amount in new_amounts.items()
+            if ingredient_id not in old_amounts
+        )
+        update_recipe_in_shopping_lists(recipe, old_amounts, new_amounts)
+        if old_amounts.keys() != new_amounts.keys():
+            publish_ingredient_changes(
+                ((recipe.id, old_amounts, new_amounts),)
+            )
+        return True
+
     @staticmethod
     def create_ingredients(recipe, ingredients):
         IngredientInRecipe.objects.bulk_create(
@@ -311,39 +417,18 @@ class RecipesWriteSerializer(serializers.ModelSerializer):
         return RecipesReadSerializer(instance, context=self.context).data
 
 
-class BaseFavoriteShoppingSerializer(serializers.ModelSerializer):
-    """Базовый сериализатор для действий с рецептами."""
+class RecipeIdsSerializer(serializers.Serializer):
+    """Список рецептов для пакетных действий с избранным и корзиной."""
 
-    class Meta:
-        fields = ('user', 'recipe')
+    recipes = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=MAX_BULK_RECIPES,
+    )
 
-    def validate(self, data):
-        user = data['user']
-        recipe = data['recipe']
-        model = self.Meta.model
-        if model.objects.filter(user=user, recipe=recipe).exists():
-            model_name = model._meta.verbose_name.lower()
-            raise serializers.ValidationError(
-                f'Рецепт уже добавлен в {model_name}.'
+    def validate_recipes(self, recipe_ids):
+        return [
+            recipe.id for recipe in resolve_objects(
+                Recipe.objects.only('id'), recipe_ids
             )
-        return data
-
-    def to_representation(self, instance):
-        return RecipeMinifiedSerializer(
-            instance.recipe,
-            context=self.context
-        ).data
-
-
-class FavoriteSerializer(BaseFavoriteShoppingSerializer):
-    """Сериализатор для добавления в избранное."""
-
-    class Meta(BaseFavoriteShoppingSerializer.Meta):
-        model = Favorite
-
-
-class ShoppingCartSerializer(BaseFavoriteShoppingSerializer):
-    """Сериализатор для добавления в корзину."""
-
-    class Meta(BaseFavoriteShoppingSerializer.Meta):
-        model = ShoppingCart
+        ]
@@ -1,10 +1,413 @@
-def generate_shopping_list_text(ingredients):
-    if not ingredients:
-        return 'Ваш список покупок пуст.'
-    lines = ['Ваш список покупок:', '']
-    for i, item in enumerate(ingredients, 1):
-        lines.append(
-            f'{i}. {item["name"]} ({item["unit"]}) — {item["total_amount"]}'
-        )
-    lines.append('\nПриятного аппетита!')
-    return '\n'.join(lines)
+import csv
+import json
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from itertools import chain
+
+from django.db import connection, transaction
+from django.db.models import (
+    Count, F, Prefetch, Window, prefetch_related_objects
+)
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import RowNumber
+from django.utils.functional import cached_property
+
+from .constants import SHOPPING_LIST_CHUNK_SIZE, SHOPPING_LIST_CSV_HEADER
+from .versions import bump_versions, relations_version
+from recipes.models import (
+    Favorite, IngredientInRecipe, Recipe, ShoppingCart, ShoppingList,
+    ShoppingListItem
+)
+from recipes.services import rebuild_shopping_lists
+from users.models import Subscriptions
+
+
+class RelationshipSnapshot:
+    """Связи пользователя с авторами и рецептами в рамках одного запроса.
+
+    Каждый набор идентификаторов загружается одним запросом при первом
+    обращении, после чего проверки принадлежности не обращаются к базе.
+    """
+
+    def __init__(self, user):
+        self.user = user
+
+    def _get_ids(self, model, field):
+        if not (self.user and self.user.is_authenticated):
+            return frozenset()
+        return frozenset(
+            model.objects.filter(user=self.user).order_by().values_list(
+                field, flat=True
+            )
+        )
+
+    @cached_property
+    def subscribed_author_ids(self):
+        return self._get_ids(Subscriptions, 'author_id')
+
+    @cached_property
+    def favorite_recipe_ids(self):
+        return self._get_ids(Favorite, 'recipe_id')
+
+    @cached_property
+    def cart_recipe_ids(self):
+        return self._get_ids(ShoppingCart, 'recipe_id')
+
+
+def get_relationship_snapshot(request):
+    """Снимок связей текущего пользователя, общий для всего запроса."""
+    if request is None:
+        return RelationshipSnapshot(None)
+    snapshot = getattr(request, '_relationship_snapshot', None)
+    if snapshot is None:
+        snapshot = RelationshipSnapshot(request.user)
+        request._relationship_snapshot = snapshot
+    return snapshot
+
+
+class _EchoBuffer:
+    """Псевдофайл, возвращающий записанную строку вместо её хранения."""
+
+    def write(self, value):
+        return value
+
+
+def iter_shopping_list_text(ingredients):
+    ingredients = iter(ingredients)
+    first = next(ingredients, None)
+    if first is None:
+        yield 'Ваш список покупок пуст.'
+        return
+    yield 'Ваш список покупок:\n\n'
+    for i, item in enumerate(chain((first,), ingredients), 1):
+        yield (
+            f'{i}. {item["name"]} ({item["unit"]}) — {item["total_amount"]}\n'
+        )
+    yield '\nПриятного аппетита!'
+
+
+def iter_shopping_list_csv(ingredients):
+    writer = csv.writer(_EchoBuffer())
+    yield writer.writerow(SHOPPING_LIST_CSV_HEADER)
+    for item in ingredients:
+        yield writer.writerow(
+            (item['name'], item['unit'], item['total_amount'])
+        )
+
+
+def iter_shopping_list_ndjson(ingredients):
+    for item in ingredients:
+        yield json.dumps(
+            dict(zip(
+                SHOPPING_LIST_CSV_HEADER,
+                (item['name'], item['unit'], item['total_amount'])
+            )),
+            ensure_ascii=False
+        ) + '\n'
+
+
+SHOPPING_LIST_EXPORTERS = {
+    'txt': iter_shopping_list_text,
+    'csv': iter_shopping_list_csv,
+    'ndjson': iter_shopping_list_ndjson,
+}
+
+
+def stream_shopping_list(ingredients, export_format):
+    """Потоковая выгрузка списка покупок порциями байтов.
+
+    Строки собираются в порции фиксированного размера, так что в памяти
+    одновременно находится не больше одной порции.
+    """
+    chunk, size = [], 0
+    for line in SHOPPING_LIST_EXPORTERS[export_format](ingredients):
+        chunk.append(line)
+        size += len(line)
+        if size >= SHOPPING_LIST_CHUNK_SIZE:
+            yield ''.join(chunk).encode('utf-8')
+            chunk, size = [], 0
+    if chunk:
+        yield ''.join(chunk).encode('utf-8')
+
+
+def get_recipes_ingredients(recipe_ids):
+    """Суммарное количество ингредиентов в рецептах."""
+    amounts = Counter()
+    for ingredient_id, amount in IngredientInRecipe.objects.filter(
+        recipe_id__in=recipe_ids
+    ).values_list('ingredients_id', 'amount'):
+        amounts[ingredient_id] += amount
+    return amounts
+
+
+def get_ingredients_delta(old, new):
+    """Разница между двумя наборами количеств ингредиентов."""
+    delta = Counter(new)
+    delta.subtract(old)
+    return {
+        ingredient_id: amount
+        for ingredient_id, amount in delta.items() if amount
+    }
+
+
+def update_shopping_lists(user_ids, delta):
+    """Применение изменения количеств ингредиентов к спискам покупок.
+
+    Вызывается внутри транзакции: списки блокируются на время обновления,
+    чтобы параллельные изменения корзины не теряли друг друга.
+    """
+    delta = {
+        ingredient_id: amount
+        for ingredient_id, amount in delta.items() if amount
+    }
+    user_ids = set(user_ids)
+    if not delta or not user_ids:
+        return
+    ShoppingList.objects.bulk_create(
+        [ShoppingList(user_id=user_id) for user_id in user_ids],
+        ignore_conflicts=True
+    )
+    shopping_lists = ShoppingList.objects.select_for_update().filter(
+        user_id__in=user_ids
+    ).order_by('pk')
+    list_ids = [shopping_list.pk for shopping_list in shopping_lists]
+    ShoppingList.objects.filter(pk__in=list_ids).update(
+        version=F('version') + 1
+    )
+    items = {
+        (item.shopping_list_id, item.ingredient_id): item
+        for item in ShoppingListItem.objects.select_for_update().filter(
+            shopping_list_id__in=list_ids,
+            ingredient_id__in=delta,
+        )
+    }
+    to_create, to_update, to_delete = [], [], []
+    for list_id in list_ids:
+        for ingredient_id, amount in delta.items():
+            item = items.get((list_id, ingredient_id))
+            if item is None:
+                if amount > 0:
+                    to_create.append(ShoppingListItem(
+                        shopping_list_id=list_id,
+                        ingredient_id=ingredient_id,
+                        amount=amount,
+                    ))
+                continue
+            item.amount += amount
+            if item.amount > 0:
+                to_update.append(item)
+            else:
+                to_delete.append(item.pk)
+    ShoppingListItem.objects.bulk_create(to_create)
+    ShoppingListItem.objects.bulk_update(to_update, ('amount',))
+    ShoppingListItem.objects.filter(pk__in=to_delete).delete()
+
+
+def update_recipe_in_shopping_lists(recipe, old_ingredients, new_ingredients):
+    """Пересчёт списков покупок после изменения ингредиентов рецепта."""
+    delta = get_ingredients_delta(old_ingredients, new_ingredients)
+    if not delta:
+        return
+    update_shopping_lists(
+        ShoppingCart.objects.filter(recipe=recipe).values_list(
+            'user_id', flat=True
+        ),
+        delta
+    )
+
+
+_shopping_lists_state = threading.local()
+
+
+@contextmanager
+def manual_shopping_list_updates():
+    """Блок кода, который сам применяет изменения к спискам покупок.
+
+    Внутри блока сигналы корзины и ингредиентов рецептов не планируют
+    пересборку списков, чтобы изменения не учитывались дважды.
+    """
+    _shopping_lists_state.manual = (
+        getattr(_shopping_lists_state, 'manual', 0) + 1
+    )
+    try:
+        yield
+    finally:
+        _shopping_lists_state.manual -= 1
+
+
+def schedule_shopping_lists_rebuild(user_ids=(), recipe_ids=()):
+    """Пересборка списков покупок после фиксации транзакции.
+
+    Нужна для изменений корзин и ингредиентов рецептов в обход API:
+    в админке и при каскадном удалении пользователей, рецептов и
+    ингредиентов. Затронутые пользователи и рецепты копятся до фиксации,
+    и списки пересобираются один раз на транзакцию. После отката данные
+    остаются в очереди и дают лишь лишнюю пересборку при следующей
+    фиксации.
+    """
+    if getattr(_shopping_lists_state, 'manual', 0):
+        return
+    pending = getattr(_shopping_lists_state, 'pending', None)
+    if pending is None:
+        pending = _shopping_lists_state.pending = (set(), set())
+    pending[0].update(user_ids)
+    pending[1].update(recipe_ids)
+    transaction.on_commit(_rebuild_pending_shopping_lists)
+
+
+@transaction.atomic
+def _rebuild_pending_shopping_lists():
+    pending = getattr(_shopping_lists_state, 'pending', None)
+    if pending is None:
+        return
+    _shopping_lists_state.pending = None
+    user_ids, recipe_ids = pending
+    user_ids.update(ShoppingCart.objects.filter(
+        recipe_id__in=recipe_ids
+    ).values_list('user_id', flat=True))
+    if user_ids:
+        rebuild_shopping_lists(user_ids)
+
+
+def supports_returning():
+    """Поддерживает ли база INSERT/DELETE ... RETURNING."""
+    return connection.vendor == 'postgresql' or (
+        connection.vendor == 'sqlite'
+        and connection.Database.sqlite_version_info >= (3, 35)
+    )
+
+
+def add_user_recipes(model, user_id, recipe_ids):
+    """Добавление рецептов в избранное или корзину одним запросом.
+
+    Уже добавленные и несуществующие рецепты пропускаются без ошибки
+    уникальности, поэтому повторные запросы безопасны. Возвращает id
+    действительно добавленных рецептов.
+    """
+    recipe_ids = list(dict.fromkeys(recipe_ids))
+    if not recipe_ids:
+        return []
+    if not supports_returning():
+        added = list(Recipe.objects.filter(pk__in=recipe_ids).exclude(
+            pk__in=model.objects.filter(user_id=user_id).values('recipe_id')
+        ).values_list('id', flat=True))
+        model.objects.bulk_create(
+            [model(user_id=user_id, recipe_id=pk) for pk in added],
+            ignore_conflicts=True
+        )
+        return added
+    quote_name = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {quote_name(model._meta.db_table)} '
+            '(user_id, recipe_id) '
+            f'SELECT %s, id FROM {quote_name(Recipe._meta.db_table)} '
+            f'WHERE id IN ({", ".join(["%s"] * len(recipe_ids))}) '
+            'ON CONFLICT (user_id, recipe_id) DO NOTHING '
+            'RETURNING recipe_id',
+            (user_id, *recipe_ids)
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def remove_user_recipes(model, user_id, recipe_ids):
+    """Удаление рецептов из избранного или корзины одним запросом.
+
+    Возвращает id действительно удалённых рецептов.
+    """
+    recipe_ids = list(dict.fromkeys(recipe_ids))
+    if not recipe_ids:
+        return []
+    if not supports_returning():
+        relations = model.objects.filter(
+            user_id=user_id, recipe_id__in=recipe_ids
+        )
+        removed = list(relations.values_list('recipe_id', flat=True))
+        relations.delete()
+        return removed
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'DELETE FROM '
+            f'{connection.ops.quote_name(model._meta.db_table)} '
+            'WHERE user_id = %s AND recipe_id IN '
+            f'({", ".join(["%s"] * len(recipe_ids))}) RETURNING recipe_id',
+            (user_id, *recipe_ids)
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def change_user_recipes(model, user_id, recipe_ids, add=True):
+    """Добавление или удаление рецептов с обновлением зависимых данных.
+
+    Запросы выполняются в обход сигналов моделей, поэтому версия связей
+    пользователя и его сводный список покупок обновляются здесь.
+    """
+    with manual_shopping_list_updates():
+        changed = (add_user_recipes if add else remove_user_recipes)(
+            model, user_id, recipe_ids
+        )
+    if not changed:
+        return changed
+    bump_versions(relations_version(user_id))
+    if model is ShoppingCart:
+        sign = 1 if add else -1
+        update_shopping_lists(
+            (user_id,),
+            {
+                ingredient_id: sign * amount for ingredient_id, amount
+                in get_recipes_ingredients(changed).items()
+            }
+        )
+    return changed
+
+
+def get_recipes_limit(request):
+    """Значение параметра recipes_limit, если оно задано корректно."""
+    if request is None:
+        return None
+    try:
+        limit = int(request.query_params.get('recipes_limit'))
+    except (TypeError, ValueError):
+        return None
+    return limit if limit > 0 else None
+
+
+def get_latest_recipes(author_ids, limit=None):
+    """Последние рецепты авторов, не больше limit на каждого автора.
+
+    Отбор выполняется в базе через ROW_NUMBER() с разбиением по автору,
+    поэтому лишние рецепты плодовитых авторов не загружаются.
+    """
+    recipes = Recipe.objects.filter(author_id__in=author_ids)
+    if limit:
+        ranked = recipes.annotate(
+            recipe_rank=Window(
+                expression=RowNumber(),
+                partition_by=F('author_id'),
+                order_by=(F('pub_date').desc(), F('id').desc()),
+            )
+        ).order_by().values('id', 'recipe_rank')
+        sql, params = ranked.query.sql_with_params()
+        recipes = Recipe.objects.filter(pk__in=RawSQL(
+            f'SELECT id FROM ({sql}) ranked_recipes WHERE recipe_rank <= %s',
+            (*params, limit)
+        ))
+    return recipes.order_by('-pub_date', '-id')
+
+
+def prefetch_latest_recipes(authors, limit=None):
+    """Подгрузка последних рецептов и количества рецептов авторов."""
+    author_ids = [author.id for author in authors]
+    prefetch_related_objects(
+        authors,
+        Prefetch('recipes', queryset=get_latest_recipes(author_ids, limit))
+    )
+    recipes_count = dict(
+        Recipe.objects.filter(author_id__in=author_ids).order_by().values(
+            'author_id'
+        ).annotate(total=Count('id')).values_list('author_id', 'total')
+    )
+    for author in authors:
+        author.recipes_count = recipes_count.get(author.id, 0)
+    return authors
@@ -0,0 +1,83 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .constants import AVATAR_IMAGE_SIZES, RECIPE_IMAGE_SIZES
+from .images import schedule_derivatives
+from .services import schedule_shopping_lists_rebuild
+from .versions import (
+    INGREDIENTS, RECIPES, TAGS, USERS, bump_versions, relations_version,
+    user_version
+)
+from recipes.models import (
+    Favorite, Ingredient, IngredientInRecipe, Recipe, ShoppingCart, Tag
+)
+from users.models import Subscriptions, User
+
+
+@receiver((post_save, post_delete), sender=Tag)
+def bump_tags_version(sender, **kwargs):
+    bump_versions(TAGS)
+
+
+@receiver((post_save, post_delete), sender=Ingredient)
+def bump_ingredients_version(sender, **kwargs):
+    bump_versions(INGREDIENTS)
+
+
+@receiver((post_save, post_delete), sender=Recipe)
+def bump_recipes_version(sender, **kwargs):
+    bump_versions(RECIPES)
+
+
+@receiver((post_save, post_delete), sender=User)
+def bump_user_version(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and set(update_fields) == {'last_login'}:
+        return
+    bump_versions(USERS, user_version(instance.pk))
+
+
+@receiver((post_save, post_delete), sender=Favorite)
+@receiver((post_save, post_delete), sender=ShoppingCart)
+@receiver((post_save, post_delete), sender=Subscriptions)
+def bump_relations_version(sender, instance, **kwargs):
+    bump_versions(relations_version(instance.user_id))
+
+
+@receiver(pre_save, sender=ShoppingCart)
+def rebuild_previous_shopping_list(sender, instance, **kwargs):
+    if instance.pk is not None:
+        schedule_shopping_lists_rebuild(user_ids=sender.objects.filter(
+            pk=instance.pk
+        ).values_list('user_id', flat=True))
+
+
+@receiver((post_save, post_delete), sender=ShoppingCart)
+def rebuild_shopping_list(sender, instance, **kwargs):
+    schedule_shopping_lists_rebuild(user_ids=(instance.user_id,))
+
+
+@receiver((post_save, post_delete), sender=IngredientInRecipe)
+def rebuild_recipe_shopping_lists(sender, instance, **kwargs):
+    schedule_shopping_lists_rebuild(recipe_ids=(instance.recipe_id,))
+
+
+@receiver(post_save, sender=Recipe)
+def create_recipe_image_derivatives(sender, instance, update_fields=None,
+                                    **kwargs):
+    if update_fields is None or 'image' in update_fields:
+        schedule_derivatives(
+            instance.image,
+            RECIPE_IMAGE_SIZES,
+            (RECIPES, user_version(instance.author_id))
+        )
+
+
+@receiver(post_save, sender=User)
+def create_avatar_derivatives(sender, instance, update_fields=None,
+                              **kwargs):
+    if update_fields is None or 'avatar' in update_fields:
+        schedule_derivatives(
+            instance.avatar,
+            AVATAR_IMAGE_SIZES,
+            (USERS, user_version(instance.pk))
+        )
@@ -0,0 +1,62 @@
+import time
+import uuid
+
+from django.core.cache import cache
+from django.db import transaction
+
+from .constants import VERSION_CACHE_PREFIX
+
+TAGS = 'tags'
+INGREDIENTS = 'ingredients'
+RECIPES = 'recipes'
+USERS = 'users'
+
+
+def user_version(user_id):
+    return f'user:{user_id}'
+
+
+def relations_version(user_id):
+    return f'relations:{user_id}'
+
+
+def _make_token():
+    return f'{time.time_ns():x}-{uuid.uuid4().hex[:8]}'
+
+
+def _cache_key(name):
+    return f'{VERSION_CACHE_PREFIX}:{name}'
+
+
+def get_versions(*names):
+    """Текущие версии ресурсов.
+
+    Версия — метка времени изменения с добавкой случайной части. Если
+    версия отсутствует в кеше, она создаётся заново с текущим временем,
+    поэтому потеря кеша приводит лишь к повторной загрузке данных. Если
+    созданная версия вытеснена из кеша до повторного чтения, используется
+    она же.
+    """
+    keys = [_cache_key(name) for name in names]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            token = _make_token()
+            cache.add(key, token, None)
+            versions[key] = cache.get(key) or token
+    return [versions[key] for key in keys]
+
+
+def get_version_timestamp(version):
+    """Время изменения ресурса в секундах."""
+    return int(version.split('-', 1)[0], 16) / 10 ** 9
+
+
+def set_versions(*names):
+    """Немедленная смена версий ресурсов."""
+    cache.set_many({_cache_key(name): _make_token() for name in names}, None)
+
+
+def bump_versions(*names):
+    """Смена версий ресурсов после фиксации текущей транзакции."""
+    transaction.on_commit(lambda: set_versions(*names))
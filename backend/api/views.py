@@ -1,37 +1,70 @@
-from io import BytesIO
-
-from django.db.models import Count, Exists, F, OuterRef, Prefetch, Sum
-from django.http import FileResponse
+from django.db import transaction
+from django.db.models import F
+from django.http import Http404, StreamingHttpResponse
 from django.urls import reverse
+from django.utils.cache import get_conditional_response
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser import views as djoser_views
 from rest_framework import permissions, status, viewsets
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
+from rest_framework.settings import api_settings
 
+from .conditional import ConditionalGetMixin, build_validators
+from .constants import MAX_BATCH_RECIPES, SHOPPING_LIST_FETCH_SIZE
 from .filters import IngredientFilter, RecipeFilter
-from .pagination import RecipeLimitPagination
+from .pagination import (
+    FeedKeysetPagination, KeysetPaginationMixin, RecipeKeysetPagination,
+    RecipeLimitPagination, UserKeysetPagination
+)
 from .permissions import AdminOrModeratorAuthorOrReadOnly
+from .renderers import (
+    ShoppingListCSVRenderer, ShoppingListNDJSONRenderer,
+    ShoppingListTextRenderer
+)
 from .serializers import (
-    FavoriteSerializer, IngredientSerializer, RecipeMinifiedSerializer,
+    IngredientSerializer, RecipeIdsSerializer, RecipeMinifiedSerializer,
     RecipesReadSerializer, RecipesWriteSerializer, SetAvatarSerializer,
-    ShoppingCartSerializer, SubscriptionSerializer, TagSerializer,
-    UserSerializer, UserSubscriptionsSerializer
+    SubscriptionSerializer, TagSerializer, UserSerializer,
+    UserSubscriptionsSerializer
+)
+from .services import (
+    change_user_recipes, get_recipes_ingredients, get_recipes_limit,
+    get_relationship_snapshot, manual_shopping_list_updates,
+    prefetch_latest_recipes, stream_shopping_list, update_shopping_lists
+)
+from .versions import INGREDIENTS, RECIPES, TAGS, USERS, user_version
+from recipes.constants import (
+    DEFAULT_SHOPPING_LIST_VERSION, SIMILAR_RECIPES_LIMIT,
+    SIMILAR_RECIPES_MAX_LIMIT
 )
-from .services import generate_shopping_list_text
+from recipes.feed import get_feed
+from recipes.ingredient_index import ingredient_index
 from recipes.models import (
-    Favorite, Ingredient, IngredientInRecipe, Recipe, ShoppingCart, Tag
+    Favorite, Ingredient, Recipe, ShoppingCart, ShoppingList,
+    ShoppingListItem, Tag
 )
+from recipes.similarity import similarity_index
 from users.models import Subscriptions, User
 
 
-class UserViewSet(djoser_views.UserViewSet):
+class UserViewSet(
+    ConditionalGetMixin, KeysetPaginationMixin, djoser_views.UserViewSet
+):
     """Вьюсет данных пользователей."""
 
     queryset = User.objects.all()
     serializer_class = UserSerializer
     pagination_class = RecipeLimitPagination
+    keyset_pagination_class = UserKeysetPagination
+    version_names = (USERS,)
+
+    def get_validators(self, request, *args, **kwargs):
+        if self.action == 'retrieve':
+            return build_validators(request, (user_version(kwargs['id']),))
+        return super().get_validators(request, *args, **kwargs)
 
     @action(
         ('get',),
@@ -82,13 +115,11 @@ class UserViewSet(djoser_views.UserViewSet):
     def subscriptions(self, request):
         authors = User.objects.filter(
             subscriptions_to_author__user=request.user
-        ).prefetch_related(
-            Prefetch(
-                'recipes',
-                queryset=Recipe.objects.order_by('-pub_date'),
-            )
-        ).annotate(recipes_count=Count('recipes'))
-        page = self.paginate_queryset(authors)
+        )
+        page = prefetch_latest_recipes(
+            self.paginate_queryset(authors),
+            get_recipes_limit(request)
+        )
         serializer = UserSubscriptionsSerializer(
             page,
             many=True,
@@ -96,6 +127,28 @@ class UserViewSet(djoser_views.UserViewSet):
         )
         return self.get_paginated_response(serializer.data)
 
+    @action(
+        detail=False,
+        permission_classes=(IsAuthenticated,)
+    )
+    def feed(self, request):
+        feed = get_feed(
+            request.user,
+            get_relationship_snapshot(request).subscribed_author_ids
+        )
+        paginator = (
+            FeedKeysetPagination()
+            if FeedKeysetPagination.is_requested(request)
+            else RecipeLimitPagination()
+        )
+        page = paginator.paginate_queryset(feed, request, view=self)
+        serializer = RecipesReadSerializer(
+            [entry.recipe for entry in page],
+            many=True,
+            context=self.get_serializer_context()
+        )
+        return paginator.get_paginated_response(serializer.data)
+
     @action(
         detail=False,
         methods=('put',),
@@ -128,15 +181,16 @@ class UserViewSet(djoser_views.UserViewSet):
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
-class TagViewSet(viewsets.ReadOnlyModelViewSet):
+class TagViewSet(ConditionalGetMixin, viewsets.ReadOnlyModelViewSet):
     """Вьюсет тэгов."""
 
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     permission_classes = (AdminOrModeratorAuthorOrReadOnly,)
+    version_names = (TAGS,)
 
 
-class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
+class IngredientViewSet(ConditionalGetMixin, viewsets.ReadOnlyModelViewSet):
     """Вьюсет ингредиентов."""
 
     queryset = Ingredient.objects.all()
@@ -144,9 +198,23 @@ class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
     permission_classes = (AdminOrModeratorAuthorOrReadOnly,)
     filter_backends = (DjangoFilterBackend,)
     filterset_class = IngredientFilter
+    version_names = (INGREDIENTS,)
+
+    def list(self, request, *args, **kwargs):
+        if 'name' not in request.query_params:
+            return super().list(request, *args, **kwargs)
+        name = request.query_params['name'].strip()
+        if not name:
+            return Response([])
+        return self.conditional_response(
+            lambda request: Response(ingredient_index.search(name)),
+            request
+        )
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(
+    ConditionalGetMixin, KeysetPaginationMixin, viewsets.ModelViewSet
+):
     """Вьюсет рецептов."""
 
     permission_classes = (
@@ -154,78 +222,105 @@ class RecipeViewSet(viewsets.ModelViewSet):
     )
     http_method_names = ('get', 'post', 'patch', 'delete')
     pagination_class = RecipeLimitPagination
+    keyset_pagination_class = RecipeKeysetPagination
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilter
+    queryset = Recipe.objects.all()
+    version_names = (RECIPES, TAGS, INGREDIENTS, USERS)
 
-    def get_queryset(self):
-        queryset = Recipe.objects.prefetch_related(
-            Prefetch('tags', queryset=Tag.objects.all()),
-            Prefetch(
-                'ingredient_in',
-                queryset=IngredientInRecipe.objects.select_related(
-                    'ingredients'
-                )
-            )
-        ).select_related('author')
-        user = self.request.user
-        if user.is_authenticated:
-            queryset = queryset.annotate(
-                is_favorited=Exists(
-                    Favorite.objects.filter(
-                        user=user,
-                        recipe_id=OuterRef('pk')
-                    )
-                ),
-                is_in_shopping_cart=Exists(
-                    ShoppingCart.objects.filter(
-                        user=user,
-                        recipe_id=OuterRef('pk')
-                    )
-                )
-            )
-        return queryset
+    def get_validators(self, request, *args, **kwargs):
+        if self.action != 'retrieve':
+            return super().get_validators(request, *args, **kwargs)
+        try:
+            recipe = Recipe.objects.filter(pk=kwargs['pk']).values_list(
+                'author_id', 'modified'
+            ).first()
+        except (TypeError, ValueError):
+            recipe = None
+        if recipe is None:
+            return None
+        author_id, modified = recipe
+        return build_validators(
+            request, (TAGS, INGREDIENTS, user_version(author_id)), modified
+        )
 
     def get_serializer_class(self):
         if self.request.method in permissions.SAFE_METHODS:
             return RecipesReadSerializer
         return RecipesWriteSerializer
 
-    def _add_action(self, request, pk, serializer_class):
-        recipe = self.get_object()
-        user = request.user
-        data = {'user': user.id, 'recipe': recipe.id}
-        serializer = serializer_class(
-            data=data, context=self.get_serializer_context()
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        ingredients = get_recipes_ingredients((instance.id,))
+        update_shopping_lists(
+            instance.shopping_carts.values_list('user_id', flat=True),
+            {
+                ingredient_id: -amount
+                for ingredient_id, amount in ingredients.items()
+            }
         )
-        serializer.is_valid(raise_exception=True)
-        serializer.save()
-        output_serializer = RecipeMinifiedSerializer(
-            recipe,
-            context=self.get_serializer_context()
+        with manual_shopping_list_updates():
+            instance.delete()
+
+    @staticmethod
+    def _get_recipe_id(pk):
+        try:
+            return int(pk)
+        except ValueError:
+            raise Http404
+
+    @transaction.atomic
+    def _add_action(self, request, pk, model):
+        """Добавление рецепта одним запросом INSERT ... ON CONFLICT."""
+        recipe_id = self._get_recipe_id(pk)
+        if not change_user_recipes(model, request.user.id, (recipe_id,)):
+            self.get_object()
+            raise ValidationError({
+                api_settings.NON_FIELD_ERRORS_KEY: [
+                    'Рецепт уже добавлен в '
+                    f'{model._meta.verbose_name.lower()}.'
+                ]
+            })
+        return Response(
+            RecipeMinifiedSerializer(
+                Recipe.objects.get(pk=recipe_id),
+                context=self.get_serializer_context()
+            ).data,
+            status=status.HTTP_201_CREATED
         )
-        return Response(output_serializer.data, status=status.HTTP_201_CREATED)
 
+    @transaction.atomic
     def _remove_action(self, request, pk, model):
-        recipe = self.get_object()
-        user = request.user
-        deleted_count, _ = model.objects.filter(
-            user=user,
-            recipe=recipe
-        ).delete()
-        if not deleted_count:
+        if not change_user_recipes(
+            model, request.user.id, (self._get_recipe_id(pk),), add=False
+        ):
+            self.get_object()
             return Response(
                 {'errors': 'Рецепт не найден'},
                 status=status.HTTP_400_BAD_REQUEST
             )
         return Response(status=status.HTTP_204_NO_CONTENT)
 
+    @transaction.atomic
+    def _bulk_action(self, request, model, add):
+        serializer = RecipeIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return Response({
+            'added' if add else 'removed': change_user_recipes(
+                model,
+                request.user.id,
+                serializer.validated_data['recipes'],
+                add
+            )
+        })
+
     @action(
         detail=True,
         methods=('post',),
         permission_classes=(IsAuthenticated,)
     )
     def shopping_cart(self, request, pk=None):
-        return self._add_action(request, pk, ShoppingCartSerializer)
+        return self._add_action(request, pk, ShoppingCart)
 
     @shopping_cart.mapping.delete
     def remove_shopping_cart(self, request, pk=None):
@@ -237,35 +332,133 @@ class RecipeViewSet(viewsets.ModelViewSet):
         permission_classes=(IsAuthenticated,)
     )
     def favorite(self, request, pk=None):
-        return self._add_action(request, pk, FavoriteSerializer)
+        return self._add_action(request, pk, Favorite)
 
     @favorite.mapping.delete
     def remove_favorite(self, request, pk=None):
         return self._remove_action(request, pk, Favorite)
 
+    @action(
+        detail=False,
+        methods=('post',),
+        permission_classes=(IsAuthenticated,),
+        url_path='shopping_cart'
+    )
+    def bulk_shopping_cart(self, request):
+        return self._bulk_action(request, ShoppingCart, add=True)
+
+    @bulk_shopping_cart.mapping.delete
+    def bulk_remove_shopping_cart(self, request):
+        return self._bulk_action(request, ShoppingCart, add=False)
+
+    @action(
+        detail=False,
+        methods=('post',),
+        permission_classes=(IsAuthenticated,),
+        url_path='favorite'
+    )
+    def bulk_favorite(self, request):
+        return self._bulk_action(request, Favorite, add=True)
+
+    @bulk_favorite.mapping.delete
+    def bulk_remove_favorite(self, request):
+        return self._bulk_action(request, Favorite, add=False)
+
     @action(
         detail=False,
         methods=('get',),
         permission_classes=(IsAuthenticated,),
+        renderer_classes=(
+            ShoppingListTextRenderer,
+            ShoppingListCSVRenderer,
+            ShoppingListNDJSONRenderer,
+        ),
         url_path='download_shopping_cart'
     )
     def download_shopping_cart(self, request):
-        ingredients = IngredientInRecipe.objects.filter(
-            recipe__shopping_carts__user=request.user
+        version = ShoppingList.objects.filter(
+            user=request.user
+        ).values_list('version', flat=True).first()
+        if version is None:
+            version = DEFAULT_SHOPPING_LIST_VERSION
+        renderer = request.accepted_renderer
+        etag = f'"{version}-{renderer.format}"'
+        not_modified = get_conditional_response(request, etag=etag)
+        if not_modified is not None:
+            return not_modified
+        ingredients = ShoppingListItem.objects.filter(
+            shopping_list__user=request.user
         ).values(
-            name=F('ingredients__name'),
-            unit=F('ingredients__measurement_unit')
-        ).annotate(
-            total_amount=Sum('amount')
+            name=F('ingredient__name'),
+            unit=F('ingredient__measurement_unit'),
+            total_amount=F('amount')
         ).order_by('name')
-        text = generate_shopping_list_text(ingredients)
-        buffer = BytesIO(text.encode('utf-8'))
-        return FileResponse(
-            buffer,
-            as_attachment=True,
-            filename='shopping_cart.txt',
-            content_type='text/plain; charset=utf-8'
+        response = StreamingHttpResponse(
+            stream_shopping_list(
+                ingredients.iterator(chunk_size=SHOPPING_LIST_FETCH_SIZE),
+                renderer.format
+            ),
+            content_type=f'{renderer.media_type}; charset={renderer.charset}'
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename="shopping_cart.{renderer.format}"'
+        )
+        response['ETag'] = etag
+        response['X-Shopping-List-Version'] = version
+        return response
+
+    @action(detail=True, methods=('get',))
+    def similar(self, request, pk=None):
+        recipe = self.get_object()
+        limit = request.query_params.get('limit', SIMILAR_RECIPES_LIMIT)
+        try:
+            limit = int(limit)
+        except ValueError:
+            limit = 0
+        if limit < 1:
+            raise ValidationError({
+                'limit': ['Укажите положительное целое число.']
+            })
+        limit = min(limit, SIMILAR_RECIPES_MAX_LIMIT)
+        scores = dict(similarity_index.similar(recipe.pk, limit))
+        recipes = sorted(
+            Recipe.objects.filter(pk__in=scores),
+            key=lambda recipe: (-scores[recipe.pk], -recipe.pk)
         )
+        data = RecipeMinifiedSerializer(
+            recipes,
+            many=True,
+            context=self.get_serializer_context()
+        ).data
+        for item in data:
+            item['similarity'] = round(scores[item['id']], 4)
+        return Response(data)
+
+    @action(detail=False, methods=('get',))
+    def batch(self, request):
+        """Рецепты по списку id в параметре ids в порядке перечисления."""
+        return self.conditional_response(self.get_batch, request)
+
+    def get_batch(self, request):
+        ids = request.query_params.get('ids', '')
+        try:
+            recipe_ids = list(dict.fromkeys(
+                int(pk) for pk in ids.split(',') if pk.strip()
+            ))
+        except ValueError:
+            raise ValidationError({
+                'ids': ['Укажите id рецептов через запятую.']
+            })
+        if not 0 < len(recipe_ids) <= MAX_BATCH_RECIPES:
+            raise ValidationError({
+                'ids': [f'Укажите от 1 до {MAX_BATCH_RECIPES} рецептов.']
+            })
+        recipes = Recipe.objects.in_bulk(recipe_ids)
+        return Response(RecipesReadSerializer(
+            [recipes[pk] for pk in recipe_ids if pk in recipes],
+            many=True,
+            context=self.get_serializer_context()
+        ).data)
 
     @action(detail=True, methods=('get',), url_path='get-link')
     def get_short_link(self, request, pk=None):
@@ -1,5 +1,7 @@
 python manage.py makemigrations --no-input
 python manage.py migrate --no-input
+python manage.py sync_ingredients
 python manage.py add_data_from_json
+python manage.py build_similarity_index
 python manage.py collectstatic --noinput
 gunicorn --bind 0.0.0.0:8000 foodgram_backend.wsgi
\ No newline at end of file
@@ -45,6 +45,7 @@ class FavoriteAdmin(admin.ModelAdmin):
     """Админка для избранных."""
 
     list_display = ('user', 'recipe',)
+    ordering = ('user',)
     list_filter = ('user__username', 'recipe__name',)
     search_fields = ('user__username', 'recipe__name',)
 
@@ -54,6 +55,7 @@ class ShoppingCartAdmin(admin.ModelAdmin):
     """Админка для списка покупок."""
 
     list_display = ('user', 'recipe',)
+    ordering = ('user',)
     list_filter = ('user__username', 'recipe__name',)
     search_fields = ('user__username', 'recipe__name',)
 
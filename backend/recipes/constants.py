@@ -6,4 +6,77 @@ MAX_NAME_AND_SLUG_LENGTH_TAGS = 32
 MIN_AMOUNT_VALUE = 1
 MAX_AMOUNT_VALUE = 32766
 SHORT_HASH_LENGTH = 8
-HASH_GENERATION_ATTEMPTS = 20
+SHORT_CODE_LENGTH = 7
+SHORT_CODE_ALPHABET = (
+    '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz'
+)
+SHORT_CODE_KEY = b'chef_space-short-links'
+SHORT_CODE_ROUNDS = 4
+DEFAULT_SHOPPING_LIST_VERSION = 0
+SHOPPING_LIST_REBUILD_BATCH_SIZE = 1000
+INGREDIENT_INDEX_VERSION_KEY = 'ingredient_index_version'
+INGREDIENT_INDEX_TTL = 600
+SHORT_LINK_CACHE_PREFIX = 'short_link'
+SHORT_LINK_LOCAL_CACHE_SIZE = 10000
+SHORT_LINK_CACHE_TIMEOUT = 60 * 60 * 24 * 30
+SHORT_LINK_NEGATIVE_CACHE_TIMEOUT = 60
+SHORT_LINK_MAX_AGE = 60 * 60 * 24
+IMPORT_BATCH_SIZE = 2000
+MAX_CATALOG_SOURCE_LENGTH = 255
+CATALOG_CHECKSUM_LENGTH = 64
+CATALOG_READ_CHUNK_SIZE = 64 * 1024
+CATALOG_BATCH_SIZE = 1000
+SEARCH_CONFIG = 'russian'
+SEARCH_FTS_TABLE = 'recipes_recipe_fts'
+SEARCH_NAME_WEIGHT = 10.0
+SEARCH_TEXT_WEIGHT = 1.0
+SEARCH_MIN_STEM_LENGTH = 3
+SEARCH_WORD_ENDINGS = (
+    'ами', 'ями', 'ого', 'его', 'ому', 'ему', 'ыми', 'ими',
+    'ой', 'ей', 'ий', 'ый', 'ая', 'яя', 'ое', 'ее', 'ых', 'их',
+    'ах', 'ях', 'ам', 'ям', 'ом', 'ем', 'ов', 'ев',
+    'ы', 'и', 'а', 'я', 'о', 'е', 'у', 'ю', 'ь', 'й',
+)
+FEED_FANOUT_BATCH_SIZE = 1000
+FEED_PULL_THRESHOLD = 5000
+FEED_PULL_AUTHOR_CACHE_PREFIX = 'feed_pull_author'
+FEED_PULL_AUTHORS_TTL = 600
+FEED_BACKFILL_SIZE = 500
+SIMILAR_RECIPES_LIMIT = 6
+SIMILAR_RECIPES_MAX_LIMIT = 50
+SIMILARITY_INDEX_POINTER = 'CURRENT'
+SIMILARITY_INDEX_FETCH_SIZE = 5000
+SIMILARITY_INDEX_KEPT_VERSIONS = 1
+PANTRY_SEQUENCE_KEY = 'pantry_index_sequence'
+PANTRY_CHANGE_KEY_PREFIX = 'pantry_index_change'
+PANTRY_CHANGE_TIMEOUT = 60 * 60
+PANTRY_INDEX_TTL = 60 * 60
+PANTRY_MAX_REPLAY = 1000
+PANTRY_MAX_RESULTS = 1000
+PANTRY_FETCH_SIZE = 5000
+PLAN_CHECK_SEED_SIZE = 20000
+PLAN_CHECK_MIN_ROWS = 10000
+PLAN_CHECK_RELATIONS = 50
+SEED_TAGS = 10
+SEED_TAGS_PER_RECIPE = 2
+SEED_INGREDIENTS = 1000
+SEED_INGREDIENTS_PER_RECIPE = 6
+SEED_FEED_ENTRIES = 100
+SEED_BATCH_SIZE = 1000
+BENCHMARK_SCALES = {
+    'small': {
+        'recipes': 1000, 'users': 100,
+        'favorites': 20, 'carts': 10, 'subscriptions': 10,
+    },
+    'medium': {
+        'recipes': 20000, 'users': 1000,
+        'favorites': 50, 'carts': 20, 'subscriptions': 30,
+    },
+    'large': {
+        'recipes': 100000, 'users': 10000,
+        'favorites': 100, 'carts': 30, 'subscriptions': 50,
+    },
+}
+BENCHMARK_REQUESTS = 30
+BENCHMARK_WARMUP = 3
+BENCHMARK_TOLERANCE = 0.2
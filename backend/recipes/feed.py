@@ -0,0 +1,292 @@
+import threading
+from itertools import islice
+
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Count, F
+from django.utils import timezone
+
+from .constants import (
+    FEED_BACKFILL_SIZE, FEED_FANOUT_BATCH_SIZE, FEED_PULL_AUTHOR_CACHE_PREFIX,
+    FEED_PULL_AUTHORS_TTL, FEED_PULL_THRESHOLD
+)
+from .models import FeedEntry, FeedPullAuthor, Recipe
+from users.models import Subscriptions
+
+FEED_ORDERING = ('-pub_date', '-recipe_id')
+
+
+def _pull_author_cache_key(author_id):
+    return f'{FEED_PULL_AUTHOR_CACHE_PREFIX}:{author_id}'
+
+
+def get_pull_author_ids(author_ids):
+    """Авторы из author_ids, рецепты которых не раскладываются по лентам.
+
+    У авторов с числом подписчиков больше FEED_PULL_THRESHOLD запись в
+    каждую ленту обходится слишком дорого, поэтому их рецепты
+    подмешиваются в ленту при чтении. Режим автора хранится в
+    FeedPullAuthor и обновляется update_pull_modes, признак каждого
+    автора кешируется на FEED_PULL_AUTHORS_TTL секунд.
+    """
+    keys = {
+        _pull_author_cache_key(author_id): author_id
+        for author_id in author_ids
+    }
+    flags = cache.get_many(keys)
+    missing = [
+        author_id for key, author_id in keys.items() if key not in flags
+    ]
+    if missing:
+        pull_author_ids = set(FeedPullAuthor.objects.filter(
+            author_id__in=missing
+        ).values_list('author_id', flat=True))
+        fetched = {
+            _pull_author_cache_key(author_id): author_id in pull_author_ids
+            for author_id in missing
+        }
+        cache.set_many(fetched, FEED_PULL_AUTHORS_TTL)
+        flags.update(fetched)
+    return frozenset(keys[key] for key, is_pull in flags.items() if is_pull)
+
+
+def update_pull_modes(author_ids):
+    """Перевод авторов между рассылкой и подмешиванием при чтении.
+
+    Число подписчиков каждого автора сравнивается с режимом, который
+    был записан при прошлом изменении подписок, поэтому переход через
+    FEED_PULL_THRESHOLD замечается при любом изменении числа подписчиков:
+    массовом удалении, каскаде от удалённого пользователя или правке в
+    админке. Автор, вернувшийся к рассылке, остаётся в режиме чтения с
+    отметкой backfill_pending, пока команда backfill_feeds не допишет
+    ленты его подписчиков. Кеш признаков сбрасывается у всех авторов,
+    режим которых изменился.
+    """
+    author_ids = set(author_ids)
+    followers = dict(
+        Subscriptions.objects.filter(author_id__in=author_ids).order_by(
+        ).values('author_id').annotate(
+            followers=Count('user')
+        ).values_list('author_id', 'followers')
+    )
+    pull = {
+        author_id for author_id in author_ids
+        if followers.get(author_id, 0) > FEED_PULL_THRESHOLD
+    }
+    modes = dict(FeedPullAuthor.objects.filter(
+        author_id__in=author_ids
+    ).values_list('author_id', 'backfill_pending'))
+    entered = pull - modes.keys()
+    returned = {
+        author_id for author_id, pending in modes.items()
+        if pending and author_id in pull
+    }
+    left = {
+        author_id for author_id, pending in modes.items()
+        if not pending and author_id not in pull
+    }
+    FeedPullAuthor.objects.bulk_create(
+        [FeedPullAuthor(author_id=author_id) for author_id in entered],
+        ignore_conflicts=True
+    )
+    FeedPullAuthor.objects.filter(author_id__in=returned).update(
+        backfill_pending=False
+    )
+    FeedPullAuthor.objects.filter(author_id__in=left).update(
+        backfill_pending=True
+    )
+    cache.delete_many([
+        _pull_author_cache_key(author_id)
+        for author_id in entered | returned | left
+    ])
+
+
+_pull_modes_state = threading.local()
+
+
+def schedule_pull_mode_update(author_id):
+    """Обновление режима автора после фиксации транзакции.
+
+    Авторы, подписки на которых изменились, копятся до фиксации, и режимы
+    обновляются один раз на транзакцию. После отката авторы остаются в
+    очереди и лишь проверяются ещё раз при следующей фиксации.
+    """
+    pending = getattr(_pull_modes_state, 'pending', None)
+    if pending is None:
+        pending = _pull_modes_state.pending = set()
+    pending.add(author_id)
+    transaction.on_commit(_update_pending_pull_modes)
+
+
+@transaction.atomic
+def _update_pending_pull_modes():
+    pending = getattr(_pull_modes_state, 'pending', None)
+    if pending is None:
+        return
+    _pull_modes_state.pending = None
+    update_pull_modes(pending)
+
+
+def _create_entries(entries):
+    entries = iter(entries)
+    while True:
+        batch = list(islice(entries, FEED_FANOUT_BATCH_SIZE))
+        if not batch:
+            return
+        FeedEntry.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def _fan_out(author_id, recipes):
+    follower_ids = Subscriptions.objects.filter(
+        author_id=author_id
+    ).values_list('user_id', flat=True).iterator(
+        chunk_size=FEED_FANOUT_BATCH_SIZE
+    )
+    _create_entries(
+        FeedEntry(
+            user_id=user_id, recipe_id=recipe_id, author_id=author_id,
+            pub_date=pub_date
+        )
+        for user_id in follower_ids for recipe_id, pub_date in recipes
+    )
+
+
+def fan_out_recipes(recipes):
+    """Запись новых рецептов в ленты подписчиков их авторов.
+
+    recipes — тройки (id рецепта, id автора, дата публикации).
+    Подписчики читаются и записи создаются порциями по
+    FEED_FANOUT_BATCH_SIZE.
+    """
+    recipes = list(recipes)
+    pull_author_ids = get_pull_author_ids(
+        {author_id for _, author_id, _ in recipes}
+    )
+    recipes_by_author = {}
+    for recipe_id, author_id, pub_date in recipes:
+        if author_id not in pull_author_ids:
+            recipes_by_author.setdefault(author_id, []).append(
+                (recipe_id, pub_date)
+            )
+    for author_id, author_recipes in recipes_by_author.items():
+        _fan_out(author_id, author_recipes)
+
+
+def _latest_recipes(author_id):
+    return Recipe.objects.filter(author_id=author_id).order_by(
+        '-pub_date', '-id'
+    ).values_list('id', 'pub_date')[:FEED_BACKFILL_SIZE]
+
+
+def backfill_feed(user_id, author_id):
+    """Добавление последних рецептов автора в ленту нового подписчика."""
+    if get_pull_author_ids((author_id,)):
+        return
+    _create_entries(
+        FeedEntry(
+            user_id=user_id, recipe_id=recipe_id, author_id=author_id,
+            pub_date=pub_date
+        )
+        for recipe_id, pub_date in _latest_recipes(author_id)
+    )
+
+
+def prune_feed(user_id, author_id):
+    FeedEntry.objects.filter(user_id=user_id, author_id=author_id).delete()
+
+
+def backfill_followers(author_id):
+    """Дозапись лент подписчиков автора, вернувшегося к рассылке.
+
+    Рецепты, опубликованные, пока автор подмешивался при чтении, в
+    ленты не записывались; подписчики получают последние
+    FEED_BACKFILL_SIZE рецептов автора, уже записанные пропускаются.
+    Записи создаются порциями по FEED_FANOUT_BATCH_SIZE, и всё это время
+    автор остаётся в режиме чтения. После снятия отметки дописываются
+    рецепты, опубликованные во время дозаписи. Возвращает False, если
+    дозапись больше не нужна или автор снова перешёл в режим чтения.
+    """
+    started = timezone.now()
+    if not FeedPullAuthor.objects.filter(
+        author_id=author_id, backfill_pending=True
+    ).exists():
+        return False
+    _fan_out(author_id, list(_latest_recipes(author_id)))
+    deleted, _ = FeedPullAuthor.objects.filter(
+        author_id=author_id, backfill_pending=True
+    ).delete()
+    cache.delete(_pull_author_cache_key(author_id))
+    if not deleted:
+        return False
+    _fan_out(author_id, list(
+        Recipe.objects.filter(
+            author_id=author_id, pub_date__gte=started
+        ).values_list('id', 'pub_date')
+    ))
+    return True
+
+
+class Feed:
+    """Лента пользователя от новых рецептов к старым.
+
+    Собирается из записей FeedEntry и рецептов авторов, которые
+    подмешиваются при чтении, через UNION ALL. Для пагинаторов лента
+    ведёт себя как queryset записей FeedEntry: условия filter и
+    сортировка применяются к каждой части до объединения, поэтому
+    страница выбирается по индексам (user, -pub_date, -recipe) и
+    (author, -pub_date, -id). Срез возвращает записи с загруженными
+    рецептами.
+    """
+
+    model = FeedEntry
+
+    def __init__(self, parts, ordering=()):
+        self.parts = parts
+        self.ordering = ordering
+
+    def filter(self, *args, **kwargs):
+        return Feed(
+            [part.filter(*args, **kwargs) for part in self.parts],
+            self.ordering
+        )
+
+    def order_by(self, *ordering):
+        return Feed(self.parts, ordering)
+
+    def count(self):
+        return sum(part.count() for part in self.parts)
+
+    def __getitem__(self, key):
+        first, *rest = self.parts
+        if rest:
+            if connection.features.supports_slicing_ordering_in_compound:
+                first, *rest = (
+                    part.order_by(*self.ordering)[:key.stop]
+                    for part in self.parts
+                )
+            else:
+                first, *rest = (part.order_by() for part in self.parts)
+            first = first.union(*rest, all=True)
+        rows = first.order_by(*self.ordering)[key]
+        recipes = Recipe.objects.in_bulk(
+            [row['recipe_id'] for row in rows]
+        )
+        return [
+            FeedEntry(
+                recipe=recipes[row['recipe_id']], pub_date=row['pub_date']
+            )
+            for row in rows if row['recipe_id'] in recipes
+        ]
+
+
+def get_feed(user, subscribed_author_ids):
+    """Лента пользователя с учётом авторов, подмешиваемых при чтении."""
+    pull_author_ids = get_pull_author_ids(subscribed_author_ids)
+    parts = [FeedEntry.objects.filter(user=user).exclude(
+        author_id__in=pull_author_ids
+    ).values('pub_date', 'recipe_id')]
+    if pull_author_ids:
+        parts.append(Recipe.objects.filter(
+            author_id__in=pull_author_ids
+        ).values('pub_date', recipe_id=F('id')))
+    return Feed(parts, FEED_ORDERING)
@@ -0,0 +1,103 @@
+import threading
+import time
+import uuid
+from bisect import bisect_left
+
+from django.core.cache import cache
+from django.db import DatabaseError
+from django.db.models import Count
+
+from .constants import INGREDIENT_INDEX_TTL, INGREDIENT_INDEX_VERSION_KEY
+from .models import Ingredient, IngredientInRecipe
+
+
+def normalize_name(value):
+    """Приведение названия к виду для сравнения без учёта регистра."""
+    return value.strip().casefold().replace('ё', 'е')
+
+
+class IngredientPrefixIndex:
+    """Индекс названий ингредиентов для поиска по началу названия.
+
+    Названия хранятся отсортированными в памяти процесса, поиск выполняется
+    бинарным поиском по префиксу. Результаты упорядочены по частоте
+    использования ингредиента в рецептах. Индекс перестраивается, когда
+    меняется версия в кеше (при изменении ингредиентов) или истекает
+    INGREDIENT_INDEX_TTL.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._state = None
+
+    def build(self):
+        usage = dict(
+            IngredientInRecipe.objects.order_by().values(
+                'ingredients_id'
+            ).annotate(total=Count('id')).values_list(
+                'ingredients_id', 'total'
+            )
+        )
+        rows = sorted(
+            (normalize_name(name), -usage.get(pk, 0), name, pk, unit)
+            for pk, name, unit in Ingredient.objects.values_list(
+                'pk', 'name', 'measurement_unit'
+            ).iterator()
+        )
+        return {
+            'keys': [row[0] for row in rows],
+            'ranks': [(row[1], row[0]) for row in rows],
+            'items': [
+                {'id': pk, 'name': name, 'measurement_unit': unit}
+                for _, _, name, pk, unit in rows
+            ],
+        }
+
+    def get_state(self):
+        version = cache.get(INGREDIENT_INDEX_VERSION_KEY)
+        state = self._state
+        if (
+            state is None
+            or state['version'] != version
+            or state['expires_at'] < time.monotonic()
+        ):
+            with self._lock:
+                state = self._state
+                if (
+                    state is None
+                    or state['version'] != version
+                    or state['expires_at'] < time.monotonic()
+                ):
+                    state = self.build()
+                    state['version'] = version
+                    state['expires_at'] = (
+                        time.monotonic() + INGREDIENT_INDEX_TTL
+                    )
+                    self._state = state
+        return state
+
+    def search(self, prefix):
+        state = self.get_state()
+        keys = state['keys']
+        prefix = normalize_name(prefix)
+        start = bisect_left(keys, prefix)
+        end = bisect_left(keys, prefix + chr(0x10FFFF), start)
+        ranks = state['ranks']
+        return [
+            state['items'][position] for position in sorted(
+                range(start, end), key=ranks.__getitem__
+            )
+        ]
+
+    def warm(self):
+        try:
+            self.get_state()
+        except DatabaseError:
+            self._state = None
+
+    def invalidate(self):
+        self._state = None
+        cache.set(INGREDIENT_INDEX_VERSION_KEY, uuid.uuid4().hex, None)
+
+
+ingredient_index = IngredientPrefixIndex()
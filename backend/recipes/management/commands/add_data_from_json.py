@@ -5,20 +5,17 @@ from django.conf import settings
 from django.core.management.base import BaseCommand
 from django.utils.text import slugify
 
-from recipes.models import Ingredient, Tag
+from recipes.models import Tag
 
 
 class Command(BaseCommand):
-    help = 'Загрузка данных из JSON-файлов в базу данных'
+    help = (
+        'Загрузка тегов из JSON-файла в базу данных. Ингредиенты '
+        'загружаются командой sync_ingredients.'
+    )
 
     def handle(self, *args, **options):
         data_dir = os.path.join(settings.BASE_DIR.parent, 'app', 'data')
-        self.load_data(
-            data_dir,
-            'ingredients.json',
-            Ingredient,
-            ['name', 'measurement_unit']
-        )
         self.load_data(
             data_dir,
             'tags.json',
@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand
+
+from recipes.feed import backfill_followers, update_pull_modes
+from recipes.models import FeedPullAuthor
+from users.models import Subscriptions
+
+
+class Command(BaseCommand):
+    help = (
+        'Дозапись лент подписчиков авторов, у которых число подписчиков '
+        'опустилось до FEED_PULL_THRESHOLD. Пока дозапись не выполнена, '
+        'рецепты таких авторов подмешиваются в ленты при чтении. Команда '
+        'запускается периодически; записи создаются порциями, поэтому '
+        'отписки не пишут ленты в ходе запроса.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'authors',
+            nargs='*',
+            type=int,
+            help='id авторов; по умолчанию обрабатываются все ожидающие.'
+        )
+        parser.add_argument(
+            '--sync',
+            action='store_true',
+            help='Сначала пересчитать режимы всех авторов, например после '
+                 'загрузки подписок в обход приложения.'
+        )
+
+    def handle(self, *args, authors, sync, **options):
+        if sync:
+            update_pull_modes(
+                set(Subscriptions.objects.order_by().values_list(
+                    'author_id', flat=True
+                ).distinct()) | set(FeedPullAuthor.objects.values_list(
+                    'author_id', flat=True
+                ))
+            )
+        pending = FeedPullAuthor.objects.filter(backfill_pending=True)
+        if authors:
+            pending = pending.filter(author_id__in=authors)
+        completed = 0
+        for author_id in pending.values_list('author_id', flat=True):
+            if backfill_followers(author_id):
+                completed += 1
+                self.stdout.write(
+                    f'Ленты подписчиков автора {author_id} дописаны.'
+                )
+        self.stdout.write(self.style.SUCCESS(
+            f'Дописано лент авторов: {completed}.'
+        ))
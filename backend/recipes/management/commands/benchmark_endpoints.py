@@ -0,0 +1,370 @@
+import json
+import statistics
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from itertools import combinations
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from api import images
+from api.constants import IMAGE_DERIVATIVE_WORKERS
+from recipes.constants import (
+    BENCHMARK_REQUESTS, BENCHMARK_SCALES, BENCHMARK_TOLERANCE,
+    BENCHMARK_WARMUP
+)
+from recipes.models import Ingredient, Recipe, Tag
+from recipes.seeding import SEED_NAME, seed_dataset
+from users.models import Subscriptions, User
+
+DATASET_FIELDS = ('recipes', 'users', 'favorites', 'carts', 'subscriptions')
+IMAGE = (
+    'data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAA'
+    'DUlEQVR42mNk+M9QDwADhgGAWjR9awAAAABJRU5ErkJggg=='
+)
+BENCHMARK_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'benchmark',
+    },
+}
+COMPARED_METRICS = ('p95_ms', 'queries')
+
+
+def summarize(durations, queries, hook_durations):
+    """Перцентили задержки в миллисекундах и пропускная способность.
+
+    on_commit_ms — средняя доля задержки, пришедшаяся на действия,
+    отложенные до фиксации транзакции.
+    """
+    cuts = statistics.quantiles(durations, n=100, method='inclusive')
+    return {
+        'requests': len(durations),
+        'p50_ms': round(cuts[49] * 1000, 3),
+        'p95_ms': round(cuts[94] * 1000, 3),
+        'p99_ms': round(cuts[98] * 1000, 3),
+        'mean_ms': round(statistics.fmean(durations) * 1000, 3),
+        'on_commit_ms': round(statistics.fmean(hook_durations) * 1000, 3),
+        'rps': round(len(durations) / sum(durations), 1),
+        'queries': queries,
+    }
+
+
+@contextmanager
+def derivative_pool():
+    """Отдельный пул для производных изображений на время замера.
+
+    При выходе пул дожидается своих задач, поэтому они не пишут файлы
+    во временный MEDIA_ROOT после его удаления.
+    """
+    previous = images.derivative_executor
+    images.derivative_executor = ThreadPoolExecutor(
+        max_workers=IMAGE_DERIVATIVE_WORKERS,
+        thread_name_prefix='benchmark-derivatives'
+    )
+    try:
+        yield
+    finally:
+        images.derivative_executor.shutdown()
+        images.derivative_executor = previous
+
+
+def compare(results, baseline, tolerance):
+    """Метрики, выросшие относительно базового прогона больше допуска."""
+    regressions = []
+    for name, metrics in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+        for metric in COMPARED_METRICS:
+            if metrics[metric] > previous[metric] * (1 + tolerance):
+                regressions.append(
+                    f'{name}: {metric} {previous[metric]} → {metrics[metric]}'
+                )
+    return regressions
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагрузочный прогон основных эндпоинтов внутри процесса на '
+        'синтетических данных: задержки p50/p95/p99, запросы в секунду и '
+        'число SQL-запросов на запрос. Данные создаются в транзакции и '
+        'затем откатываются, поэтому действия, отложенные до фиксации '
+        '(on_commit), выполняются явно после каждого запроса и входят в '
+        'его задержку. Результаты сохраняются в JSON и могут '
+        'сравниваться с базовым прогоном.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--scale',
+            choices=BENCHMARK_SCALES,
+            default='small',
+            help='Набор размеров данных.'
+        )
+        for field in DATASET_FIELDS:
+            parser.add_argument(
+                f'--{field}',
+                type=int,
+                help=f'Переопределить размер {field} из набора.'
+            )
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=BENCHMARK_REQUESTS,
+            help='Количество замеряемых запросов к каждому эндпоинту.'
+        )
+        parser.add_argument(
+            '--warmup',
+            type=int,
+            default=BENCHMARK_WARMUP,
+            help='Количество незамеряемых запросов перед замером.'
+        )
+        parser.add_argument(
+            '--cold-cache',
+            action='store_true',
+            help='Очищать кеш перед каждым замеряемым запросом.'
+        )
+        parser.add_argument(
+            '--only',
+            help='Запускать только сценарии, в названии которых есть строка.'
+        )
+        parser.add_argument('--output', help='Файл для отчёта JSON.')
+        parser.add_argument(
+            '--baseline', help='Отчёт JSON предыдущего прогона.'
+        )
+        parser.add_argument(
+            '--tolerance',
+            type=float,
+            default=BENCHMARK_TOLERANCE,
+            help='Допустимый относительный рост p95 и числа запросов.'
+        )
+
+    def handle(self, *args, **options):
+        if options['requests'] < 2 or options['warmup'] < 1:
+            raise CommandError(
+                'Нужно хотя бы два замеряемых запроса и один прогревочный.'
+            )
+        dataset = {
+            field: options[field] if options[field] is not None
+            else BENCHMARK_SCALES[options['scale']][field]
+            for field in DATASET_FIELDS
+        }
+        if dataset['users'] < 2 and dataset['recipes']:
+            raise CommandError('Нужно хотя бы два пользователя.')
+        baseline = self.load_baseline(options['baseline'])
+        with tempfile.TemporaryDirectory() as media_root, override_settings(
+            CACHES=BENCHMARK_CACHES,
+            ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'],
+            MEDIA_ROOT=media_root,
+        ), derivative_pool(), transaction.atomic():
+            if dataset['recipes']:
+                seed_dataset(**dataset)
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+            results = self.run_scenarios(options)
+            transaction.set_rollback(True)
+        report = {
+            'created': timezone.now().isoformat(),
+            'vendor': connection.vendor,
+            'dataset': dataset,
+            'cold_cache': options['cold_cache'],
+            'results': results,
+        }
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                json.dump(report, file, ensure_ascii=False, indent=2)
+        if baseline is not None:
+            regressions = compare(
+                results, baseline['results'], options['tolerance']
+            )
+            for regression in regressions:
+                self.stdout.write(self.style.ERROR(regression))
+            if regressions:
+                raise CommandError(
+                    f'Ухудшений относительно базового прогона: '
+                    f'{len(regressions)}.'
+                )
+
+    @staticmethod
+    def load_baseline(path):
+        if path is None:
+            return None
+        try:
+            with open(path, encoding='utf-8') as file:
+                return json.load(file)
+        except (OSError, ValueError) as error:
+            raise CommandError(f'Не удалось прочитать {path}: {error}')
+
+    def get_scenarios(self, client, user):
+        """Пары (название, функция запроса от клиента и номера запроса)."""
+        recipe = Recipe.objects.filter(author=user).first()
+        author_id = Subscriptions.objects.filter(user=user).values_list(
+            'author_id', flat=True
+        ).first() or user.id
+        tag = Tag.objects.first()
+        ingredients = list(Ingredient.objects.values_list('id', flat=True)[:5])
+        if tag is None or len(ingredients) < 2:
+            raise CommandError('Нет данных для прогона; задайте --recipes.')
+        if recipe is None:
+            response, _ = self.send(
+                client, self.create_recipe(ingredients, tag), 0
+            )
+            recipe = Recipe.objects.get(pk=response.data['id'])
+        filters = {
+            'author': author_id,
+            'tags': tag.slug,
+            'is_favorited': 1,
+            'is_in_shopping_cart': 1,
+            'search': SEED_NAME,
+            'pantry': ','.join(map(str, ingredients)),
+        }
+        scenarios = [
+            (
+                'recipes:list[' + ','.join(names) + ']',
+                self.get_request('/api/recipes/', {
+                    'missing': 3 if 'pantry' in names else None,
+                    **{name: filters[name] for name in names},
+                })
+            )
+            for size in range(len(filters) + 1)
+            for names in combinations(filters, size)
+        ]
+        scenarios += [
+            ('recipes:detail', self.get_request(f'/api/recipes/{recipe.id}/')),
+            ('users:subscriptions', self.get_request(
+                '/api/users/subscriptions/', {'recipes_limit': 3}
+            )),
+            ('ingredients:search', self.get_request(
+                '/api/ingredients/', {'name': SEED_NAME[:2].lower()}
+            )),
+            ('recipes:download_shopping_cart', self.get_request(
+                '/api/recipes/download_shopping_cart/'
+            )),
+            ('recipes:create', self.create_recipe(ingredients, tag)),
+            ('recipes:update', self.update_recipe(recipe, ingredients, tag)),
+        ]
+        return scenarios
+
+    @staticmethod
+    def get_request(url, params=None):
+        params = {
+            key: value for key, value in (params or {}).items()
+            if value is not None
+        }
+        return lambda client, number: client.get(url, params)
+
+    def create_recipe(self, ingredients, tag):
+        def request(client, number):
+            return client.post('/api/recipes/', {
+                **self.get_recipe_data(ingredients, tag, number),
+                'name': f'Замер {time.monotonic_ns()}',
+            }, format='json')
+        return request
+
+    def update_recipe(self, recipe, ingredients, tag):
+        """Изменение рецепта пользователя, от имени которого идёт замер."""
+        def request(client, number):
+            return client.patch(
+                f'/api/recipes/{recipe.id}/',
+                self.get_recipe_data(ingredients, tag, number),
+                format='json'
+            )
+        return request
+
+    @staticmethod
+    def get_recipe_data(ingredients, tag, number):
+        return {
+            'ingredients': [
+                {'id': ingredient_id, 'amount': number % 50 + index + 1}
+                for index, ingredient_id in enumerate(ingredients)
+            ],
+            'tags': [tag.id],
+            'image': IMAGE,
+            'text': 'Рецепт для замера.',
+            'cooking_time': 10,
+        }
+
+    def run_scenarios(self, options):
+        user = (
+            User.objects.filter(
+                pk__in=Subscriptions.objects.values('user_id')
+            ).order_by('id').first() or User.objects.order_by('id').first()
+        )
+        if user is None:
+            raise CommandError('Нет пользователей; задайте --users.')
+        client = APIClient()
+        client.force_authenticate(user)
+        results = {}
+        for name, request in self.get_scenarios(client, user):
+            if options['only'] and options['only'] not in name:
+                continue
+            results[name] = self.measure(
+                client, request, options['warmup'], options['requests'],
+                options['cold_cache']
+            )
+            self.stdout.write(
+                f'{name}: p50 {results[name]["p50_ms"]} мс, '
+                f'p95 {results[name]["p95_ms"]} мс, '
+                f'{results[name]["rps"]} запр./с, '
+                f'SQL {results[name]["queries"]}'
+            )
+        return results
+
+    @staticmethod
+    def run_on_commit_callbacks(callbacks):
+        """Выполнение действий, отложенных до фиксации транзакции.
+
+        Замер идёт внутри транзакции, которая потом откатывается, поэтому
+        рассылка по лентам, пересчёт списков покупок, смена версий и
+        другие обработчики on_commit сами не запустились бы.
+        """
+        while callbacks:
+            with TestCase.captureOnCommitCallbacks() as nested:
+                for callback in callbacks:
+                    callback()
+            callbacks = nested
+
+    def send(self, client, request, number):
+        """Ответ на запрос и время выполнения его обработчиков on_commit."""
+        with TestCase.captureOnCommitCallbacks() as callbacks:
+            response = request(client, number)
+            if response.streaming:
+                b''.join(response.streaming_content)
+        started = time.perf_counter()
+        self.run_on_commit_callbacks(callbacks)
+        hooks_duration = time.perf_counter() - started
+        if response.status_code >= 400:
+            raise CommandError(
+                f'Ответ {response.status_code}: {response.content[:200]}'
+            )
+        return response, hooks_duration
+
+    def measure(self, client, request, warmup, requests, cold_cache):
+        """Задержки после прогрева; SQL считается по последнему прогреву.
+
+        В задержку и число запросов входят обработчики on_commit.
+        """
+        for number in range(warmup):
+            if cold_cache:
+                cache.clear()
+            with CaptureQueriesContext(connection) as context:
+                self.send(client, request, number)
+        queries = len(context.captured_queries)
+        durations, hook_durations = [], []
+        for number in range(warmup, warmup + requests):
+            if cold_cache:
+                cache.clear()
+            started = time.perf_counter()
+            _, hooks_duration = self.send(client, request, number)
+            durations.append(time.perf_counter() - started)
+            hook_durations.append(hooks_duration)
+        return summarize(durations, queries, hook_durations)
@@ -0,0 +1,101 @@
+import os
+import shutil
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from recipes.constants import (
+    SIMILARITY_INDEX_FETCH_SIZE, SIMILARITY_INDEX_KEPT_VERSIONS
+)
+from recipes.models import IngredientInRecipe, Recipe
+from recipes.similarity import (
+    build_arrays, iter_rows, load_arrays, save_arrays
+)
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def to_microseconds(value):
+    return (value - EPOCH) // timedelta(microseconds=1)
+
+
+class Command(BaseCommand):
+    help = (
+        'Построение индекса похожих рецептов. По умолчанию пересчитываются '
+        'только новые и изменённые с прошлой сборки рецепты.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help='Перестроить индекс полностью.'
+        )
+
+    def handle(self, *args, full, **options):
+        started = time.monotonic()
+        current = {
+            pk: to_microseconds(modified)
+            for pk, modified in Recipe.objects.values_list(
+                'id', 'modified'
+            ).iterator(chunk_size=SIMILARITY_INDEX_FETCH_SIZE)
+        }
+        arrays = None if full else load_arrays()
+        previous_rows = [] if arrays is None else list(iter_rows(arrays))
+        kept = [
+            row for row in previous_rows if current.get(row[0]) == row[1]
+        ]
+        kept_ids = {row[0] for row in kept}
+        changed = [pk for pk in current if pk not in kept_ids]
+        if arrays is not None and not changed and (
+            len(kept) == len(previous_rows)
+        ):
+            self.stdout.write(self.style.SUCCESS('Индекс актуален.'))
+            return
+        rows = kept + [
+            (pk, current[pk], ingredients)
+            for pk, ingredients in self.fetch_ingredients(changed).items()
+        ]
+        version = save_arrays(build_arrays(rows))
+        self.remove_old_versions(version)
+        removed = sum(1 for row in previous_rows if row[0] not in current)
+        self.stdout.write(self.style.SUCCESS(
+            f'Рецептов в индексе: {len(rows)}, пересчитано: {len(changed)}, '
+            f'удалено: {removed}, {time.monotonic() - started:.2f} с'
+        ))
+
+    def fetch_ingredients(self, recipe_ids):
+        ingredients = {pk: [] for pk in recipe_ids}
+        for start in range(0, len(recipe_ids), SIMILARITY_INDEX_FETCH_SIZE):
+            chunk = defaultdict(list)
+            for recipe_id, ingredient_id in IngredientInRecipe.objects.filter(
+                recipe_id__in=recipe_ids[
+                    start:start + SIMILARITY_INDEX_FETCH_SIZE
+                ]
+            ).values_list('recipe_id', 'ingredients_id'):
+                chunk[recipe_id].append(ingredient_id)
+            ingredients.update(chunk)
+        return ingredients
+
+    def remove_old_versions(self, version):
+        """Удаление версий старше предыдущей.
+
+        Предыдущая версия сохраняется: процессы, которые ещё держат её
+        файлы отображёнными в память, продолжают читать их до
+        переключения на новую версию.
+        """
+        directory = settings.SIMILARITY_INDEX_DIR
+        previous = sorted(
+            (
+                name for name in os.listdir(directory)
+                if name != version and name.startswith('v')
+                and name[1:].isdigit()
+                and os.path.isdir(os.path.join(directory, name))
+            ),
+            key=lambda name: int(name[1:])
+        )
+        for name in previous[:-SIMILARITY_INDEX_KEPT_VERSIONS]:
+            shutil.rmtree(os.path.join(directory, name))
@@ -0,0 +1,251 @@
+import re
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+from rest_framework.test import APIClient
+
+from recipes.constants import (
+    PLAN_CHECK_MIN_ROWS, PLAN_CHECK_RELATIONS, PLAN_CHECK_SEED_SIZE
+)
+from recipes.models import Recipe, Tag
+from recipes.seeding import seed_dataset
+from users.models import Subscriptions, User
+
+ENDPOINTS = (
+    '/api/recipes/',
+    '/api/recipes/?page=2',
+    '/api/recipes/?pagination=cursor',
+    '/api/recipes/?author={author_id}',
+    '/api/recipes/?tags={tag_slug}',
+    '/api/recipes/?is_favorited=1',
+    '/api/recipes/?is_in_shopping_cart=1',
+    '/api/recipes/{recipe_id}/',
+    '/api/recipes/batch/?ids={recipe_ids}',
+    '/api/recipes/download_shopping_cart/',
+    '/api/users/{author_id}/',
+    '/api/users/subscriptions/',
+    '/api/users/feed/',
+)
+SQLITE_FULL_SCAN = re.compile(
+    r'^SCAN (\w+)(?!\w| VIRTUAL TABLE)( USING (?:COVERING )?INDEX)?'
+)
+SQLITE_TEMP_SORT = 'USE TEMP B-TREE FOR ORDER BY'
+POSTGRESQL_INDEX_SCANS = ('Index Scan', 'Index Only Scan')
+SQL_LIMIT = re.compile(r'\bLIMIT \d+(?: OFFSET \d+)?$')
+COUNT_QUERY = re.compile(r'^\s*SELECT COUNT\(\*\)', re.IGNORECASE)
+SQL_WHERE = re.compile(r'\bWHERE\b', re.IGNORECASE)
+SQL_PARENTHESES = re.compile(r'\([^()]*\)')
+SQL_TABLE_ALIAS = re.compile(r'"(\w+)" (?:AS )?([A-Z]\d+)\b')
+CHECK_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'query-plan-check',
+    },
+}
+
+
+def has_outer_filter(sql):
+    """Есть ли условие WHERE у внешнего запроса, без учёта подзапросов."""
+    while True:
+        sql, replaced = SQL_PARENTHESES.subn('', sql)
+        if not replaced:
+            return bool(SQL_WHERE.search(sql))
+
+
+def is_unfiltered_count(sql):
+    return bool(COUNT_QUERY.match(sql)) and not SQL_WHERE.search(sql)
+
+
+def iter_postgresql_scans(plan):
+    node_type = plan.get('Node Type')
+    if node_type == 'Seq Scan' or (
+        node_type in POSTGRESQL_INDEX_SCANS
+        and 'Filter' in plan
+        and 'Index Cond' not in plan
+    ):
+        yield plan['Relation Name']
+    for child in plan.get('Plans', ()):
+        yield from iter_postgresql_scans(child)
+
+
+def get_full_scans(cursor, sql):
+    """Таблицы, которые план запроса читает целиком.
+
+    В плане SQLite полным чтением считается любой SCAN, в том числе по
+    индексу (SCAN t USING COVERING INDEX i), кроме виртуальных таблиц
+    FTS5. Исключение — внешний цикл запроса с LIMIT и без условия
+    WHERE, который обходит индекс в нужном порядке без сортировки:
+    чтение останавливается на LIMIT, как Limit над Index Scan в
+    PostgreSQL. С условием такой обход может прочитать всю таблицу,
+    пока не наберёт LIMIT подходящих строк. Таблицы подзапросов
+    названы псевдонимами Django (U0, T3), они заменяются именами таблиц
+    из текста запроса.
+
+    PostgreSQL строит план с enable_seqscan = off: данные проверки
+    создаются в транзакции без VACUUM, и без карты видимости планировщик
+    выбирает Seq Scan там, где на рабочей базе берёт Index Only Scan.
+    Seq Scan, оставшийся при этой настройке, означает, что подходящего
+    индекса нет. Полным чтением считается и обход индекса без Index
+    Cond с условием Filter.
+    """
+    if connection.vendor == 'postgresql':
+        cursor.execute('SET enable_seqscan = off')
+        try:
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}')
+            plan = cursor.fetchone()[0][0]['Plan']
+        finally:
+            cursor.execute('RESET enable_seqscan')
+        return set(iter_postgresql_scans(plan))
+    cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+    details = [row[-1] for row in cursor.fetchall()]
+    ordered_walk = (
+        bool(SQL_LIMIT.search(sql.rstrip()))
+        and not has_outer_filter(sql)
+        and not any(
+            detail.startswith(SQLITE_TEMP_SORT) for detail in details
+        )
+    )
+    aliases = {alias: table for table, alias in SQL_TABLE_ALIAS.findall(sql)}
+    scans = set()
+    for position, detail in enumerate(details):
+        match = SQLITE_FULL_SCAN.match(detail)
+        if match is None or (position == 0 and ordered_walk and match[2]):
+            continue
+        scans.add(aliases.get(match[1], match[1]))
+    return scans
+
+
+class Command(BaseCommand):
+    help = (
+        'Проверка планов запросов основных эндпоинтов: запросы каждого '
+        'эндпоинта выполняются через EXPLAIN, и команда завершается с '
+        'ошибкой, если план последовательно читает большую таблицу. '
+        'Подсчёт всех строк таблицы (SELECT COUNT(*) без WHERE для '
+        'постраничной пагинации) читает таблицу по своей природе, '
+        'поэтому такие чтения выводятся отдельно и ошибкой не '
+        'считаются; подсчёт с условием проверяется как обычный запрос. '
+        'Тестовые данные создаются в транзакции и затем откатываются.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=PLAN_CHECK_SEED_SIZE,
+            help='Количество создаваемых рецептов; 0 — проверка на '
+                 'имеющихся данных.'
+        )
+        parser.add_argument(
+            '--min-rows',
+            type=int,
+            default=PLAN_CHECK_MIN_ROWS,
+            help='Последовательное чтение таблиц меньшего размера '
+                 'не считается ошибкой.'
+        )
+
+    def handle(self, *args, seed, min_rows, **options):
+        if seed < 0:
+            raise CommandError('Размер данных не может быть отрицательным.')
+        with transaction.atomic():
+            if seed:
+                seed_dataset(
+                    recipes=seed,
+                    users=max(seed // 20, PLAN_CHECK_RELATIONS + 1),
+                    favorites=PLAN_CHECK_RELATIONS,
+                    carts=PLAN_CHECK_RELATIONS,
+                    subscriptions=PLAN_CHECK_RELATIONS,
+                    seed=seed
+                )
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+            problems = self.check_endpoints(min_rows)
+            transaction.set_rollback(True)
+        if problems:
+            raise CommandError(
+                f'Последовательное чтение больших таблиц: {problems}.'
+            )
+        self.stdout.write(self.style.SUCCESS(
+            'Последовательного чтения больших таблиц не найдено.'
+        ))
+
+    def get_urls(self):
+        user = User.objects.filter(
+            pk__in=Subscriptions.objects.values('user_id')
+        ).first() or User.objects.first()
+        recipe = Recipe.objects.first()
+        tag = Tag.objects.filter(recipes__isnull=False).first()
+        if user is None or recipe is None or tag is None:
+            raise CommandError(
+                'Нет данных для проверки; запустите команду с --seed.'
+            )
+        values = {
+            'author_id': recipe.author_id,
+            'tag_slug': tag.slug,
+            'recipe_id': recipe.id,
+            'recipe_ids': ','.join(map(str, Recipe.objects.values_list(
+                'id', flat=True
+            )[:PLAN_CHECK_RELATIONS])),
+        }
+        return user, [url.format(**values) for url in ENDPOINTS]
+
+    def check_endpoints(self, min_rows):
+        user, urls = self.get_urls()
+        client = APIClient()
+        client.force_authenticate(user)
+        self.row_counts = {}
+        self.tables = set(connection.introspection.table_names())
+        problems = 0
+        with override_settings(
+            CACHES=CHECK_CACHES,
+            ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'],
+        ), connection.cursor() as cursor:
+            for url in urls:
+                with CaptureQueriesContext(connection) as context:
+                    response = client.get(url)
+                    if response.streaming:
+                        b''.join(response.streaming_content)
+                if response.status_code != 200:
+                    raise CommandError(
+                        f'{url}: ответ {response.status_code}.'
+                    )
+                scans = self.check_queries(
+                    cursor, context.captured_queries, min_rows
+                )
+                self.stdout.write(
+                    f'{url}: запросов {len(context.captured_queries)}'
+                )
+                for table, sql in scans:
+                    if is_unfiltered_count(sql):
+                        self.stdout.write(self.style.WARNING(
+                            f'  подсчёт, последовательное чтение {table}: '
+                            f'{sql}'
+                        ))
+                        continue
+                    problems += 1
+                    self.stdout.write(self.style.ERROR(
+                        f'  последовательное чтение {table}: {sql}'
+                    ))
+        return problems
+
+    def check_queries(self, cursor, queries, min_rows):
+        scans = []
+        for query in queries:
+            sql = query['sql']
+            if not sql.lstrip().upper().startswith(('SELECT', 'WITH')):
+                continue
+            scans.extend(
+                (table, sql) for table in sorted(get_full_scans(cursor, sql))
+                if table in self.tables
+                and self.count_rows(cursor, table) >= min_rows
+            )
+        return scans
+
+    def count_rows(self, cursor, table):
+        if table not in self.row_counts:
+            cursor.execute(
+                f'SELECT COUNT(*) FROM {connection.ops.quote_name(table)}'
+            )
+            self.row_counts[table] = cursor.fetchone()[0]
+        return self.row_counts[table]
@@ -0,0 +1,72 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from api.constants import AVATAR_IMAGE_SIZES, RECIPE_IMAGE_SIZES
+from api.images import generate_derivatives, has_derivatives
+from api.versions import RECIPES, USERS, bump_versions, user_version
+from recipes.models import Recipe
+from users.models import User
+
+
+def process_image(task):
+    name, sizes, _ = task
+    return generate_derivatives(name, sizes)
+
+
+class Command(BaseCommand):
+    help = (
+        'Создание миниатюр и WebP/JPEG-вариантов для уже загруженных '
+        'изображений рецептов и аватаров в нескольких процессах.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count(),
+            help='Количество рабочих процессов.'
+        )
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Пересоздать уже существующие производные изображения.'
+        )
+
+    def handle(self, *args, workers, force, **options):
+        if workers < 1:
+            raise CommandError('Нужен хотя бы один рабочий процесс.')
+        tasks = [
+            (name, sizes, user_version(user_id))
+            for queryset, field, user_field, sizes in (
+                (Recipe.objects, 'image', 'author_id', RECIPE_IMAGE_SIZES),
+                (User.objects.exclude(avatar=None), 'avatar', 'id',
+                 AVATAR_IMAGE_SIZES),
+            )
+            for name, user_id in queryset.exclude(**{field: ''}).values_list(
+                field, user_field
+            ).distinct().iterator()
+            if force or not has_derivatives(name, sizes)
+        ]
+        self.stdout.write(f'Изображений для обработки: {len(tasks)}')
+        connections.close_all()
+        chunksize = max(len(tasks) // (workers * 4), 1)
+        created = processed = 0
+        updated_versions = set()
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for task, count in zip(tasks, executor.map(
+                process_image, tasks, chunksize=chunksize
+            )):
+                created += count
+                processed += 1
+                if count:
+                    updated_versions.add(task[2])
+                if processed % 100 == 0:
+                    self.stdout.write(f'Обработано: {processed}')
+        if updated_versions:
+            bump_versions(RECIPES, USERS, *updated_versions)
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано изображений: {processed}, создано файлов: {created}'
+        ))
@@ -0,0 +1,233 @@
+import json
+import sys
+import time
+from contextlib import nullcontext
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from api.versions import RECIPES, bump_versions
+from recipes.constants import (
+    IMPORT_BATCH_SIZE, MAX_AMOUNT_VALUE, MAX_NAME_LENGTH_RECIPES,
+    MIN_AMOUNT_VALUE
+)
+from recipes.feed import fan_out_recipes
+from recipes.ingredient_index import ingredient_index
+from recipes.models import Ingredient, IngredientInRecipe, Recipe, Tag
+from recipes.pantry import publish_ingredient_changes
+from recipes.search import update_search_index
+from recipes.services import allocate_pks, bulk_insert, generate_short_hash
+from users.models import User
+
+RECIPE_FIELDS = (
+    'id', 'author_id', 'name', 'image', 'text', 'cooking_time',
+    'pub_date', 'modified', 'short_hash'
+)
+INGREDIENT_FIELDS = ('recipe_id', 'ingredients_id', 'amount')
+TAG_FIELDS = ('recipe_id', 'tag_id')
+
+
+class RecipeImportError(ValueError):
+    """Ошибка в записи файла импорта."""
+
+
+def check_amount(value, field):
+    if (
+        not isinstance(value, int)
+        or not MIN_AMOUNT_VALUE <= value <= MAX_AMOUNT_VALUE
+    ):
+        raise RecipeImportError(
+            f'{field}: ожидается целое число от {MIN_AMOUNT_VALUE} '
+            f'до {MAX_AMOUNT_VALUE}.'
+        )
+    return value
+
+
+class Command(BaseCommand):
+    help = (
+        'Потоковый импорт рецептов из файла NDJSON. Каждая строка — объект '
+        'с полями author (username), name, text, cooking_time, image (путь '
+        'в MEDIA_ROOT), tags (слаги) и ingredients (name, measurement_unit, '
+        'amount).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', help='Путь к файлу NDJSON или "-" для чтения из stdin.'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=IMPORT_BATCH_SIZE,
+            help='Количество рецептов, записываемых за одну транзакцию.'
+        )
+
+    def handle(self, *args, path, batch_size, **options):
+        if batch_size < 1:
+            raise CommandError('Размер порции должен быть положительным.')
+        self.load_references()
+        self.imported = self.skipped = 0
+        self.started = time.monotonic()
+        try:
+            source = (
+                nullcontext(sys.stdin) if path == '-'
+                else open(path, encoding='utf-8')
+            )
+        except OSError as error:
+            raise CommandError(f'Не удалось открыть {path}: {error}')
+        with source as lines:
+            batch = []
+            for line_number, line in enumerate(lines, 1):
+                record = self.parse_line(line_number, line)
+                if record is None:
+                    continue
+                batch.append(record)
+                if len(batch) >= batch_size:
+                    self.write_batch(batch)
+                    batch = []
+            if batch:
+                self.write_batch(batch)
+        if self.imported:
+            bump_versions(RECIPES)
+            ingredient_index.invalidate()
+        self.stdout.write(self.style.SUCCESS(
+            f'Импортировано рецептов: {self.imported}, '
+            f'пропущено строк: {self.skipped}, {self.get_rate():.0f} в секунду'
+        ))
+
+    def load_references(self):
+        """Загрузка справочников для сопоставления записей в памяти."""
+        self.authors = dict(User.objects.values_list('username', 'id'))
+        self.tags = {}
+        for pk, slug, name in Tag.objects.values_list('id', 'slug', 'name'):
+            self.tags[slug] = self.tags[name] = pk
+        self.ingredients = {}
+        self.ingredients_by_name = {}
+        for pk, name, unit in Ingredient.objects.values_list(
+            'id', 'name', 'measurement_unit'
+        ):
+            self.ingredients[name, unit] = pk
+            self.ingredients_by_name[name] = (
+                None if name in self.ingredients_by_name else pk
+            )
+        self.existing = set(Recipe.objects.values_list('author_id', 'name'))
+
+    def parse_line(self, line_number, line):
+        if not line.strip():
+            return None
+        try:
+            record = self.parse_record(json.loads(line))
+        except (RecipeImportError, json.JSONDecodeError) as error:
+            self.skipped += 1
+            self.stderr.write(self.style.WARNING(
+                f'Строка {line_number} пропущена: {error}'
+            ))
+            return None
+        self.existing.add((record['author_id'], record['name']))
+        return record
+
+    def parse_record(self, data):
+        if not isinstance(data, dict):
+            raise RecipeImportError('ожидается объект JSON.')
+        try:
+            author_id = self.authors[data['author']]
+        except KeyError:
+            raise RecipeImportError('автор не указан или не найден.')
+        except TypeError:
+            raise RecipeImportError('неверное имя автора.')
+        name, text, image = (
+            data.get('name'), data.get('text'), data.get('image')
+        )
+        if not all(isinstance(value, str) and value
+                   for value in (name, text, image)):
+            raise RecipeImportError('name, text и image обязательны.')
+        if len(name) > MAX_NAME_LENGTH_RECIPES:
+            raise RecipeImportError('слишком длинное название.')
+        if (author_id, name) in self.existing:
+            raise RecipeImportError(f'рецепт «{name}» у автора уже есть.')
+        return {
+            'author_id': author_id,
+            'name': name,
+            'text': text,
+            'image': image,
+            'cooking_time': check_amount(
+                data.get('cooking_time'), 'cooking_time'
+            ),
+            'tags': self.parse_tags(data.get('tags')),
+            'ingredients': self.parse_ingredients(data.get('ingredients')),
+        }
+
+    def parse_tags(self, tags):
+        if not isinstance(tags, list) or not tags:
+            raise RecipeImportError('нужен непустой список tags.')
+        try:
+            tag_ids = {self.tags[tag] for tag in tags}
+        except (KeyError, TypeError):
+            raise RecipeImportError('неизвестный тег.')
+        return tag_ids
+
+    def parse_ingredients(self, ingredients):
+        if not isinstance(ingredients, list) or not ingredients:
+            raise RecipeImportError('нужен непустой список ingredients.')
+        amounts = {}
+        for item in ingredients:
+            if not isinstance(item, dict):
+                raise RecipeImportError('ингредиент должен быть объектом.')
+            ingredient_id = self.find_ingredient(
+                item.get('name'), item.get('measurement_unit')
+            )
+            if ingredient_id in amounts:
+                raise RecipeImportError('ингредиенты повторяются.')
+            amounts[ingredient_id] = check_amount(item.get('amount'), 'amount')
+        return amounts
+
+    def find_ingredient(self, name, unit):
+        try:
+            if unit is None:
+                ingredient_id = self.ingredients_by_name[name]
+            else:
+                ingredient_id = self.ingredients[name, unit]
+        except (KeyError, TypeError):
+            ingredient_id = None
+        if ingredient_id is None:
+            raise RecipeImportError(f'ингредиент «{name}» не найден.')
+        return ingredient_id
+
+    @transaction.atomic
+    def write_batch(self, batch):
+        """Запись порции рецептов вместе с ингредиентами и тегами."""
+        now = timezone.now()
+        recipes, ingredients, tags = [], [], []
+        for pk, record in zip(allocate_pks(Recipe, len(batch)), batch):
+            recipes.append((
+                pk, record['author_id'], record['name'], record['image'],
+                record['text'], record['cooking_time'], now, now,
+                generate_short_hash(pk)
+            ))
+            ingredients.extend(
+                (pk, ingredient_id, amount)
+                for ingredient_id, amount in record['ingredients'].items()
+            )
+            tags.extend((pk, tag_id) for tag_id in record['tags'])
+        bulk_insert(Recipe, RECIPE_FIELDS, recipes)
+        bulk_insert(IngredientInRecipe, INGREDIENT_FIELDS, ingredients)
+        bulk_insert(Recipe.tags.through, TAG_FIELDS, tags)
+        update_search_index(
+            (recipe[0], recipe[2], recipe[4]) for recipe in recipes
+        )
+        fan_out_recipes(
+            (recipe[0], recipe[1], recipe[6]) for recipe in recipes
+        )
+        publish_ingredient_changes(
+            (pk, (), record['ingredients'])
+            for pk, record in zip((recipe[0] for recipe in recipes), batch)
+        )
+        self.imported += len(batch)
+        self.stdout.write(
+            f'Записано рецептов: {self.imported} '
+            f'({self.get_rate():.0f} в секунду)'
+        )
+
+    def get_rate(self):
+        return self.imported / max(time.monotonic() - self.started, 1e-6)
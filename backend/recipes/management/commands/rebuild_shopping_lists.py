@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipes.services import rebuild_shopping_lists
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересборка сводных списков покупок по содержимому корзин. '
+        'Нужна после правки корзин или рецептов в обход приложения, '
+        'например прямыми запросами к базе.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'users',
+            nargs='*',
+            type=int,
+            help='id пользователей; по умолчанию пересобираются все списки.'
+        )
+
+    def handle(self, *args, users, **options):
+        with transaction.atomic():
+            rebuild_shopping_lists(users or None)
+        self.stdout.write(self.style.SUCCESS('Списки покупок пересобраны.'))
@@ -0,0 +1,215 @@
+import csv
+import hashlib
+import json
+import re
+from collections import defaultdict
+from functools import partial
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from api.versions import INGREDIENTS, bump_versions
+from recipes.constants import (
+    CATALOG_BATCH_SIZE, CATALOG_READ_CHUNK_SIZE, MAX_MEASUREMENT_LENGTH,
+    MAX_NAME_LENGTH_INGREDIENT
+)
+from recipes.ingredient_index import ingredient_index
+from recipes.models import (
+    CatalogChecksum, Ingredient, IngredientInRecipe, ShoppingListItem
+)
+from recipes.signals import catalog_checksums_kept
+
+JSON_SEPARATORS = re.compile(r'[\s,]*')
+
+
+def get_file_checksum(path, *extra):
+    checksum = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for chunk in iter(partial(file.read, CATALOG_READ_CHUNK_SIZE), b''):
+            checksum.update(chunk)
+    for value in extra:
+        checksum.update(value.encode())
+    return checksum.hexdigest()
+
+
+def iter_csv_rows(file):
+    for row in csv.reader(file):
+        if row:
+            yield row[0], row[1] if len(row) > 1 else ''
+
+
+def iter_json_rows(file):
+    """Потоковый разбор JSON-массива без чтения файла целиком."""
+    decoder = json.JSONDecoder()
+    buffer, position, offset, started = '', 0, 0, False
+    for chunk in iter(partial(file.read, CATALOG_READ_CHUNK_SIZE), ''):
+        offset += position
+        buffer = buffer[position:] + chunk
+        position = 0
+        if not started:
+            stripped = buffer.lstrip()
+            offset += len(buffer) - len(stripped)
+            buffer = stripped
+            if not buffer:
+                continue
+            if buffer[0] != '[':
+                raise ValueError('ожидается JSON-массив.')
+            started, position = True, 1
+        while True:
+            position = JSON_SEPARATORS.match(buffer, position).end()
+            if buffer.startswith(']', position):
+                return
+            try:
+                item, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                break
+            if not isinstance(item, dict):
+                raise ValueError(
+                    f'ожидается объект в позиции {offset + position}.'
+                )
+            position = end
+            yield item.get('name'), item.get('measurement_unit')
+    raise ValueError('неожиданный конец JSON-массива.')
+
+
+READERS = {
+    '.csv': iter_csv_rows,
+    '.json': iter_json_rows,
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Синхронизация справочника ингредиентов с файлом CSV или JSON: '
+        'добавляются новые записи, обновляются единицы измерения и, '
+        'с --prune, удаляются неиспользуемые записи, которых нет в файле.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path',
+            nargs='?',
+            default=str(settings.BASE_DIR / 'data' / 'ingredients.csv'),
+            help='Файл справочника (.csv или .json).'
+        )
+        parser.add_argument(
+            '--prune',
+            action='store_true',
+            help='Удалить ингредиенты, отсутствующие в файле.'
+        )
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Выполнить синхронизацию, даже если файл не менялся.'
+        )
+
+    def handle(self, *args, path, prune, force, **options):
+        reader = READERS.get(path[path.rfind('.'):].lower())
+        if reader is None:
+            raise CommandError('Поддерживаются только файлы .csv и .json.')
+        try:
+            checksum = get_file_checksum(path, 'prune' if prune else '')
+        except OSError as error:
+            raise CommandError(f'Не удалось прочитать {path}: {error}')
+        stored = CatalogChecksum.objects.filter(source=path).values_list(
+            'checksum', flat=True
+        ).first()
+        if stored == checksum and not force:
+            self.stdout.write(self.style.SUCCESS(
+                'Справочник не изменился, синхронизация не требуется.'
+            ))
+            return
+        with open(path, encoding='utf-8') as file:
+            try:
+                source = self.read_source(reader(file))
+            except ValueError as error:
+                raise CommandError(f'Ошибка чтения {path}: {error}')
+        with transaction.atomic(), catalog_checksums_kept():
+            changed = self.apply(*self.get_changes(source), prune)
+            if changed:
+                CatalogChecksum.objects.exclude(source=path).delete()
+            CatalogChecksum.objects.update_or_create(
+                source=path, defaults={'checksum': checksum}
+            )
+        if changed:
+            ingredient_index.invalidate()
+            bump_versions(INGREDIENTS)
+
+    def read_source(self, rows):
+        source = set()
+        for name, unit in rows:
+            if not (isinstance(name, str) and isinstance(unit, str)):
+                continue
+            name, unit = name.strip(), unit.strip()
+            if (
+                not name or not unit
+                or len(name) > MAX_NAME_LENGTH_INGREDIENT
+                or len(unit) > MAX_MEASUREMENT_LENGTH
+            ):
+                self.stderr.write(self.style.WARNING(
+                    f'Пропущена запись «{name}» ({unit}).'
+                ))
+                continue
+            source.add((name, unit))
+        return source
+
+    def get_changes(self, source):
+        """Разница между файлом и базой по паре (название, единицы).
+
+        Если у названия в файле и в базе ровно по одной записи и они
+        расходятся только единицами, запись обновляется, а не заменяется,
+        чтобы сохранить ссылки рецептов на ингредиент.
+        """
+        existing = {
+            (name, unit): pk for pk, name, unit
+            in Ingredient.objects.values_list('id', 'name', 'measurement_unit')
+        }
+        to_insert, to_remove = defaultdict(list), defaultdict(list)
+        for name, unit in source.difference(existing):
+            to_insert[name].append(unit)
+        for name, unit in set(existing).difference(source):
+            to_remove[name].append(existing[name, unit])
+        to_update = {}
+        for name in to_insert.keys() & to_remove.keys():
+            if len(to_insert[name]) == len(to_remove[name]) == 1:
+                to_update[to_remove.pop(name)[0]] = to_insert.pop(name)[0]
+        return (
+            [
+                Ingredient(name=name, measurement_unit=unit)
+                for name, units in to_insert.items() for unit in units
+            ],
+            to_update,
+            [pk for pks in to_remove.values() for pk in pks]
+        )
+
+    def apply(self, to_insert, to_update, to_remove, prune):
+        Ingredient.objects.bulk_create(
+            to_insert, batch_size=CATALOG_BATCH_SIZE
+        )
+        Ingredient.objects.bulk_update(
+            [
+                Ingredient(pk=pk, measurement_unit=unit)
+                for pk, unit in to_update.items()
+            ],
+            ('measurement_unit',),
+            batch_size=CATALOG_BATCH_SIZE
+        )
+        removed = 0
+        if prune:
+            removable = Ingredient.objects.filter(pk__in=to_remove).exclude(
+                pk__in=IngredientInRecipe.objects.values('ingredients_id')
+            ).exclude(
+                pk__in=ShoppingListItem.objects.values('ingredient_id')
+            )
+            removable = list(removable.values_list('id', flat=True))
+            for start in range(0, len(removable), CATALOG_BATCH_SIZE):
+                removed += Ingredient.objects.filter(
+                    pk__in=removable[start:start + CATALOG_BATCH_SIZE]
+                ).delete()[1].get(Ingredient._meta.label, 0)
+        self.stdout.write(self.style.SUCCESS(
+            f'Добавлено: {len(to_insert)}, обновлено: {len(to_update)}, '
+            f'удалено: {removed}, '
+            f'отсутствуют в файле: {len(to_remove) - removed}'
+        ))
+        return bool(to_insert or to_update or removed)
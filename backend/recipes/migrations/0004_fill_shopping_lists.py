@@ -0,0 +1,50 @@
+from django.db import migrations
+from django.db.models import Sum
+
+BATCH_SIZE = 1000
+
+
+def fill_shopping_lists(apps, schema_editor):
+    ShoppingCart = apps.get_model('recipes', 'ShoppingCart')
+    ShoppingList = apps.get_model('recipes', 'ShoppingList')
+    ShoppingListItem = apps.get_model('recipes', 'ShoppingListItem')
+    IngredientInRecipe = apps.get_model('recipes', 'IngredientInRecipe')
+    ShoppingList.objects.bulk_create(
+        [
+            ShoppingList(user_id=user_id)
+            for user_id in ShoppingCart.objects.order_by().values_list(
+                'user_id', flat=True
+            ).distinct()
+        ],
+        ignore_conflicts=True
+    )
+    list_ids = dict(ShoppingList.objects.values_list('user_id', 'id'))
+    ShoppingListItem.objects.all().delete()
+    ShoppingListItem.objects.bulk_create(
+        (
+            ShoppingListItem(
+                shopping_list_id=list_ids[
+                    total['recipe__shopping_carts__user_id']
+                ],
+                ingredient_id=total['ingredients_id'],
+                amount=total['total_amount'],
+            )
+            for total in IngredientInRecipe.objects.filter(
+                recipe__shopping_carts__isnull=False
+            ).values(
+                'recipe__shopping_carts__user_id', 'ingredients_id'
+            ).annotate(total_amount=Sum('amount')).order_by().iterator()
+        ),
+        batch_size=BATCH_SIZE
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0003_shopping_list'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_shopping_lists, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.3 on 2026-10-17 02:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0005_recipe_modified'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='recipe',
+            name='short_hash',
+            field=models.CharField(editable=False, max_length=8, unique=True, verbose_name='Короткий хеш для ссылки'),
+        ),
+    ]
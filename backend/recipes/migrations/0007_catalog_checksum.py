@@ -0,0 +1,26 @@
+# Generated by Django 3.2.3 on 2026-10-17 02:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0006_recipe_short_code'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogChecksum',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(max_length=255, unique=True, verbose_name='Источник')),
+                ('checksum', models.CharField(max_length=64, verbose_name='Контрольная сумма')),
+                ('updated', models.DateTimeField(auto_now=True, verbose_name='Дата синхронизации')),
+            ],
+            options={
+                'verbose_name': 'Контрольная сумма справочника',
+                'verbose_name_plural': 'Контрольные суммы справочников',
+            },
+        ),
+    ]
@@ -0,0 +1,41 @@
+from django.db import migrations
+
+FEED_BACKFILL_SIZE = 500
+BATCH_SIZE = 1000
+
+
+def fill_feed_entries(apps, schema_editor):
+    Subscriptions = apps.get_model('users', 'Subscriptions')
+    Recipe = apps.get_model('recipes', 'Recipe')
+    FeedEntry = apps.get_model('recipes', 'FeedEntry')
+    latest = {}
+    batch = []
+    for user_id, author_id in Subscriptions.objects.values_list(
+        'user_id', 'author_id'
+    ).iterator():
+        if author_id not in latest:
+            latest[author_id] = list(
+                Recipe.objects.filter(author_id=author_id).order_by(
+                    '-pub_date', '-id'
+                ).values_list('id', flat=True)[:FEED_BACKFILL_SIZE]
+            )
+        batch.extend(
+            FeedEntry(user_id=user_id, recipe_id=recipe_id, author_id=author_id)
+            for recipe_id in latest[author_id]
+        )
+        if len(batch) >= BATCH_SIZE:
+            FeedEntry.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    FeedEntry.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_auto_20250611_0717'),
+        ('recipes', '0009_feed_entry'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_feed_entries, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 3.2.3 on 2026-10-17 03:50
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+import django.db.models.deletion
+
+FEED_PULL_THRESHOLD = 5000
+
+
+def fill_pull_authors(apps, schema_editor):
+    Subscriptions = apps.get_model('users', 'Subscriptions')
+    FeedPullAuthor = apps.get_model('recipes', 'FeedPullAuthor')
+    FeedPullAuthor.objects.bulk_create(
+        FeedPullAuthor(author_id=author_id)
+        for author_id in Subscriptions.objects.order_by().values(
+            'author_id'
+        ).annotate(followers=Count('user')).filter(
+            followers__gt=FEED_PULL_THRESHOLD
+        ).values_list('author_id', flat=True)
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('users', '0003_subscriptions_user_author_index'),
+        ('recipes', '0012_feed_entry_pub_date'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeedPullAuthor',
+            fields=[
+                ('author', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='feed_pull_mode', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='Автор')),
+                ('backfill_pending', models.BooleanField(default=False, verbose_name='Ожидает дозаписи лент')),
+            ],
+            options={
+                'verbose_name': 'Автор с чтением при запросе ленты',
+                'verbose_name_plural': 'Авторы с чтением при запросе ленты',
+            },
+        ),
+        migrations.RunPython(fill_pull_authors, migrations.RunPython.noop),
+    ]
@@ -1,8 +1,13 @@
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import MaxValueValidator, MinValueValidator
-from django.db import models
+from django.db import models, transaction
 
 from .constants import (
+    CATALOG_CHECKSUM_LENGTH,
+    DEFAULT_SHOPPING_LIST_VERSION,
     MAX_AMOUNT_VALUE,
+    MAX_CATALOG_SOURCE_LENGTH,
     MAX_PREVIEW_LENGTH,
     MAX_MEASUREMENT_LENGTH,
     MAX_NAME_AND_SLUG_LENGTH_TAGS,
@@ -11,7 +16,7 @@ from .constants import (
     MIN_AMOUNT_VALUE,
     SHORT_HASH_LENGTH
 )
-from .services import generate_short_hash
+from .services import allocate_pks, generate_short_hash
 from users.models import User
 
 
@@ -65,6 +70,13 @@ class Ingredient(models.Model):
         return self.name[:MAX_PREVIEW_LENGTH]
 
 
+class RecipeManager(models.Manager):
+    """Менеджер рецептов, не загружающий поисковый вектор."""
+
+    def get_queryset(self):
+        return super().get_queryset().defer('search_vector')
+
+
 class Recipe(models.Model):
     """Модель рецептов."""
 
@@ -113,16 +125,26 @@ class Recipe(models.Model):
         auto_now_add=True,
         editable=False,
     )
+    modified = models.DateTimeField(
+        verbose_name='Дата изменения рецепта',
+        auto_now=True,
+        editable=False,
+    )
     short_hash = models.CharField(
         max_length=SHORT_HASH_LENGTH,
         unique=True,
         editable=False,
         verbose_name='Короткий хеш для ссылки',
-        db_index=True
+    )
+    search_vector = SearchVectorField(
+        null=True,
+        editable=False,
     )
 
+    objects = RecipeManager()
+
     class Meta:
-        ordering = ('-pub_date',)
+        ordering = ('-pub_date', '-id')
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
         constraints = (
@@ -131,14 +153,40 @@ class Recipe(models.Model):
                 name='unique_name_author'
             ),
         )
+        indexes = (
+            models.Index(
+                fields=('-pub_date', '-id'),
+                name='recipe_pub_date_idx'
+            ),
+            models.Index(
+                fields=('author', '-pub_date', '-id'),
+                name='recipe_author_pub_date_idx'
+            ),
+            GinIndex(
+                fields=('search_vector',),
+                name='recipe_search_vector_idx'
+            ),
+        )
 
     def __str__(self):
         return f'{self.name[:MAX_PREVIEW_LENGTH]} от {self.author}'
 
     def save(self, *args, **kwargs):
-        if not self.pk:
-            self.short_hash = generate_short_hash(self.__class__)
-        super().save(*args, **kwargs)
+        """Сохранение рецепта с коротким кодом, записанным при вставке.
+
+        Первичный ключ нового рецепта резервируется заранее, как при
+        массовом импорте, поэтому код известен до INSERT и второй запрос
+        для его записи не нужен.
+        """
+        if self.pk is not None:
+            super().save(*args, **kwargs)
+            return
+        with transaction.atomic(savepoint=False):
+            self.pk = allocate_pks(Recipe, 1)[0]
+            self.short_hash = generate_short_hash(self.pk)
+            if not args:
+                kwargs['force_insert'] = True
+            super().save(*args, **kwargs)
 
 
 class IngredientInRecipe(models.Model):
@@ -171,7 +219,6 @@ class IngredientInRecipe(models.Model):
     )
 
     class Meta:
-        ordering = ('recipe',)
         verbose_name = 'Список ингредиентов'
         verbose_name_plural = 'Список ингредиентов'
         constraints = (
@@ -201,7 +248,6 @@ class UserRecipeBaseModel(models.Model):
 
     class Meta:
         abstract = True
-        ordering = ('user',)
         constraints = (
             models.UniqueConstraint(
                 fields=('user', 'recipe'),
@@ -229,3 +275,155 @@ class ShoppingCart(UserRecipeBaseModel):
         verbose_name = 'Список покупок'
         verbose_name_plural = 'Список покупок'
         default_related_name = 'shopping_carts'
+
+
+class ShoppingList(models.Model):
+    """Модель агрегированного списка покупок пользователя."""
+
+    user = models.OneToOneField(
+        User,
+        verbose_name='Пользователь',
+        on_delete=models.CASCADE,
+        related_name='shopping_list',
+    )
+    version = models.PositiveIntegerField(
+        verbose_name='Версия',
+        default=DEFAULT_SHOPPING_LIST_VERSION,
+    )
+
+    class Meta:
+        verbose_name = 'Сводный список покупок'
+        verbose_name_plural = 'Сводные списки покупок'
+
+    def __str__(self):
+        return f'Список покупок {self.user} (версия {self.version})'
+
+
+class ShoppingListItem(models.Model):
+    """Модель суммарного количества ингредиента в списке покупок."""
+
+    shopping_list = models.ForeignKey(
+        ShoppingList,
+        verbose_name='Список покупок',
+        on_delete=models.CASCADE,
+        related_name='items',
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        verbose_name='Ингредиент',
+        on_delete=models.CASCADE,
+        related_name='shopping_list_items',
+    )
+    amount = models.PositiveIntegerField(
+        verbose_name='Количество',
+    )
+
+    class Meta:
+        verbose_name = 'Позиция списка покупок'
+        verbose_name_plural = 'Позиции списка покупок'
+        constraints = (
+            models.UniqueConstraint(
+                fields=('shopping_list', 'ingredient'),
+                name='unique_shopping_list_ingredient'
+            ),
+        )
+
+    def __str__(self):
+        return f'{self.ingredient} — {self.amount}'
+
+
+class CatalogChecksum(models.Model):
+    """Модель контрольной суммы последнего загруженного справочника."""
+
+    source = models.CharField(
+        max_length=MAX_CATALOG_SOURCE_LENGTH,
+        unique=True,
+        verbose_name='Источник',
+    )
+    checksum = models.CharField(
+        max_length=CATALOG_CHECKSUM_LENGTH,
+        verbose_name='Контрольная сумма',
+    )
+    updated = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Дата синхронизации',
+    )
+
+    class Meta:
+        verbose_name = 'Контрольная сумма справочника'
+        verbose_name_plural = 'Контрольные суммы справочников'
+
+    def __str__(self):
+        return f'{self.source}: {self.checksum}'
+
+
+class FeedEntry(models.Model):
+    """Модель записи ленты подписок пользователя."""
+
+    user = models.ForeignKey(
+        User,
+        verbose_name='Пользователь',
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        verbose_name='Рецепт',
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+    )
+    author = models.ForeignKey(
+        User,
+        verbose_name='Автор рецепта',
+        on_delete=models.CASCADE,
+        related_name='+',
+    )
+    pub_date = models.DateTimeField(
+        verbose_name='Дата публикации рецепта',
+    )
+
+    class Meta:
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи ленты'
+        constraints = (
+            models.UniqueConstraint(
+                fields=('user', 'recipe'),
+                name='unique_feed_user_recipe'
+            ),
+        )
+        indexes = (
+            models.Index(
+                fields=('user', 'author'),
+                name='feed_user_author_idx'
+            ),
+            models.Index(
+                fields=('user', '-pub_date', '-recipe'),
+                name='feed_user_pub_date_idx'
+            ),
+        )
+
+    def __str__(self):
+        return f'{self.recipe} в ленте {self.user}'
+
+
+class FeedPullAuthor(models.Model):
+    """Модель автора, рецепты которого подмешиваются в ленты при чтении."""
+
+    author = models.OneToOneField(
+        User,
+        verbose_name='Автор',
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='feed_pull_mode',
+    )
+    backfill_pending = models.BooleanField(
+        default=False,
+        verbose_name='Ожидает дозаписи лент',
+    )
+
+    class Meta:
+        verbose_name = 'Автор с чтением при запросе ленты'
+        verbose_name_plural = 'Авторы с чтением при запросе ленты'
+
+    def __str__(self):
+        return str(self.author)
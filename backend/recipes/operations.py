@@ -0,0 +1,55 @@
+from django.contrib.postgres.indexes import PostgresIndex
+from django.db.migrations.operations import AddIndex
+
+INVALID_INDEX_SQL = '''
+    SELECT 1 FROM pg_index
+    JOIN pg_class ON pg_class.oid = pg_index.indexrelid
+    WHERE pg_class.relname = %s AND NOT pg_index.indisvalid
+'''
+
+
+class AddIndexConcurrently(AddIndex):
+    """Создание индекса без блокировки записи в таблицу.
+
+    На PostgreSQL индекс строится через CREATE INDEX CONCURRENTLY, поэтому
+    миграция должна быть объявлена с atomic = False. Недостроенный индекс,
+    оставшийся после прерванной попытки, удаляется перед повтором. На
+    остальных базах выполняется обычный CREATE INDEX, а индексы,
+    доступные только в PostgreSQL (GIN и другие), пропускаются.
+    """
+
+    atomic = False
+
+    def describe(self):
+        return f'{super().describe()} concurrently'
+
+    def database_forwards(self, app_label, schema_editor, from_state,
+                          to_state):
+        if schema_editor.connection.vendor != 'postgresql':
+            if isinstance(self.index, PostgresIndex):
+                return None
+            return super().database_forwards(
+                app_label, schema_editor, from_state, to_state
+            )
+        model = to_state.apps.get_model(app_label, self.model_name)
+        if not self.allow_migrate_model(schema_editor.connection.alias, model):
+            return
+        with schema_editor.connection.cursor() as cursor:
+            cursor.execute(INVALID_INDEX_SQL, (self.index.name,))
+            if cursor.fetchone():
+                schema_editor.remove_index(
+                    model, self.index, concurrently=True
+                )
+        schema_editor.add_index(model, self.index, concurrently=True)
+
+    def database_backwards(self, app_label, schema_editor, from_state,
+                           to_state):
+        if schema_editor.connection.vendor != 'postgresql':
+            if isinstance(self.index, PostgresIndex):
+                return None
+            return super().database_backwards(
+                app_label, schema_editor, from_state, to_state
+            )
+        model = from_state.apps.get_model(app_label, self.model_name)
+        if self.allow_migrate_model(schema_editor.connection.alias, model):
+            schema_editor.remove_index(model, self.index, concurrently=True)
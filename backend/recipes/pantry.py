@@ -0,0 +1,217 @@
+import threading
+import time
+from collections import defaultdict
+
+import numpy as np
+from django.core.cache import cache
+from django.db import transaction
+
+from .constants import (
+    PANTRY_CHANGE_KEY_PREFIX, PANTRY_CHANGE_TIMEOUT, PANTRY_FETCH_SIZE,
+    PANTRY_INDEX_TTL, PANTRY_MAX_REPLAY, PANTRY_MAX_RESULTS,
+    PANTRY_SEQUENCE_KEY
+)
+from .models import IngredientInRecipe
+
+
+def _change_key(sequence):
+    return f'{PANTRY_CHANGE_KEY_PREFIX}:{sequence}'
+
+
+def _get_sequence():
+    cache.add(PANTRY_SEQUENCE_KEY, 0, None)
+    return cache.get(PANTRY_SEQUENCE_KEY) or 0
+
+
+def publish_ingredient_changes(changes):
+    """Публикация изменений состава рецептов для всех процессов.
+
+    changes — тройки (id рецепта, прежние id ингредиентов, новые id
+    ингредиентов); None вместо прежних id заменяет всё, что индекс знает
+    о рецепте. Изменения получают последовательные номера в кеше после
+    фиксации транзакции; процессы применяют их к своим индексам при
+    следующем запросе.
+    """
+    changes = [
+        (recipe_id, None if old is None else tuple(old), tuple(new))
+        for recipe_id, old, new in changes
+    ]
+    if changes:
+        transaction.on_commit(lambda: _publish(changes))
+
+
+def _publish(changes):
+    _get_sequence()
+    last = cache.incr(PANTRY_SEQUENCE_KEY, len(changes))
+    cache.set_many(
+        {
+            _change_key(sequence): change for sequence, change in zip(
+                range(last - len(changes) + 1, last + 1), changes
+            )
+        },
+        PANTRY_CHANGE_TIMEOUT
+    )
+
+
+_pantry_state = threading.local()
+
+
+def schedule_ingredient_changes(recipe_ids):
+    """Публикация составов рецептов после фиксации транзакции.
+
+    Нужна для изменений ингредиентов рецептов в обход API: в админке и
+    при каскадном удалении рецептов и ингредиентов. Затронутые рецепты
+    копятся до фиксации, затем публикуется их текущий состав из базы.
+    После отката рецепты остаются в очереди и лишь публикуются ещё раз
+    при следующей фиксации.
+    """
+    pending = getattr(_pantry_state, 'pending', None)
+    if pending is None:
+        pending = _pantry_state.pending = set()
+    pending.update(recipe_ids)
+    transaction.on_commit(_publish_pending_changes)
+
+
+def _publish_pending_changes():
+    pending = getattr(_pantry_state, 'pending', None)
+    if pending is None:
+        return
+    _pantry_state.pending = None
+    ingredients = defaultdict(list)
+    for recipe_id, ingredient_id in IngredientInRecipe.objects.filter(
+        recipe_id__in=pending
+    ).order_by().values_list('recipe_id', 'ingredients_id'):
+        ingredients[recipe_id].append(ingredient_id)
+    _publish([
+        (recipe_id, None, tuple(ingredients[recipe_id]))
+        for recipe_id in pending
+    ])
+
+
+def _contains(posting, row):
+    position = np.searchsorted(posting, row)
+    return position < len(posting) and posting[position] == row
+
+
+class PantryIndex:
+    """Обратный индекс ингредиент → рецепты для подбора по продуктам.
+
+    Для каждого ингредиента хранится отсортированный массив номеров
+    рецептов (сжатое представление битовой карты), для каждого рецепта —
+    число его ингредиентов. Покрытие набора продуктов считается одним
+    np.bincount по спискам выбранных ингредиентов.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._state = None
+
+    def build(self):
+        sequence = _get_sequence()
+        pairs = np.array(
+            list(IngredientInRecipe.objects.order_by().values_list(
+                'recipe_id', 'ingredients_id'
+            ).iterator(chunk_size=PANTRY_FETCH_SIZE)),
+            dtype=np.int64
+        ).reshape(-1, 2)
+        recipe_ids, rows = np.unique(pairs[:, 0], return_inverse=True)
+        order = np.lexsort((rows, pairs[:, 1]))
+        ingredient_ids, starts = np.unique(
+            pairs[order, 1], return_index=True
+        )
+        postings = np.split(rows[order].astype(np.int32), starts[1:])
+        return {
+            'sequence': sequence,
+            'expires_at': time.monotonic() + PANTRY_INDEX_TTL,
+            'recipe_ids': recipe_ids,
+            'rows': {
+                int(recipe_id): row for row, recipe_id in enumerate(recipe_ids)
+            },
+            'counts': np.bincount(rows, minlength=len(recipe_ids)),
+            'postings': dict(zip(ingredient_ids.tolist(), postings))
+            if len(ingredient_ids) else {},
+        }
+
+    @staticmethod
+    def apply(state, recipe_id, old, new):
+        """Применение изменения; повторное применение ничего не меняет."""
+        row = state['rows'].get(recipe_id)
+        if row is None:
+            if not new:
+                return
+            row = len(state['recipe_ids'])
+            state['rows'][recipe_id] = row
+            state['recipe_ids'] = np.append(state['recipe_ids'], recipe_id)
+            state['counts'] = np.append(state['counts'], 0)
+            old = ()
+        postings = state['postings']
+        if old is None:
+            old = [
+                ingredient_id for ingredient_id, posting in postings.items()
+                if _contains(posting, row)
+            ]
+        for ingredient_id in set(old).difference(new):
+            posting = postings.get(ingredient_id)
+            if posting is not None:
+                postings[ingredient_id] = posting[posting != row]
+        for ingredient_id in set(new).difference(old):
+            posting = postings.get(ingredient_id, np.empty(0, np.int32))
+            if not _contains(posting, row):
+                postings[ingredient_id] = np.insert(
+                    posting, np.searchsorted(posting, row), row
+                )
+        state['counts'][row] = len(new)
+
+    def refresh(self):
+        state = self._state
+        if state is None or state['expires_at'] < time.monotonic():
+            self._state = self.build()
+            return
+        sequence = _get_sequence()
+        if sequence == state['sequence']:
+            return
+        keys = [
+            _change_key(number)
+            for number in range(state['sequence'] + 1, sequence + 1)
+        ]
+        changes = (
+            cache.get_many(keys) if 0 < len(keys) <= PANTRY_MAX_REPLAY
+            else {}
+        )
+        if not keys or len(changes) != len(keys):
+            self._state = self.build()
+            return
+        for key in keys:
+            self.apply(state, *changes[key])
+        state['sequence'] = sequence
+
+    def match(self, ingredient_ids, missing=0):
+        """Рецепты, для которых не хватает не больше missing ингредиентов.
+
+        Порядок — по доле имеющихся ингредиентов, затем по числу
+        недостающих и от новых рецептов к старым.
+        """
+        with self._lock:
+            self.refresh()
+            state = self._state
+            postings = [
+                state['postings'][ingredient_id]
+                for ingredient_id in set(ingredient_ids)
+                if ingredient_id in state['postings']
+            ]
+            if not postings:
+                return []
+            counts = state['counts']
+            covered = np.bincount(
+                np.concatenate(postings), minlength=len(counts)
+            )
+            rows = np.flatnonzero(
+                (covered > 0) & (counts - covered <= missing)
+            )
+            covered, counts = covered[rows], counts[rows]
+            recipe_ids = state['recipe_ids'][rows]
+        order = np.lexsort((-recipe_ids, counts - covered, -covered / counts))
+        return recipe_ids[order[:PANTRY_MAX_RESULTS]].tolist()
+
+
+pantry_index = PantryIndex()
@@ -0,0 +1,114 @@
+import re
+
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connection
+from django.db.models import F, FloatField
+from django.db.models.expressions import RawSQL
+
+from .constants import (
+    SEARCH_CONFIG, SEARCH_FTS_TABLE, SEARCH_MIN_STEM_LENGTH,
+    SEARCH_NAME_WEIGHT, SEARCH_TEXT_WEIGHT, SEARCH_WORD_ENDINGS
+)
+
+WORD_PATTERN = re.compile(r'\w+')
+
+
+def is_postgresql():
+    return connection.vendor == 'postgresql'
+
+
+def normalize_text(value):
+    return value.casefold().replace('ё', 'е')
+
+
+def stem_word(word):
+    """Упрощённое отсечение окончания русского слова.
+
+    В FTS5 нет русского стеммера, поэтому слово запроса обрезается до
+    основы и ищется по префиксу: «блины» находит «блин» и «блинами».
+    """
+    for ending in SEARCH_WORD_ENDINGS:
+        if (
+            word.endswith(ending)
+            and len(word) - len(ending) >= SEARCH_MIN_STEM_LENGTH
+        ):
+            return word[:-len(ending)]
+    return word
+
+
+def build_fts_query(query):
+    return ' '.join(
+        f'"{stem_word(word)}"*'
+        for word in WORD_PATTERN.findall(normalize_text(query))
+    )
+
+
+def search_recipes(queryset, query):
+    """Рецепты, подходящие под запрос, в порядке релевантности.
+
+    В PostgreSQL поиск идёт по столбцу search_vector (tsvector с
+    конфигурацией russian и индексом GIN), который заполняет триггер;
+    в SQLite — по таблице FTS5 с названиями и описаниями рецептов.
+    """
+    if is_postgresql():
+        query = SearchQuery(
+            query, config=SEARCH_CONFIG, search_type='websearch'
+        )
+        return queryset.filter(search_vector=query).annotate(
+            search_rank=SearchRank(F('search_vector'), query)
+        ).order_by('-search_rank', '-pub_date', '-id')
+    query = build_fts_query(query)
+    if not query:
+        return queryset.none()
+    table = connection.ops.quote_name(queryset.model._meta.db_table)
+    matches = RawSQL(
+        f'SELECT rowid FROM {SEARCH_FTS_TABLE} '
+        f'WHERE {SEARCH_FTS_TABLE} MATCH %s',
+        (query,)
+    )
+    rank = RawSQL(
+        f'SELECT -bm25({SEARCH_FTS_TABLE}, {SEARCH_NAME_WEIGHT}, '
+        f'{SEARCH_TEXT_WEIGHT}) FROM {SEARCH_FTS_TABLE} '
+        f'WHERE {SEARCH_FTS_TABLE} MATCH %s '
+        f'AND {SEARCH_FTS_TABLE}.rowid = {table}.id',
+        (query,),
+        output_field=FloatField()
+    )
+    return queryset.filter(pk__in=matches).annotate(
+        search_rank=rank
+    ).order_by('-search_rank', '-pub_date', '-id')
+
+
+def update_search_index(rows):
+    """Обновление индекса SQLite по строкам (id, название, описание).
+
+    В PostgreSQL индекс поддерживает триггер, поэтому вызов ничего
+    не делает.
+    """
+    if is_postgresql():
+        return
+    rows = [
+        (pk, normalize_text(name), normalize_text(text))
+        for pk, name, text in rows
+    ]
+    if not rows:
+        return
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f'DELETE FROM {SEARCH_FTS_TABLE} WHERE rowid = %s',
+            [(pk,) for pk, _, _ in rows]
+        )
+        cursor.executemany(
+            f'INSERT INTO {SEARCH_FTS_TABLE} (rowid, name, text) '
+            'VALUES (%s, %s, %s)',
+            rows
+        )
+
+
+def remove_from_search_index(pk):
+    if is_postgresql():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {SEARCH_FTS_TABLE} WHERE rowid = %s', (pk,)
+        )
@@ -0,0 +1,151 @@
+import random
+from collections import defaultdict
+from itertools import chain, islice
+
+from .constants import (
+    SEED_BATCH_SIZE, SEED_FEED_ENTRIES, SEED_INGREDIENTS,
+    SEED_INGREDIENTS_PER_RECIPE, SEED_TAGS, SEED_TAGS_PER_RECIPE
+)
+from .feed import update_pull_modes
+from .models import (
+    Favorite, FeedEntry, Ingredient, IngredientInRecipe, Recipe,
+    ShoppingCart, Tag
+)
+from .search import update_search_index
+from .services import (
+    allocate_pks, generate_short_hash, rebuild_shopping_lists
+)
+from users.models import Subscriptions, User
+
+SEED_NAME = 'Набор'
+SEED_USERNAME = 'seed_'
+
+
+def _bulk_create(model, objects):
+    model.objects.bulk_create(objects, batch_size=SEED_BATCH_SIZE)
+
+
+def seed_dataset(recipes, users, favorites=0, carts=0, subscriptions=0,
+                 seed=0):
+    """Создание синтетических данных для проверок производительности.
+
+    favorites, carts и subscriptions задают число связей на каждого
+    пользователя. Записи создаются пакетно в обход сигналов моделей,
+    поэтому зависимые данные (короткие коды, поисковый индекс, ленты и
+    сводные списки покупок) заполняются здесь же. Вызывать функцию
+    следует в транзакции, которая затем откатывается. Возвращает id
+    созданных пользователей.
+    """
+    generator = random.Random(seed)
+    _bulk_create(User, (
+        User(
+            username=f'{SEED_USERNAME}{number}',
+            email=f'{SEED_USERNAME}{number}@example.com',
+            first_name=SEED_NAME,
+            last_name=SEED_NAME,
+            password='!',
+        ) for number in range(users)
+    ))
+    user_ids = list(User.objects.filter(
+        username__startswith=SEED_USERNAME
+    ).order_by('id').values_list('id', flat=True))
+    _bulk_create(Tag, (
+        Tag(name=f'{SEED_NAME} {number}', slug=f'seed-{number}')
+        for number in range(SEED_TAGS)
+    ))
+    tag_ids = list(Tag.objects.filter(
+        slug__startswith='seed-'
+    ).values_list('id', flat=True))
+    _bulk_create(Ingredient, (
+        Ingredient(name=f'{SEED_NAME} {number}', measurement_unit='г')
+        for number in range(SEED_INGREDIENTS)
+    ))
+    ingredient_ids = list(Ingredient.objects.filter(
+        name__startswith=SEED_NAME
+    ).values_list('id', flat=True))
+    _bulk_create(Recipe, (
+        Recipe(
+            pk=pk,
+            short_hash=generate_short_hash(pk),
+            author_id=generator.choice(user_ids),
+            name=f'{SEED_NAME} {number}',
+            text=f'Рецепт из набора данных номер {number}.',
+            image='recipes/images/seed.png',
+            cooking_time=generator.randint(1, 120),
+        ) for number, pk in enumerate(allocate_pks(Recipe, recipes))
+    ))
+    recipe_rows = list(Recipe.objects.filter(
+        name__startswith=SEED_NAME
+    ).values_list('id', 'author_id', 'pub_date', 'name', 'text'))
+    update_search_index(
+        (recipe_id, name, text)
+        for recipe_id, _, _, name, text in recipe_rows
+    )
+    _bulk_create(IngredientInRecipe, (
+        IngredientInRecipe(
+            recipe_id=recipe_id,
+            ingredients_id=ingredient_id,
+            amount=generator.randint(1, 500),
+        )
+        for recipe_id, *_ in recipe_rows
+        for ingredient_id in generator.sample(
+            ingredient_ids, SEED_INGREDIENTS_PER_RECIPE
+        )
+    ))
+    _bulk_create(Recipe.tags.through, (
+        Recipe.tags.through(recipe_id=recipe_id, tag_id=tag_id)
+        for recipe_id, *_ in recipe_rows
+        for tag_id in generator.sample(tag_ids, SEED_TAGS_PER_RECIPE)
+    ))
+    seed_relations(
+        generator, user_ids, [row[:3] for row in recipe_rows],
+        favorites, carts, subscriptions
+    )
+    return user_ids
+
+
+def seed_relations(generator, user_ids, recipes, favorites, carts,
+                   subscriptions):
+    """Избранное, корзины, подписки и ленты пользователей."""
+    recipe_ids = [recipe_id for recipe_id, *_ in recipes]
+    recipes_by_author = defaultdict(list)
+    for recipe_id, author_id, pub_date in recipes:
+        recipes_by_author[author_id].append((recipe_id, pub_date))
+    for model, count in ((Favorite, favorites), (ShoppingCart, carts)):
+        _bulk_create(model, (
+            model(user_id=user_id, recipe_id=recipe_id)
+            for user_id in user_ids
+            for recipe_id in generator.sample(
+                recipe_ids, min(count, len(recipe_ids))
+            )
+        ))
+    if carts:
+        rebuild_shopping_lists(user_ids)
+    authors = {
+        user_id: [
+            author_id for author_id in generator.sample(
+                user_ids, min(subscriptions + 1, len(user_ids))
+            ) if author_id != user_id
+        ][:subscriptions]
+        for user_id in user_ids
+    }
+    _bulk_create(Subscriptions, (
+        Subscriptions(user_id=user_id, author_id=author_id)
+        for user_id, author_ids in authors.items()
+        for author_id in author_ids
+    ))
+    update_pull_modes(set(chain.from_iterable(authors.values())))
+    _bulk_create(FeedEntry, (
+        FeedEntry(
+            user_id=user_id, recipe_id=recipe_id, author_id=author_id,
+            pub_date=pub_date
+        )
+        for user_id, author_ids in authors.items()
+        for author_id, (recipe_id, pub_date) in islice(
+            (
+                (author_id, recipe) for author_id in author_ids
+                for recipe in recipes_by_author[author_id]
+            ),
+            SEED_FEED_ENTRIES
+        )
+    ))
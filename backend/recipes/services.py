@@ -1,16 +1,156 @@
-import base64
+import csv
 import hashlib
-import uuid
+import io
 
-from .constants import HASH_GENERATION_ATTEMPTS, SHORT_HASH_LENGTH
+from django.apps import apps
+from django.db import connection
+from django.db.models import F, Sum
 
+from .constants import (
+    SHOPPING_LIST_REBUILD_BATCH_SIZE, SHORT_CODE_ALPHABET, SHORT_CODE_KEY,
+    SHORT_CODE_LENGTH, SHORT_CODE_ROUNDS
+)
 
-def generate_short_hash(model):
-    for _ in range(HASH_GENERATION_ATTEMPTS):
-        full_uuid = uuid.uuid4().hex
-        hash_bytes = hashlib.sha256(full_uuid.encode()).digest()
-        encoded = base64.urlsafe_b64encode(hash_bytes).decode()
-        short_hash = encoded[:SHORT_HASH_LENGTH]
-        if not model.objects.filter(short_hash=short_hash).exists():
-            return short_hash
-    raise RuntimeError('Не удалось сгенерировать уникальный короткий хеш')
+SHORT_CODE_SPACE = len(SHORT_CODE_ALPHABET) ** SHORT_CODE_LENGTH
+_HALF_BITS = (SHORT_CODE_SPACE.bit_length() + 1) // 2
+_HALF_MASK = (1 << _HALF_BITS) - 1
+
+
+def _feistel_round(value, round_number):
+    digest = hashlib.blake2b(
+        f'{round_number}:{value}'.encode(),
+        key=SHORT_CODE_KEY,
+        digest_size=8
+    ).digest()
+    return int.from_bytes(digest, 'big') & _HALF_MASK
+
+
+def _permute(value):
+    left, right = value >> _HALF_BITS, value & _HALF_MASK
+    for round_number in range(SHORT_CODE_ROUNDS):
+        left, right = right, left ^ _feistel_round(right, round_number)
+    return (left << _HALF_BITS) | right
+
+
+def generate_short_hash(pk):
+    """Короткий код рецепта по его первичному ключу.
+
+    Ключ переставляется сетью Фейстеля в пределах SHORT_CODE_SPACE
+    (с повтором, пока результат не попадёт в диапазон) и записывается
+    в base62. Перестановка взаимно однозначна, поэтому коды различных
+    ключей не совпадают и проверять уникальность в базе не нужно.
+    Коды короче старых случайных хешей и не могут совпасть с ними.
+    """
+    if not 0 < pk < SHORT_CODE_SPACE:
+        raise ValueError(f'Нельзя построить короткий код для ключа {pk}.')
+    value = _permute(pk)
+    while value >= SHORT_CODE_SPACE:
+        value = _permute(value)
+    base = len(SHORT_CODE_ALPHABET)
+    chars = []
+    for _ in range(SHORT_CODE_LENGTH):
+        value, index = divmod(value, base)
+        chars.append(SHORT_CODE_ALPHABET[index])
+    return ''.join(reversed(chars))
+
+
+def allocate_pks(model, count):
+    """Резервирование count первичных ключей для массовой вставки.
+
+    В PostgreSQL ключи выбираются из последовательности таблицы, в SQLite
+    вычисляются от наибольшего выданного ключа, поэтому вызывать функцию
+    нужно в той же транзакции, что и вставку.
+    """
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute(
+                'SELECT nextval(pg_get_serial_sequence(%s, %s)) '
+                'FROM generate_series(1, %s)',
+                (table, model._meta.pk.column, count)
+            )
+            return [row[0] for row in cursor.fetchall()]
+        cursor.execute(
+            f'SELECT MAX({connection.ops.quote_name(model._meta.pk.column)}) '
+            f'FROM {connection.ops.quote_name(table)}'
+        )
+        last = cursor.fetchone()[0] or 0
+        cursor.execute(
+            'SELECT seq FROM sqlite_sequence WHERE name = %s', (table,)
+        )
+        row = cursor.fetchone()
+        last = max(last, row[0] if row else 0)
+    return list(range(last + 1, last + count + 1))
+
+
+def bulk_insert(model, fields, rows):
+    """Массовая вставка строк без вызова save() и сигналов.
+
+    В PostgreSQL строки передаются командой COPY, в остальных базах —
+    через bulk_create порциями допустимого для базы размера.
+    """
+    if connection.vendor != 'postgresql':
+        model.objects.bulk_create(
+            model(**dict(zip(fields, row))) for row in rows
+        )
+        return
+    columns = {field.attname: field.column for field in model._meta.fields}
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    buffer.seek(0)
+    quote_name = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        cursor.copy_expert(
+            f'COPY {quote_name(model._meta.db_table)} ('
+            + ', '.join(quote_name(columns[field]) for field in fields)
+            + ') FROM STDIN WITH (FORMAT csv)',
+            buffer
+        )
+
+
+def rebuild_shopping_lists(user_ids=None):
+    """Пересборка сводных списков покупок по содержимому корзин.
+
+    Списки пользователей user_ids (по умолчанию — всех) заполняются
+    заново одним агрегирующим запросом, их версии увеличиваются.
+    """
+    ShoppingCart = apps.get_model('recipes', 'ShoppingCart')
+    ShoppingList = apps.get_model('recipes', 'ShoppingList')
+    ShoppingListItem = apps.get_model('recipes', 'ShoppingListItem')
+    IngredientInRecipe = apps.get_model('recipes', 'IngredientInRecipe')
+    carts = ShoppingCart.objects.order_by()
+    shopping_lists = ShoppingList.objects.order_by()
+    cart_condition = {'recipe__shopping_carts__isnull': False}
+    if user_ids is not None:
+        user_ids = set(user_ids)
+        carts = carts.filter(user_id__in=user_ids)
+        shopping_lists = shopping_lists.filter(user_id__in=user_ids)
+        cart_condition = {'recipe__shopping_carts__user_id__in': user_ids}
+    totals = IngredientInRecipe.objects.filter(**cart_condition)
+    ShoppingList.objects.bulk_create(
+        [
+            ShoppingList(user_id=user_id)
+            for user_id in carts.values_list('user_id', flat=True).distinct()
+        ],
+        ignore_conflicts=True
+    )
+    shopping_lists.update(version=F('version') + 1)
+    ShoppingListItem.objects.filter(
+        shopping_list__in=shopping_lists
+    ).delete()
+    list_ids = dict(shopping_lists.values_list('user_id', 'id'))
+    ShoppingListItem.objects.bulk_create(
+        (
+            ShoppingListItem(
+                shopping_list_id=list_ids[
+                    total['recipe__shopping_carts__user_id']
+                ],
+                ingredient_id=total['ingredients_id'],
+                amount=total['total_amount'],
+            )
+            for total in totals.values(
+                'recipe__shopping_carts__user_id', 'ingredients_id'
+            ).annotate(total_amount=Sum('amount')).order_by().iterator()
+        ),
+        batch_size=SHOPPING_LIST_REBUILD_BATCH_SIZE
+    )
@@ -0,0 +1,91 @@
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import cache
+
+from .constants import (
+    SHORT_HASH_LENGTH, SHORT_LINK_CACHE_PREFIX, SHORT_LINK_CACHE_TIMEOUT,
+    SHORT_LINK_LOCAL_CACHE_SIZE, SHORT_LINK_NEGATIVE_CACHE_TIMEOUT
+)
+from .models import Recipe
+
+SHORT_HASH_PATTERN = re.compile(
+    rf'[A-Za-z0-9_-]{{1,{SHORT_HASH_LENGTH}}}'
+)
+UNKNOWN_SHORT_HASH = 0
+
+
+class ShortLinkResolver:
+    """Сопоставление коротких хешей и рецептов без обращения к базе.
+
+    Сначала проверяется ограниченный LRU-кеш процесса, затем общий кеш
+    и только потом база. Неизвестные хеши тоже кешируются на короткое
+    время, чтобы перебор ссылок не нагружал базу.
+    """
+
+    def __init__(self, maxsize=SHORT_LINK_LOCAL_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    @staticmethod
+    def _cache_key(short_hash):
+        return f'{SHORT_LINK_CACHE_PREFIX}:{short_hash}'
+
+    def _get_local(self, short_hash):
+        with self._lock:
+            entry = self._entries.get(short_hash)
+            if entry is None:
+                return None
+            pk, expires_at = entry
+            if expires_at is not None and expires_at < time.monotonic():
+                del self._entries[short_hash]
+                return None
+            self._entries.move_to_end(short_hash)
+            return pk
+
+    def _set_local(self, short_hash, pk):
+        expires_at = None
+        if pk == UNKNOWN_SHORT_HASH:
+            expires_at = time.monotonic() + SHORT_LINK_NEGATIVE_CACHE_TIMEOUT
+        with self._lock:
+            self._entries[short_hash] = (pk, expires_at)
+            self._entries.move_to_end(short_hash)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def resolve(self, short_hash):
+        """Первичный ключ рецепта или None для неизвестного хеша."""
+        if not SHORT_HASH_PATTERN.fullmatch(short_hash):
+            return None
+        pk = self._get_local(short_hash)
+        if pk is None:
+            pk = cache.get(self._cache_key(short_hash))
+            if pk is None:
+                pk = Recipe.objects.filter(
+                    short_hash=short_hash
+                ).values_list('pk', flat=True).first()
+                if pk is None:
+                    pk = UNKNOWN_SHORT_HASH
+                cache.set(
+                    self._cache_key(short_hash),
+                    pk,
+                    SHORT_LINK_CACHE_TIMEOUT if pk
+                    else SHORT_LINK_NEGATIVE_CACHE_TIMEOUT
+                )
+            self._set_local(short_hash, pk)
+        return pk or None
+
+    def remember(self, short_hash, pk):
+        self._set_local(short_hash, pk)
+        cache.set(self._cache_key(short_hash), pk, SHORT_LINK_CACHE_TIMEOUT)
+
+    def forget(self, short_hash):
+        with self._lock:
+            self._entries.pop(short_hash, None)
+        cache.delete(self._cache_key(short_hash))
+
+
+short_link_resolver = ShortLinkResolver()
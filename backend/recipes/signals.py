@@ -0,0 +1,95 @@
+from contextlib import contextmanager
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .feed import (
+    backfill_feed, fan_out_recipes, prune_feed, schedule_pull_mode_update
+)
+from .ingredient_index import ingredient_index
+from .models import CatalogChecksum, Ingredient, IngredientInRecipe, Recipe
+from .pantry import schedule_ingredient_changes
+from .search import remove_from_search_index, update_search_index
+from .short_links import short_link_resolver
+from users.models import Subscriptions
+
+
+@receiver((post_save, post_delete), sender=Ingredient)
+def invalidate_ingredient_index(sender, **kwargs):
+    ingredient_index.invalidate()
+
+
+@receiver((post_save, post_delete), sender=IngredientInRecipe)
+def publish_recipe_ingredients(sender, instance, **kwargs):
+    schedule_ingredient_changes((instance.recipe_id,))
+
+
+@receiver((post_save, post_delete), sender=Ingredient)
+def reset_catalog_checksums(sender, **kwargs):
+    CatalogChecksum.objects.all().delete()
+
+
+@contextmanager
+def catalog_checksums_kept():
+    """Отключение сброса контрольных сумм на время синхронизации.
+
+    Синхронизация сама сохраняет контрольную сумму загруженного файла,
+    поэтому её собственные изменения справочника не должны её сбрасывать.
+    """
+    signals = (post_save, post_delete)
+    for signal in signals:
+        signal.disconnect(reset_catalog_checksums, sender=Ingredient)
+    try:
+        yield
+    finally:
+        for signal in signals:
+            signal.connect(reset_catalog_checksums, sender=Ingredient)
+
+
+@receiver(post_save, sender=Recipe)
+def remember_short_link(sender, instance, **kwargs):
+    if instance.short_hash:
+        short_link = (instance.short_hash, instance.pk)
+        transaction.on_commit(
+            lambda: short_link_resolver.remember(*short_link)
+        )
+
+
+@receiver(post_delete, sender=Recipe)
+def forget_short_link(sender, instance, **kwargs):
+    if instance.short_hash:
+        short_hash = instance.short_hash
+        short_link_resolver.forget(short_hash)
+        transaction.on_commit(lambda: short_link_resolver.forget(short_hash))
+
+
+@receiver(post_save, sender=Recipe)
+def index_recipe(sender, instance, update_fields=None, **kwargs):
+    if update_fields is None or {'name', 'text'} & set(update_fields):
+        update_search_index(((instance.pk, instance.name, instance.text),))
+
+
+@receiver(post_delete, sender=Recipe)
+def unindex_recipe(sender, instance, **kwargs):
+    remove_from_search_index(instance.pk)
+
+
+@receiver(post_save, sender=Recipe)
+def add_recipe_to_feeds(sender, instance, created, **kwargs):
+    if created:
+        recipe = (instance.pk, instance.author_id, instance.pub_date)
+        transaction.on_commit(lambda: fan_out_recipes((recipe,)))
+
+
+@receiver(post_save, sender=Subscriptions)
+def add_author_to_feed(sender, instance, created, **kwargs):
+    if created:
+        backfill_feed(instance.user_id, instance.author_id)
+        schedule_pull_mode_update(instance.author_id)
+
+
+@receiver(post_delete, sender=Subscriptions)
+def remove_author_from_feed(sender, instance, **kwargs):
+    prune_feed(instance.user_id, instance.author_id)
+    schedule_pull_mode_update(instance.author_id)
@@ -0,0 +1,167 @@
+import os
+import threading
+import time
+
+import numpy as np
+from django.conf import settings
+
+from .constants import SIMILARITY_INDEX_POINTER
+
+ARRAYS = (
+    'recipe_ids', 'modified', 'indptr', 'indices',
+    'ingredient_ids', 'ingredient_indptr', 'ingredient_rows',
+)
+
+
+def build_arrays(rows):
+    """Массивы индекса по строкам (id рецепта, время изменения, ингредиенты).
+
+    Прямой индекс хранится в формате CSR: ингредиенты рецепта i лежат в
+    indices[indptr[i]:indptr[i + 1]]. Обратный индекс устроен так же и
+    для каждого ингредиента хранит номера строк рецептов с ним.
+    """
+    rows = sorted(rows, key=lambda row: row[0])
+    sizes = np.fromiter((len(row[2]) for row in rows), np.int64, len(rows))
+    indptr = np.zeros(len(rows) + 1, np.int64)
+    np.cumsum(sizes, out=indptr[1:])
+    indices = np.fromiter(
+        (ingredient for row in rows for ingredient in sorted(row[2])),
+        np.int64,
+        int(indptr[-1])
+    )
+    row_numbers = np.repeat(np.arange(len(rows), dtype=np.int32), sizes)
+    order = np.argsort(indices, kind='stable')
+    ingredient_ids, counts = np.unique(indices[order], return_counts=True)
+    ingredient_indptr = np.zeros(len(ingredient_ids) + 1, np.int64)
+    np.cumsum(counts, out=ingredient_indptr[1:])
+    return {
+        'recipe_ids': np.fromiter(
+            (row[0] for row in rows), np.int64, len(rows)
+        ),
+        'modified': np.fromiter(
+            (row[1] for row in rows), np.int64, len(rows)
+        ),
+        'indptr': indptr,
+        'indices': indices,
+        'ingredient_ids': ingredient_ids,
+        'ingredient_indptr': ingredient_indptr,
+        'ingredient_rows': row_numbers[order],
+    }
+
+
+def iter_rows(arrays):
+    """Строки существующего индекса для инкрементальной перестройки."""
+    indptr, indices = arrays['indptr'], arrays['indices']
+    for row, (recipe_id, modified) in enumerate(
+        zip(arrays['recipe_ids'], arrays['modified'])
+    ):
+        yield (
+            int(recipe_id),
+            int(modified),
+            indices[indptr[row]:indptr[row + 1]].tolist()
+        )
+
+
+def save_arrays(arrays, directory=None):
+    """Запись новой версии индекса и атомарное переключение на неё."""
+    directory = directory or settings.SIMILARITY_INDEX_DIR
+    version = f'v{time.time_ns()}'
+    os.makedirs(os.path.join(directory, version))
+    for name in ARRAYS:
+        np.save(os.path.join(directory, version, f'{name}.npy'), arrays[name])
+    pointer = os.path.join(directory, SIMILARITY_INDEX_POINTER)
+    with open(f'{pointer}.tmp', 'w') as file:
+        file.write(version)
+    os.replace(f'{pointer}.tmp', pointer)
+    return version
+
+
+def read_pointer(directory):
+    try:
+        with open(os.path.join(directory, SIMILARITY_INDEX_POINTER)) as file:
+            return file.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def load_arrays(directory=None, mmap_mode='r'):
+    directory = directory or settings.SIMILARITY_INDEX_DIR
+    version = read_pointer(directory)
+    if version is None:
+        return None
+    return {
+        name: np.load(
+            os.path.join(directory, version, f'{name}.npy'),
+            mmap_mode=mmap_mode
+        )
+        for name in ARRAYS
+    }
+
+
+class SimilarityIndex:
+    """Поиск рецептов с похожим набором ингредиентов.
+
+    Массивы индекса отображаются в память только для чтения, поэтому все
+    процессы gunicorn используют одну копию в страничном кеше ОС. Файл
+    указателя проверяется при каждом запросе, и после перестройки индекса
+    процесс переоткрывает новую версию.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stamp = None
+        self._arrays = None
+
+    def get_arrays(self):
+        pointer = os.path.join(
+            settings.SIMILARITY_INDEX_DIR, SIMILARITY_INDEX_POINTER
+        )
+        try:
+            stamp = os.stat(pointer).st_mtime_ns
+        except FileNotFoundError:
+            return None
+        if stamp != self._stamp:
+            with self._lock:
+                if stamp != self._stamp:
+                    self._arrays = load_arrays()
+                    self._stamp = stamp
+        return self._arrays
+
+    def similar(self, recipe_id, limit):
+        """Пары (id рецепта, коэффициент Жаккара) по убыванию сходства."""
+        arrays = self.get_arrays()
+        if arrays is None:
+            return []
+        recipe_ids = arrays['recipe_ids']
+        row = int(np.searchsorted(recipe_ids, recipe_id))
+        if row == len(recipe_ids) or recipe_ids[row] != recipe_id:
+            return []
+        indptr = arrays['indptr']
+        ingredients = arrays['indices'][indptr[row]:indptr[row + 1]]
+        ingredient_ids = arrays['ingredient_ids']
+        positions = np.searchsorted(ingredient_ids, ingredients)
+        ingredient_indptr = arrays['ingredient_indptr']
+        candidates = np.concatenate([
+            arrays['ingredient_rows'][
+                ingredient_indptr[position]:ingredient_indptr[position + 1]
+            ]
+            for position in positions
+        ]) if len(positions) else np.empty(0, np.int32)
+        overlap = np.bincount(candidates, minlength=len(recipe_ids))
+        overlap[row] = 0
+        rows = np.flatnonzero(overlap)
+        if not len(rows):
+            return []
+        sizes = indptr[rows + 1] - indptr[rows]
+        shared = overlap[rows]
+        scores = shared / (len(ingredients) + sizes - shared)
+        if len(rows) > limit:
+            top = np.argpartition(-scores, limit - 1)[:limit]
+            rows, scores = rows[top], scores[top]
+        order = np.lexsort((-recipe_ids[rows], -scores))
+        return [
+            (int(recipe_ids[rows[i]]), float(scores[i])) for i in order
+        ]
+
+
+similarity_index = SimilarityIndex()
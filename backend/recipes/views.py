@@ -1,10 +1,15 @@
-from django.http import HttpResponsePermanentRedirect
-from django.shortcuts import get_object_or_404
+from django.http import Http404, HttpResponsePermanentRedirect
+from django.utils.cache import patch_cache_control
 
-from recipes.models import Recipe
+from recipes.constants import SHORT_LINK_MAX_AGE
+from recipes.short_links import short_link_resolver
 
 
 def short_link_redirect(request, short_hash):
-    recipe = get_object_or_404(Recipe, short_hash=short_hash)
-    frontend_url = request.build_absolute_uri(f'/recipes/{recipe.pk}/')
-    return HttpResponsePermanentRedirect(frontend_url)
+    pk = short_link_resolver.resolve(short_hash)
+    if pk is None:
+        raise Http404('Рецепт не найден.')
+    frontend_url = request.build_absolute_uri(f'/recipes/{pk}/')
+    response = HttpResponsePermanentRedirect(frontend_url)
+    patch_cache_control(response, public=True, max_age=SHORT_LINK_MAX_AGE)
+    return response
@@ -0,0 +1,105 @@
+import io
+
+import pytest
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from PIL import Image
+from rest_framework.test import APIClient
+
+IMAGE = (
+    'data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABAgMAAABieywaAAAACV'
+    'BMVEUAAAD///9fX1/S0ecCAAAACXBIWXMAAA7EAAAOxAGVKw4bAAAACklEQVQImWNoAAAAgg'
+    'CByxOyYQAAAABJRU5ErkJggg=='
+)
+
+
+@pytest.fixture(autouse=True)
+def media_root(settings, tmp_path):
+    settings.MEDIA_ROOT = str(tmp_path)
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    cache.clear()
+    yield
+    cache.clear()
+
+
+@pytest.fixture
+def users(django_user_model):
+    return [
+        django_user_model.objects.create_user(
+            username=f'user{number}',
+            email=f'user{number}@example.com',
+            password='Password-12345',
+            first_name='Имя',
+            last_name='Фамилия',
+        ) for number in range(3)
+    ]
+
+
+@pytest.fixture
+def clients(users):
+    result = []
+    for user in users:
+        client = APIClient()
+        client.force_authenticate(user)
+        result.append(client)
+    return result
+
+
+@pytest.fixture
+def ingredients(db):
+    from recipes.models import Ingredient
+    return [
+        Ingredient.objects.create(name=name, measurement_unit=unit)
+        for name, unit in (
+            ('абрикосы', 'г'),
+            ('молоко', 'мл'),
+            ('мука', 'г'),
+            ('соль', 'г'),
+        )
+    ]
+
+
+@pytest.fixture
+def tags(db):
+    from recipes.models import Tag
+    return [
+        Tag.objects.create(name='Завтрак', slug='breakfast'),
+        Tag.objects.create(name='Обед', slug='lunch'),
+    ]
+
+
+@pytest.fixture
+def create_recipe(tags):
+    """Создание рецепта через API от имени клиента."""
+
+    def create(client, name, amounts, recipe_tags=None):
+        response = client.post('/api/recipes/', {
+            'ingredients': [
+                {'id': ingredient.id, 'amount': amount}
+                for ingredient, amount in amounts.items()
+            ],
+            'tags': [tag.id for tag in recipe_tags or tags],
+            'image': IMAGE,
+            'name': name,
+            'text': 'Описание',
+            'cooking_time': 10,
+        }, format='json')
+        assert response.status_code == 201, response.content
+        return response.json()['id']
+
+    return create
+
+
+@pytest.fixture
+def image_file():
+    """Загружаемый файл PNG заданного цвета."""
+
+    def create(color, name='photo.png', size=(2, 2)):
+        buffer = io.BytesIO()
+        Image.new('RGB', size, color).save(buffer, 'PNG')
+        return SimpleUploadedFile(name, buffer.getvalue(), 'image/png')
+
+    return create
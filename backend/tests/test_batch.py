@@ -0,0 +1,65 @@
+import pytest
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from api import views
+
+
+@pytest.fixture
+def recipes(clients, ingredients, create_recipe):
+    return [
+        create_recipe(clients[0], f'Рецепт {number}', {ingredients[0]: 1})
+        for number in range(4)
+    ]
+
+
+def get_batch(client, ids, **headers):
+    return client.get('/api/recipes/batch/', {'ids': ids}, **headers)
+
+
+def test_batch_keeps_requested_order(clients, recipes):
+    clients[1].post(f'/api/recipes/{recipes[1]}/favorite/')
+    response = get_batch(
+        clients[1], f'{recipes[2]},{recipes[1]}, {recipes[2]},999,'
+    )
+    assert response.status_code == 200, response.content
+    data = response.json()
+    assert [recipe['id'] for recipe in data] == [recipes[2], recipes[1]]
+    assert [recipe['is_favorited'] for recipe in data] == [False, True]
+
+
+def test_batch_queries_do_not_grow(clients, recipes):
+    counts = []
+    for ids in (recipes[:2], recipes):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = get_batch(clients[1], ','.join(map(str, ids)))
+        assert len(response.json()) == len(ids)
+        counts.append(len(queries))
+    assert counts[0] == counts[1]
+
+
+@pytest.mark.parametrize('ids', ('', ' , ', '1,a', '1.5'))
+def test_batch_rejects_invalid_ids(clients, recipes, ids):
+    response = get_batch(clients[1], ids)
+    assert response.status_code == 400
+    assert 'ids' in response.json()
+
+
+def test_batch_limits_number_of_ids(monkeypatch, clients, recipes):
+    monkeypatch.setattr(views, 'MAX_BATCH_RECIPES', 3)
+    ids = ','.join(map(str, recipes))
+    assert get_batch(clients[1], ids).status_code == 400
+    assert get_batch(clients[1], '1,1,1,1,2,3').status_code == 200
+
+
+def test_batch_answers_conditional_requests(clients, recipes):
+    ids = ','.join(map(str, recipes))
+    etag = get_batch(clients[1], ids)['ETag']
+    assert get_batch(
+        clients[1], ids, HTTP_IF_NONE_MATCH=etag
+    ).status_code == 304
+    assert get_batch(
+        clients[1], recipes[0], HTTP_IF_NONE_MATCH=etag
+    ).status_code == 200
@@ -0,0 +1,44 @@
+from django.core.cache import cache
+
+from api.versions import RECIPES, get_version_timestamp, get_versions
+
+
+def test_unchanged_list_returns_not_modified(clients, ingredients,
+                                             create_recipe):
+    create_recipe(clients[0], 'Рецепт', {ingredients[0]: 1})
+    response = clients[1].get('/api/recipes/')
+    assert response.status_code == 200
+    etag = response['ETag']
+    assert clients[1].get(
+        '/api/recipes/', HTTP_IF_NONE_MATCH=etag
+    ).status_code == 304
+    assert clients[1].get(
+        '/api/recipes/', HTTP_IF_MODIFIED_SINCE=response['Last-Modified']
+    ).status_code == 304
+    assert clients[2].get(
+        '/api/recipes/', HTTP_IF_NONE_MATCH=etag
+    ).status_code == 200
+
+
+def test_changes_replace_validators(clients, ingredients, create_recipe,
+                                    django_capture_on_commit_callbacks):
+    recipe = create_recipe(clients[0], 'Рецепт', {ingredients[0]: 1})
+    etag = clients[1].get('/api/recipes/')['ETag']
+    with django_capture_on_commit_callbacks(execute=True):
+        clients[1].post(f'/api/recipes/{recipe}/favorite/')
+    response = clients[1].get('/api/recipes/', HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+    assert response.json()['results'][0]['is_favorited'] is True
+    etag = response['ETag']
+    with django_capture_on_commit_callbacks(execute=True):
+        create_recipe(clients[0], 'Новый рецепт', {ingredients[0]: 1})
+    response = clients[1].get('/api/recipes/', HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+    assert response.json()['count'] == 2
+
+
+def test_evicted_version_falls_back_to_new_token(monkeypatch):
+    monkeypatch.setattr(cache, 'add', lambda *args, **kwargs: False)
+    version, = get_versions(RECIPES)
+    assert version
+    assert get_version_timestamp(version) > 0
@@ -0,0 +1,208 @@
+import pytest
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from recipes import feed
+from recipes.models import FeedEntry, FeedPullAuthor
+from users.models import Subscriptions
+
+FEED_URL = '/api/users/feed/'
+
+
+@pytest.fixture
+def publish(ingredients, create_recipe, django_capture_on_commit_callbacks):
+
+    def create(client, name):
+        with django_capture_on_commit_callbacks(execute=True):
+            return create_recipe(client, name, {ingredients[0]: 1})
+
+    return create
+
+
+def subscribe(client, author):
+    response = client.post(f'/api/users/{author.id}/subscribe/')
+    assert response.status_code == 201, response.content
+
+
+def feed_ids(client, url=FEED_URL):
+    response = client.get(url)
+    assert response.status_code == 200, response.content
+    return [recipe['id'] for recipe in response.json()['results']]
+
+
+def cursor_ids(client):
+    ids, url = [], f'{FEED_URL}?pagination=cursor&limit=2'
+    while url:
+        data = client.get(url.replace('http://testserver', '')).json()
+        ids.extend(recipe['id'] for recipe in data['results'])
+        url = data['next']
+    return ids
+
+
+@pytest.fixture
+def follow(django_capture_on_commit_callbacks):
+    """Подписка или отписка с действиями после фиксации транзакции."""
+
+    def change(client, author, method='post'):
+        with django_capture_on_commit_callbacks(execute=True):
+            response = getattr(client, method)(
+                f'/api/users/{author.id}/subscribe/'
+            )
+        assert response.status_code in (201, 204), response.content
+
+    return change
+
+
+@pytest.fixture
+def threshold(monkeypatch):
+    monkeypatch.setattr(feed, 'FEED_PULL_THRESHOLD', 1)
+
+
+@pytest.fixture
+def pull_mode(users, clients, follow, threshold):
+    """Второй пользователь подмешивается в ленты при чтении."""
+    follow(clients[0], users[1])
+    follow(clients[2], users[1])
+    follow(clients[2], users[0])
+
+
+def entry_ids(user, author):
+    return set(FeedEntry.objects.filter(
+        user=user, author=author
+    ).values_list('recipe_id', flat=True))
+
+
+def backfill_feeds():
+    call_command('backfill_feeds', stdout=None)
+
+
+def test_entries_keep_pub_date(users, clients, publish):
+    first = publish(clients[0], 'Первый')
+    subscribe(clients[1], users[0])
+    second = publish(clients[0], 'Второй')
+    for entry in FeedEntry.objects.select_related('recipe').filter(
+        user=users[1]
+    ):
+        assert entry.pub_date == entry.recipe.pub_date
+    assert feed_ids(clients[1]) == [second, first]
+    assert cursor_ids(clients[1]) == [second, first]
+
+
+def test_feed_page_is_read_from_entries(users, clients, publish):
+    subscribe(clients[1], users[0])
+    for number in range(3):
+        publish(clients[0], f'Рецепт {number}')
+    with CaptureQueriesContext(connection) as queries:
+        feed_ids(clients[1], f'{FEED_URL}?pagination=cursor&limit=2')
+    page_query = next(
+        query['sql'] for query in queries.captured_queries
+        if 'recipes_feedentry' in query['sql']
+    )
+    assert 'recipes_recipe' not in page_query
+
+
+def test_pull_authors_are_merged(users, clients, publish, pull_mode):
+    ids = [
+        publish(clients[number % 2], f'Рецепт {number}')
+        for number in range(5)
+    ]
+    assert not FeedEntry.objects.filter(author=users[1]).exists()
+    expected = ids[::-1]
+    assert feed_ids(clients[2]) == expected[:6]
+    assert clients[2].get(FEED_URL).json()['count'] == 5
+    assert cursor_ids(clients[2]) == expected
+
+
+def test_crossing_threshold_upward(users, clients, publish, follow,
+                                   threshold):
+    first = publish(clients[0], 'Первый')
+    follow(clients[1], users[0])
+    assert feed_ids(clients[1]) == [first]
+    follow(clients[2], users[0])
+    assert FeedPullAuthor.objects.filter(
+        author=users[0], backfill_pending=False
+    ).exists()
+    second = publish(clients[0], 'Второй')
+    assert entry_ids(users[1], users[0]) == {first}
+    for client in clients[1:]:
+        assert feed_ids(client) == [second, first]
+
+
+def test_crossing_threshold_downward(users, clients, publish, follow,
+                                     pull_mode):
+    ids = [publish(clients[1], f'Рецепт {number}') for number in range(2)]
+    with CaptureQueriesContext(connection) as queries:
+        follow(clients[0], users[1], 'delete')
+    assert not any(
+        'INSERT' in query['sql'] and 'recipes_feedentry' in query['sql']
+        for query in queries.captured_queries
+    )
+    assert FeedPullAuthor.objects.get(author=users[1]).backfill_pending
+    assert entry_ids(users[2], users[1]) == set()
+    assert feed_ids(clients[2]) == ids[::-1]
+    backfill_feeds()
+    assert not FeedPullAuthor.objects.filter(author=users[1]).exists()
+    assert entry_ids(users[2], users[1]) == set(ids)
+    assert feed_ids(clients[2]) == ids[::-1]
+    third = publish(clients[1], 'Рецепт 2')
+    assert entry_ids(users[2], users[1]) == {third, *ids}
+    assert feed_ids(clients[2]) == [third, *ids[::-1]]
+
+
+def test_crossing_back_before_backfill(users, clients, publish, follow,
+                                       pull_mode):
+    recipe = publish(clients[1], 'Рецепт')
+    follow(clients[0], users[1], 'delete')
+    follow(clients[0], users[1])
+    assert not FeedPullAuthor.objects.get(author=users[1]).backfill_pending
+    backfill_feeds()
+    assert FeedPullAuthor.objects.filter(author=users[1]).exists()
+    assert entry_ids(users[2], users[1]) == set()
+    assert recipe in feed_ids(clients[0])
+
+
+def test_bulk_changes_cross_threshold(users, clients, publish, pull_mode,
+                                      django_capture_on_commit_callbacks):
+    recipe = publish(clients[1], 'Рецепт')
+    assert feed.get_pull_author_ids((users[1].id,))
+    with django_capture_on_commit_callbacks(execute=True):
+        Subscriptions.objects.filter(author=users[1]).delete()
+    assert FeedPullAuthor.objects.get(author=users[1]).backfill_pending
+    assert feed.get_pull_author_ids((users[1].id,))
+    with django_capture_on_commit_callbacks(execute=True):
+        Subscriptions.objects.create(user=users[2], author=users[1])
+    backfill_feeds()
+    assert feed_ids(clients[2]) == [recipe]
+    assert entry_ids(users[2], users[1]) == {recipe}
+    assert not feed.get_pull_author_ids((users[1].id,))
+
+
+def test_deleted_follower_crosses_threshold(
+    users, clients, publish, pull_mode, django_capture_on_commit_callbacks
+):
+    recipe = publish(clients[1], 'Рецепт')
+    with django_capture_on_commit_callbacks(execute=True):
+        users[0].delete()
+    assert FeedPullAuthor.objects.get(author=users[1]).backfill_pending
+    call_command('backfill_feeds', users[1].id, stdout=None)
+    assert entry_ids(users[2], users[1]) == {recipe}
+    assert feed_ids(clients[2]) == [recipe]
+
+
+def test_sync_finds_bulk_loaded_authors(users, clients, threshold):
+    Subscriptions.objects.bulk_create(
+        Subscriptions(user=user, author=users[0]) for user in users[1:]
+    )
+    call_command('backfill_feeds', '--sync', stdout=None)
+    assert FeedPullAuthor.objects.filter(
+        author=users[0], backfill_pending=False
+    ).exists()
+
+
+def test_unsubscribe_prunes_feed(users, clients, publish):
+    subscribe(clients[1], users[0])
+    publish(clients[0], 'Рецепт')
+    clients[1].delete(f'/api/users/{users[0].id}/subscribe/')
+    assert not FeedEntry.objects.filter(user=users[1]).exists()
+    assert feed_ids(clients[1]) == []
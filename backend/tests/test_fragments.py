@@ -0,0 +1,70 @@
+import pytest
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+
+@pytest.fixture
+def recipe(clients, ingredients, create_recipe):
+    return create_recipe(clients[0], 'Рецепт', {ingredients[0]: 1})
+
+
+def get_recipe(client):
+    with CaptureQueriesContext(connection) as queries:
+        response = client.get('/api/recipes/')
+    assert response.status_code == 200, response.content
+    return response.json()['results'][0], queries
+
+
+def reads_ingredients(queries):
+    return any(
+        'recipes_ingredientinrecipe' in query['sql']
+        for query in queries.captured_queries
+    )
+
+
+def test_fragment_is_shared_between_viewers(users, clients, recipe):
+    clients[1].post(f'/api/recipes/{recipe}/favorite/')
+    clients[2].post(f'/api/users/{users[0].id}/subscribe/')
+    cache.clear()
+    first, queries = get_recipe(clients[1])
+    assert reads_ingredients(queries)
+    second, queries = get_recipe(clients[2])
+    assert not reads_ingredients(queries)
+    assert first['is_favorited'] is True
+    assert second['is_favorited'] is False
+    assert first['author']['is_subscribed'] is False
+    assert second['author']['is_subscribed'] is True
+    assert {
+        key: value for key, value in first.items()
+        if key not in ('is_favorited', 'author')
+    } == {
+        key: value for key, value in second.items()
+        if key not in ('is_favorited', 'author')
+    }
+
+
+def test_recipe_changes_replace_fragment(clients, recipe):
+    get_recipe(clients[1])
+    response = clients[0].patch(
+        f'/api/recipes/{recipe}/', {'name': 'Новое название'}, format='json'
+    )
+    assert response.status_code == 200, response.content
+    data, _ = get_recipe(clients[1])
+    assert data['name'] == 'Новое название'
+
+
+def test_related_changes_replace_fragment(users, clients, ingredients,
+                                          recipe,
+                                          django_capture_on_commit_callbacks):
+    get_recipe(clients[1])
+    with django_capture_on_commit_callbacks(execute=True):
+        users[0].first_name = 'Другое'
+        users[0].save()
+    data, _ = get_recipe(clients[1])
+    assert data['author']['first_name'] == 'Другое'
+    with django_capture_on_commit_callbacks(execute=True):
+        ingredients[0].measurement_unit = 'кг'
+        ingredients[0].save()
+    data, _ = get_recipe(clients[1])
+    assert data['ingredients'][0]['measurement_unit'] == 'кг'
@@ -0,0 +1,66 @@
+import pytest
+
+from api import images
+from api.constants import RECIPE_IMAGE_SIZES
+
+
+class DeferredExecutor:
+    """Пул, который выполняет задачи только по вызову run()."""
+
+    def __init__(self):
+        self.tasks = []
+
+    def submit(self, function, *args):
+        self.tasks.append((function, args))
+
+    def run(self):
+        for function, args in self.tasks:
+            function(*args)
+        self.tasks.clear()
+
+
+@pytest.fixture
+def executor(monkeypatch):
+    deferred = DeferredExecutor()
+    monkeypatch.setattr(images, 'derivative_executor', deferred)
+    return deferred
+
+
+def test_derivatives_are_generated_off_request(
+    clients, ingredients, create_recipe, executor,
+    django_capture_on_commit_callbacks
+):
+    with django_capture_on_commit_callbacks(execute=True):
+        recipe = create_recipe(clients[0], 'Рецепт', {ingredients[0]: 1})
+    assert len(executor.tasks) == 1
+    response = clients[1].get(f'/api/recipes/{recipe}/')
+    assert response.json()['image_srcset'] is None
+    with django_capture_on_commit_callbacks(execute=True):
+        executor.run()
+    response = clients[1].get(
+        f'/api/recipes/{recipe}/', HTTP_IF_NONE_MATCH=response['ETag']
+    )
+    assert response.status_code == 200
+    srcset = response.json()['image_srcset']
+    assert set(srcset['jpeg']) == {f'{width}w' for width, _ in
+                                   RECIPE_IMAGE_SIZES}
+
+
+def test_srcset_skips_missing_derivatives(clients, ingredients,
+                                          create_recipe):
+    recipe = create_recipe(clients[0], 'Рецепт', {ingredients[0]: 1})
+    data = clients[1].get(f'/api/recipes/{recipe}/').json()
+    assert data['image']
+    assert data['image_srcset'] is None
+    assert images.get_srcset('recipes/missing.png', RECIPE_IMAGE_SIZES) is None
+
+
+def test_failed_generation_is_logged(db, executor, caplog,
+                                     django_capture_on_commit_callbacks):
+    class Image:
+        name = 'recipes/missing.png'
+
+    with django_capture_on_commit_callbacks(execute=True):
+        images.schedule_derivatives(Image(), RECIPE_IMAGE_SIZES)
+    executor.run()
+    assert 'recipes/missing.png' in caplog.text
@@ -0,0 +1,95 @@
+import io
+import json
+
+import pytest
+from django.core.management import CommandError, call_command
+
+from recipes.models import FeedEntry, IngredientInRecipe, Recipe
+from recipes.services import generate_short_hash
+
+
+def record(name, **fields):
+    return dict({
+        'author': 'user0',
+        'name': name,
+        'text': 'Описание',
+        'cooking_time': 10,
+        'image': 'recipes/images/photo.png',
+        'tags': ['breakfast'],
+        'ingredients': [
+            {'name': 'молоко', 'measurement_unit': 'мл', 'amount': 200},
+            {'name': 'мука', 'amount': 50},
+        ],
+    }, **fields)
+
+
+def import_recipes(path, *args):
+    output, errors = io.StringIO(), io.StringIO()
+    call_command(
+        'import_recipes', path, *args, stdout=output, stderr=errors
+    )
+    return output.getvalue(), errors.getvalue()
+
+
+def write_lines(path, lines):
+    path.write_text('\n'.join(
+        line if isinstance(line, str) else json.dumps(line, ensure_ascii=False)
+        for line in lines
+    ), encoding='utf-8')
+    return str(path)
+
+
+def test_import_in_batches(users, ingredients, tags, tmp_path):
+    path = write_lines(tmp_path / 'recipes.ndjson', [
+        record('Блины'),
+        '',
+        record('Оладьи', author='user1', tags=['Обед', 'breakfast']),
+        record('Каша', cooking_time=5),
+    ])
+    output, errors = import_recipes(path, '--batch-size', '2')
+    assert 'Импортировано рецептов: 3, пропущено строк: 0' in output
+    assert output.count('Записано рецептов') == 2
+    assert errors == ''
+    for pk, short_hash in Recipe.objects.values_list('id', 'short_hash'):
+        assert short_hash == generate_short_hash(pk)
+    recipe = Recipe.objects.get(name='Оладьи')
+    assert recipe.author == users[1]
+    assert set(recipe.tags.values_list('slug', flat=True)) == {
+        'breakfast', 'lunch'
+    }
+    assert dict(IngredientInRecipe.objects.filter(recipe=recipe).values_list(
+        'ingredients__name', 'amount'
+    )) == {'молоко': 200, 'мука': 50}
+
+
+def test_invalid_lines_are_skipped(users, ingredients, tags, tmp_path):
+    path = write_lines(tmp_path / 'recipes.ndjson', [
+        '{"name": ',
+        record('Блины', author='nobody'),
+        record('Оладьи', tags=['unknown']),
+        record('Каша', cooking_time=0),
+        record('Суп', ingredients=[{'name': 'вода', 'amount': 1}]),
+        record('Блины'),
+        record('Блины'),
+    ])
+    output, errors = import_recipes(path)
+    assert 'Импортировано рецептов: 1, пропущено строк: 6' in output
+    for line_number in range(1, 6):
+        assert f'Строка {line_number} пропущена' in errors
+    assert 'Строка 7 пропущена: рецепт «Блины» у автора уже есть' in errors
+    assert list(Recipe.objects.values_list('name', flat=True)) == ['Блины']
+
+
+def test_imported_recipes_reach_feed(users, clients, ingredients, tags,
+                                     tmp_path):
+    clients[1].post(f'/api/users/{users[0].id}/subscribe/')
+    import_recipes(write_lines(tmp_path / 'recipes.ndjson', [record('Блины')]))
+    recipe = Recipe.objects.get()
+    assert FeedEntry.objects.filter(user=users[1], recipe=recipe).exists()
+    response = clients[1].get('/api/recipes/', {'search': 'блины'})
+    assert [item['id'] for item in response.json()['results']] == [recipe.id]
+
+
+def test_batch_size_must_be_positive(db, tmp_path):
+    with pytest.raises(CommandError):
+        import_recipes(str(tmp_path / 'recipes.ndjson'), '--batch-size', '0')
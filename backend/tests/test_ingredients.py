@@ -0,0 +1,46 @@
+import pytest
+
+from recipes.models import Ingredient
+
+
+def get_names(client, name):
+    response = client.get('/api/ingredients/', {'name': name})
+    assert response.status_code == 200, response.content
+    return [ingredient['name'] for ingredient in response.json()]
+
+
+@pytest.fixture
+def client(clients):
+    return clients[0]
+
+
+def test_prefix_search(client, ingredients):
+    Ingredient.objects.create(name='Мёд', measurement_unit='г')
+    assert get_names(client, 'МО') == ['молоко']
+    assert get_names(client, 'м') == ['Мёд', 'молоко', 'мука']
+    assert get_names(client, 'мед') == ['Мёд']
+    assert get_names(client, 'хлеб') == []
+
+
+def test_results_ordered_by_usage(client, ingredients, create_recipe):
+    flour = ingredients[2]
+    create_recipe(client, 'Блины', {flour: 1})
+    assert get_names(client, 'м') == ['мука', 'молоко']
+
+
+@pytest.mark.parametrize('name', ('', '   '))
+def test_blank_name_returns_nothing(client, ingredients, name):
+    assert get_names(client, name) == []
+
+
+def test_full_list_without_name(client, ingredients):
+    response = client.get('/api/ingredients/')
+    assert len(response.json()) == len(ingredients)
+
+
+def test_index_follows_changes(client, ingredients):
+    assert get_names(client, 'сах') == []
+    Ingredient.objects.create(name='сахар', measurement_unit='г')
+    assert get_names(client, 'сах') == ['сахар']
+    Ingredient.objects.filter(name='сахар').delete()
+    assert get_names(client, 'сах') == []
@@ -0,0 +1,53 @@
+import pytest
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import HttpResponse
+from django.test import RequestFactory
+from rest_framework import serializers
+
+from api.constants import N_PLUS_ONE_THRESHOLD
+from api.middleware import QueryInstrumentationMiddleware
+from recipes.models import Ingredient
+
+
+class IngredientExistsSerializer(serializers.Serializer):
+
+    def to_representation(self, instance):
+        return Ingredient.objects.filter(pk=instance).exists()
+
+
+def test_disabled_without_sample_rate(settings):
+    settings.SQL_INSTRUMENTATION_SAMPLE_RATE = 0
+    with pytest.raises(MiddlewareNotUsed):
+        QueryInstrumentationMiddleware(HttpResponse)
+
+
+def test_server_timing_counts_queries(settings, clients, ingredients,
+                                      caplog):
+    settings.SQL_INSTRUMENTATION_SAMPLE_RATE = 1
+    response = clients[0].get('/api/ingredients/')
+    assert response.status_code == 200
+    timing = response['Server-Timing']
+    assert timing.startswith('db;desc="')
+    assert int(timing.split('"')[1].split()[0]) > 0
+    assert 'app;dur=' in timing
+    assert 'N+1' not in caplog.text
+
+
+def test_repeated_queries_are_logged(settings, ingredients, caplog):
+    settings.SQL_INSTRUMENTATION_SAMPLE_RATE = 1
+
+    def view(request):
+        IngredientExistsSerializer(
+            [ingredient.id for ingredient in ingredients] * 2, many=True
+        ).data
+        return HttpResponse()
+
+    queries = len(ingredients) * 2
+    assert queries >= N_PLUS_ONE_THRESHOLD
+    response = QueryInstrumentationMiddleware(view)(
+        RequestFactory().get('/api/ingredients/')
+    )
+    assert f'db;desc="{queries} SQL"' in response['Server-Timing']
+    assert caplog.text.count('N+1') == 1
+    assert 'tests/test_middleware.py' in caplog.text
+    assert 'IngredientExistsSerializer' in caplog.text
@@ -0,0 +1,99 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+
+def get_path(url):
+    return url.replace('http://testserver', '')
+
+
+def walk(client, url):
+    """id всех объектов, собранных переходами по ссылкам next."""
+    ids, pages = [], []
+    while url:
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(get_path(url))
+        assert response.status_code == 200, response.content
+        assert not any(
+            '__count' in query['sql'] for query in queries.captured_queries
+        )
+        data = response.json()
+        pages.append(data)
+        ids.extend(item['id'] for item in data['results'])
+        url = data['next']
+    return ids, pages
+
+
+@pytest.fixture
+def recipes(clients, ingredients, tags, create_recipe):
+    return [
+        create_recipe(
+            clients[number % 3], f'Рецепт {number}', {ingredients[0]: 1},
+            tags[:1] if number % 2 else tags
+        ) for number in range(7)
+    ]
+
+
+def test_cursor_pages_match_offset_pages(clients, recipes):
+    client = clients[0]
+    expected = [
+        recipe['id'] for recipe
+        in client.get('/api/recipes/?limit=100').json()['results']
+    ]
+    ids, pages = walk(client, '/api/recipes/?pagination=cursor&limit=3')
+    assert ids == expected
+    assert [len(page['results']) for page in pages] == [3, 3, 1]
+    assert pages[0]['previous'] is None
+    assert 'count' not in pages[0]
+
+
+def test_previous_links(clients, recipes):
+    client = clients[0]
+    expected = [
+        recipe['id'] for recipe
+        in client.get('/api/recipes/?limit=100').json()['results']
+    ]
+    _, pages = walk(client, '/api/recipes/?pagination=cursor&limit=3')
+    page = client.get(get_path(pages[-1]['previous'])).json()
+    assert [recipe['id'] for recipe in page['results']] == expected[3:6]
+    page = client.get(get_path(page['previous'])).json()
+    assert [recipe['id'] for recipe in page['results']] == expected[:3]
+    assert page['previous'] is None
+
+
+def test_cursor_with_filters(clients, recipes):
+    ids, _ = walk(
+        clients[0], '/api/recipes/?pagination=cursor&limit=2&tags=lunch'
+    )
+    assert len(ids) == 4
+
+
+@pytest.mark.parametrize('cursor', ('garbage', 'e30=', 'eyJwb3NpdGlvbiI6IDF9'))
+def test_invalid_cursor(clients, recipes, cursor):
+    response = clients[0].get('/api/recipes/', {'cursor': cursor})
+    assert response.status_code == 404
+
+
+@pytest.mark.parametrize('param', ('search', 'pantry'))
+def test_cursor_rejects_custom_ordering(clients, ingredients, recipes,
+                                        param):
+    value = 'рецепт' if param == 'search' else str(ingredients[0].id)
+    response = clients[0].get(
+        '/api/recipes/', {'pagination': 'cursor', param: value}
+    )
+    assert response.status_code == 400
+    assert param in response.json()
+    response = clients[0].get('/api/recipes/', {param: value})
+    assert response.status_code == 200
+
+
+def test_subscriptions_cursor(users, clients, recipes):
+    client = clients[0]
+    for user in users[1:]:
+        client.post(f'/api/users/{user.id}/subscribe/')
+    ids, pages = walk(
+        client,
+        '/api/users/subscriptions/?pagination=cursor&limit=1&recipes_limit=1'
+    )
+    assert sorted(ids) == sorted(user.id for user in users[1:])
+    assert all(len(page['results'][0]['recipes']) == 1 for page in pages)
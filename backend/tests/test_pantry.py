@@ -0,0 +1,96 @@
+import pytest
+
+from recipes.models import IngredientInRecipe
+from recipes.pantry import pantry_index
+
+
+@pytest.fixture(autouse=True)
+def fresh_index(monkeypatch):
+    monkeypatch.setattr(pantry_index, '_state', None)
+
+
+@pytest.fixture
+def recipes(clients, ingredients, create_recipe):
+    apricots, milk, flour, salt = ingredients
+    return [
+        create_recipe(clients[0], name, dict.fromkeys(items, 1))
+        for name, items in (
+            ('Компот', (apricots, milk)),
+            ('Блины', (apricots, milk, flour)),
+            ('Соус', (milk,)),
+            ('Рассол', (salt,)),
+        )
+    ]
+
+
+def get_pantry(client, ingredients, **params):
+    response = client.get('/api/recipes/', {
+        'pantry': ','.join(str(ingredient.id) for ingredient in ingredients),
+        **params
+    })
+    assert response.status_code == 200, response.content
+    return [recipe['id'] for recipe in response.json()['results']]
+
+
+def test_pantry_matches_and_orders(clients, ingredients, recipes):
+    apricots, milk, flour, _ = ingredients
+    compote, pancakes, sauce, _ = recipes
+    assert get_pantry(clients[1], (apricots, milk)) == [sauce, compote]
+    assert get_pantry(clients[1], (apricots, milk), missing=1) == [
+        sauce, compote, pancakes
+    ]
+    assert get_pantry(clients[1], (flour,), missing=2) == [pancakes]
+    assert get_pantry(clients[1], (flour,)) == []
+
+
+@pytest.mark.parametrize('params', (
+    {'missing': '1.5'}, {'missing': '-1'}, {'missing': 'abc'},
+    {'pantry': '1.5'},
+))
+def test_pantry_rejects_invalid_params(clients, ingredients, recipes,
+                                       params):
+    response = clients[1].get(
+        '/api/recipes/', {'pantry': str(ingredients[0].id), **params}
+    )
+    assert response.status_code == 400
+
+
+def test_pantry_follows_api_edits(clients, ingredients, tags, recipes,
+                                  django_capture_on_commit_callbacks):
+    apricots, milk, flour, salt = ingredients
+    compote = recipes[0]
+    assert compote in get_pantry(clients[1], (apricots, milk))
+    with django_capture_on_commit_callbacks(execute=True):
+        response = clients[0].patch(f'/api/recipes/{compote}/', {
+            'ingredients': [{'id': salt.id, 'amount': 1}],
+            'tags': [tags[0].id],
+        }, format='json')
+    assert response.status_code == 200, response.content
+    assert compote not in get_pantry(clients[1], (apricots, milk))
+    assert compote in get_pantry(clients[1], (salt,))
+    with django_capture_on_commit_callbacks(execute=True):
+        clients[0].delete(f'/api/recipes/{recipes[3]}/')
+    assert get_pantry(clients[1], (salt,)) == [compote]
+
+
+def test_pantry_follows_orm_edits(clients, ingredients, recipes,
+                                  django_capture_on_commit_callbacks):
+    apricots, milk, flour, salt = ingredients
+    compote = recipes[0]
+    assert get_pantry(clients[1], (apricots, milk)) == [recipes[2], compote]
+    with django_capture_on_commit_callbacks(execute=True):
+        IngredientInRecipe.objects.create(
+            recipe_id=compote, ingredients=salt, amount=1
+        )
+    assert get_pantry(clients[1], (apricots, milk)) == [recipes[2]]
+    with django_capture_on_commit_callbacks(execute=True):
+        IngredientInRecipe.objects.filter(
+            recipe_id=compote, ingredients=salt
+        ).delete()
+    assert get_pantry(clients[1], (apricots, milk)) == [recipes[2], compote]
+    with django_capture_on_commit_callbacks(execute=True):
+        milk.delete()
+    assert get_pantry(clients[1], (apricots,)) == [compote]
+    assert get_pantry(clients[1], (apricots,), missing=1) == [
+        compote, recipes[1]
+    ]
@@ -0,0 +1,70 @@
+import pytest
+from django.db import connection
+
+from recipes.management.commands.check_query_plans import (
+    get_full_scans, is_unfiltered_count, iter_postgresql_scans
+)
+ORDER = 'ORDER BY "recipes_recipe"."pub_date" DESC, "recipes_recipe"."id" DESC'
+ORDERED = f'SELECT "recipes_recipe"."id" FROM "recipes_recipe" {ORDER}'
+FAVORITED = (
+    'EXISTS(SELECT (1) AS "a" FROM "recipes_favorite" U0 WHERE '
+    '(U0."recipe_id" = "recipes_recipe"."id" AND U0."user_id" = 1) LIMIT 1)'
+)
+
+
+@pytest.mark.parametrize('sql,scans', (
+    ('SELECT * FROM "recipes_recipe" WHERE "text" LIKE \'%a%\'',
+     {'recipes_recipe'}),
+    (ORDERED, {'recipes_recipe'}),
+    (f'{ORDERED} LIMIT 6 OFFSET 6', set()),
+    ('SELECT COUNT(*) AS "__count" FROM "recipes_recipe"',
+     {'recipes_recipe'}),
+    ('SELECT "id" FROM "recipes_recipe" WHERE "id" = 1', set()),
+    (f'SELECT "recipes_recipe"."id" FROM "recipes_recipe" WHERE {FAVORITED}',
+     {'recipes_recipe'}),
+    (f'SELECT "recipes_recipe"."id" FROM "recipes_recipe" WHERE {FAVORITED} '
+     f'{ORDER} LIMIT 6', {'recipes_recipe'}),
+    (f'SELECT "recipes_recipe"."id", {FAVORITED} AS "is_favorited" '
+     f'FROM "recipes_recipe" {ORDER} LIMIT 6', set()),
+))
+@pytest.mark.skipif(
+    connection.vendor != 'sqlite', reason='Разбор плана SQLite.'
+)
+def test_sqlite_full_scans(db, sql, scans):
+    with connection.cursor() as cursor:
+        assert get_full_scans(cursor, sql) == scans
+
+
+def test_only_unfiltered_counts_are_classified_separately():
+    assert is_unfiltered_count('SELECT COUNT(*) AS "__count" FROM "t"')
+    assert not is_unfiltered_count(
+        'SELECT COUNT(*) AS "__count" FROM "t" WHERE "t"."id" > 1'
+    )
+    assert not is_unfiltered_count(
+        'SELECT COUNT(*) FROM (SELECT DISTINCT "id" FROM "t" WHERE 1) q'
+    )
+    assert not is_unfiltered_count('SELECT "id" FROM "t"')
+
+
+def index_scan(relation, **conditions):
+    return {
+        'Node Type': 'Index Scan', 'Relation Name': relation, **conditions
+    }
+
+
+@pytest.mark.parametrize('plan,scans', (
+    ({'Node Type': 'Seq Scan', 'Relation Name': 'recipes_recipe'},
+     ['recipes_recipe']),
+    ({'Node Type': 'Limit', 'Plans': [index_scan('recipes_recipe')]}, []),
+    ({'Node Type': 'Limit', 'Plans': [
+        index_scan('recipes_recipe', Filter='(text ~~ \'%a%\'::text)')
+    ]}, ['recipes_recipe']),
+    ({'Node Type': 'Nested Loop', 'Plans': [
+        index_scan('recipes_favorite', **{'Index Cond': '(user_id = 1)'}),
+        index_scan('recipes_recipe', **{
+            'Index Cond': '(id = u0.recipe_id)', 'Filter': '(cooking_time > 1)'
+        }),
+    ]}, []),
+))
+def test_postgresql_full_scans(plan, scans):
+    assert list(iter_postgresql_scans(plan)) == scans
@@ -0,0 +1,52 @@
+import pytest
+
+from api.versions import RECIPES, get_versions
+from recipes.models import Recipe
+
+
+@pytest.fixture
+def recipe(clients, ingredients, tags, create_recipe):
+    return create_recipe(clients[0], 'Рецепт', {ingredients[0]: 10}, tags)
+
+
+def patch(client, recipe, data, django_capture_on_commit_callbacks):
+    with django_capture_on_commit_callbacks(execute=True):
+        response = client.patch(
+            f'/api/recipes/{recipe}/', data, format='json'
+        )
+    assert response.status_code == 200, response.content
+    return response.json()
+
+
+def test_unchanged_data_is_not_saved(
+    clients, ingredients, tags, recipe, django_capture_on_commit_callbacks
+):
+    modified = Recipe.objects.get(pk=recipe).modified
+    version = get_versions(RECIPES)
+    patch(clients[0], recipe, {
+        'tags': [tag.id for tag in tags],
+        'ingredients': [{'id': ingredients[0].id, 'amount': 10}],
+        'name': 'Рецепт',
+    }, django_capture_on_commit_callbacks)
+    assert Recipe.objects.get(pk=recipe).modified == modified
+    assert get_versions(RECIPES) == version
+
+
+def test_changed_tags_are_saved(
+    clients, ingredients, tags, recipe, django_capture_on_commit_callbacks
+):
+    modified = Recipe.objects.get(pk=recipe).modified
+    version = get_versions(RECIPES)
+    data = patch(clients[0], recipe, {
+        'tags': [tags[1].id],
+        'ingredients': [
+            {'id': ingredients[0].id, 'amount': 10},
+            {'id': ingredients[1].id, 'amount': 5},
+        ],
+    }, django_capture_on_commit_callbacks)
+    assert [tag['id'] for tag in data['tags']] == [tags[1].id]
+    assert {
+        item['id']: item['amount'] for item in data['ingredients']
+    } == {ingredients[0].id: 10, ingredients[1].id: 5}
+    assert Recipe.objects.get(pk=recipe).modified > modified
+    assert get_versions(RECIPES) != version
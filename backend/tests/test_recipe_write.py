@@ -0,0 +1,55 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from recipes.models import IngredientInRecipe, Recipe
+from tests.conftest import IMAGE
+
+
+def count_lookups(queries, table):
+    return sum(
+        f'FROM "{table}"' in query['sql'] and 'INSERT' not in query['sql']
+        for query in queries.captured_queries
+    )
+
+
+def test_references_are_resolved_in_bulk(clients, ingredients, tags,
+                                         create_recipe):
+    lookups = []
+    for amounts in (
+        {ingredients[0]: 1},
+        dict.fromkeys(ingredients, 1),
+    ):
+        with CaptureQueriesContext(connection) as queries:
+            recipe = create_recipe(clients[0], f'Рецепт {len(amounts)}',
+                                   amounts)
+        lookups.append((
+            count_lookups(queries, 'recipes_ingredient'),
+            count_lookups(queries, 'recipes_tag'),
+        ))
+    assert lookups[0] == lookups[1]
+    assert list(IngredientInRecipe.objects.filter(
+        recipe_id=recipe
+    ).order_by('id').values_list('ingredients_id', flat=True)) == [
+        ingredient.id for ingredient in ingredients
+    ]
+
+
+def test_unknown_references_are_reported_together(clients, ingredients,
+                                                  tags):
+    response = clients[0].post('/api/recipes/', {
+        'ingredients': [
+            {'id': ingredients[0].id, 'amount': 1},
+            {'id': 998, 'amount': 1},
+            {'id': 999, 'amount': 1},
+        ],
+        'tags': [tags[0].id, 997],
+        'image': IMAGE,
+        'name': 'Рецепт',
+        'text': 'Описание',
+        'cooking_time': 10,
+    }, format='json')
+    assert response.status_code == 400
+    errors = response.json()
+    assert '998, 999' in str(errors['ingredients'])
+    assert '997' in str(errors['tags'])
+    assert not Recipe.objects.exists()
@@ -0,0 +1,61 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+
+def get_ids(client, **params):
+    response = client.get('/api/recipes/', params)
+    assert response.status_code == 200, response.content
+    return {recipe['id'] for recipe in response.json()['results']}
+
+
+def test_membership_filters_use_subquery(clients, ingredients,
+                                         create_recipe):
+    recipes = [
+        create_recipe(clients[0], f'Рецепт {number}', {ingredients[0]: 1})
+        for number in range(4)
+    ]
+    client = clients[1]
+    client.post('/api/recipes/favorite/', {'recipes': recipes[:3]},
+                format='json')
+    client.post('/api/recipes/shopping_cart/', {'recipes': recipes[2:]},
+                format='json')
+    with CaptureQueriesContext(connection) as queries:
+        assert get_ids(client, is_favorited=1) == set(recipes[:3])
+    assert any(
+        'IN (SELECT' in query['sql'] and 'recipes_favorite' in query['sql']
+        for query in queries.captured_queries
+    )
+    assert get_ids(client, is_in_shopping_cart=1) == set(recipes[2:])
+    assert get_ids(
+        client, is_favorited=1, is_in_shopping_cart=1
+    ) == {recipes[2]}
+    assert get_ids(clients[2], is_favorited=1) == set()
+
+
+def test_flags_follow_snapshot(clients, ingredients, create_recipe):
+    recipe = create_recipe(clients[0], 'Рецепт', {ingredients[0]: 1})
+    clients[1].post(f'/api/recipes/{recipe}/favorite/')
+    data = clients[1].get('/api/recipes/').json()['results'][0]
+    assert data['is_favorited'] is True
+    assert data['is_in_shopping_cart'] is False
+    data = clients[2].get('/api/recipes/').json()['results'][0]
+    assert data['is_favorited'] is False
+
+
+def test_tags_filter_matches_any_tag(clients, ingredients, tags,
+                                     create_recipe):
+    breakfast, lunch = tags
+    both = create_recipe(clients[0], 'Оба', {ingredients[0]: 1}, tags)
+    only_lunch = create_recipe(clients[0], 'Обед', {ingredients[0]: 1},
+                               [lunch])
+    response = clients[1].get(
+        '/api/recipes/', {'tags': [breakfast.slug, lunch.slug]}
+    )
+    assert [recipe['id'] for recipe in response.json()['results']] == [
+        only_lunch, both
+    ]
+    assert response.json()['count'] == 2
+    assert get_ids(clients[1], tags=breakfast.slug) == {both}
+    assert clients[1].get(
+        '/api/recipes/', {'tags': 'unknown'}
+    ).status_code == 400
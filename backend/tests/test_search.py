@@ -0,0 +1,46 @@
+import pytest
+
+from recipes.models import Recipe
+
+
+@pytest.fixture
+def recipes(clients, ingredients, tags, create_recipe):
+    client = clients[0]
+    result = {}
+    for name, text, recipe_tags in (
+        ('Блины на молоке', 'Тонкие блинчики', tags[:1]),
+        ('Суп', 'Подавать с блинами и сметаной', tags[1:]),
+        ('Салат', 'Овощи', tags[:1]),
+    ):
+        pk = create_recipe(client, name, {ingredients[0]: 1}, recipe_tags)
+        client.patch(f'/api/recipes/{pk}/', {'text': text}, format='json')
+        result[name] = pk
+    return result
+
+
+def search(client, query):
+    response = client.get('/api/recipes/', {'search': query})
+    assert response.status_code == 200, response.content
+    return [recipe['id'] for recipe in response.json()['results']]
+
+
+def test_search_orders_by_relevance(clients, recipes):
+    assert search(clients[0], 'блины') == [
+        recipes['Блины на молоке'], recipes['Суп']
+    ]
+    assert search(clients[0], 'ёжик') == []
+
+
+def test_search_follows_changes(clients, recipes):
+    client = clients[0]
+    client.patch(
+        f'/api/recipes/{recipes["Салат"]}/', {'name': 'Салат с блинами'},
+        format='json'
+    )
+    assert len(search(client, 'блин')) == 3
+    client.delete(f'/api/recipes/{recipes["Блины на молоке"]}/')
+    assert len(search(client, 'блин')) == 2
+
+
+def test_search_vector_is_not_loaded(recipes):
+    assert 'search_vector' in Recipe.objects.first().get_deferred_fields()
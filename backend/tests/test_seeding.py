@@ -0,0 +1,23 @@
+from django.db.models import Sum
+
+from recipes.models import IngredientInRecipe, Recipe, ShoppingListItem
+from recipes.seeding import seed_dataset
+from recipes.services import generate_short_hash
+
+
+def test_seeded_data_is_consistent(db):
+    user_ids = seed_dataset(
+        recipes=30, users=5, favorites=2, carts=3, subscriptions=2
+    )
+    for pk, short_hash in Recipe.objects.values_list('id', 'short_hash'):
+        assert short_hash == generate_short_hash(pk)
+    for user_id in user_ids:
+        expected = dict(IngredientInRecipe.objects.filter(
+            recipe__shopping_carts__user_id=user_id
+        ).values('ingredients_id').annotate(
+            total=Sum('amount')
+        ).values_list('ingredients_id', 'total'))
+        assert expected
+        assert dict(ShoppingListItem.objects.filter(
+            shopping_list__user_id=user_id
+        ).values_list('ingredient_id', 'amount')) == expected
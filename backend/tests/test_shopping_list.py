@@ -0,0 +1,191 @@
+import json
+
+import pytest
+from django.core.management import call_command
+
+from api import services
+from recipes.models import (
+    Ingredient, IngredientInRecipe, Recipe, ShoppingCart, ShoppingList,
+    ShoppingListItem
+)
+
+
+def get_amounts(user):
+    return dict(ShoppingListItem.objects.filter(
+        shopping_list__user=user
+    ).values_list('ingredient__name', 'amount'))
+
+
+def get_version(user):
+    return ShoppingList.objects.filter(user=user).values_list(
+        'version', flat=True
+    ).first()
+
+
+@pytest.fixture
+def recipes(clients, ingredients, create_recipe):
+    apricots, milk, flour, _ = ingredients
+    return (
+        create_recipe(clients[0], 'Компот', {apricots: 10, milk: 20}),
+        create_recipe(clients[0], 'Блины', {milk: 5, flour: 7}),
+    )
+
+
+def test_cart_changes_update_totals(users, clients, recipes):
+    first, second = recipes
+    clients[1].post(f'/api/recipes/{first}/shopping_cart/')
+    clients[1].post(f'/api/recipes/{second}/shopping_cart/')
+    assert get_amounts(users[1]) == {
+        'абрикосы': 10, 'молоко': 25, 'мука': 7
+    }
+    clients[1].delete(f'/api/recipes/{first}/shopping_cart/')
+    assert get_amounts(users[1]) == {'молоко': 5, 'мука': 7}
+
+
+def test_recipe_changes_update_totals(users, clients, ingredients, recipes):
+    _, milk, flour, salt = ingredients
+    first, second = recipes
+    for client in clients[1:]:
+        client.post(f'/api/recipes/{second}/shopping_cart/')
+    clients[1].post(f'/api/recipes/{first}/shopping_cart/')
+    response = clients[0].patch(f'/api/recipes/{second}/', {
+        'ingredients': [
+            {'id': flour.id, 'amount': 1}, {'id': salt.id, 'amount': 4}
+        ],
+        'tags': [Recipe.objects.get(pk=second).tags.first().id],
+    }, format='json')
+    assert response.status_code == 200, response.content
+    assert get_amounts(users[1]) == {
+        'абрикосы': 10, 'молоко': 20, 'мука': 1, 'соль': 4
+    }
+    assert get_amounts(users[2]) == {'мука': 1, 'соль': 4}
+    assert clients[0].delete(f'/api/recipes/{second}/').status_code == 204
+    assert get_amounts(users[1]) == {'абрикосы': 10, 'молоко': 20}
+    assert get_amounts(users[2]) == {}
+
+
+def test_download_uses_totals(clients, recipes):
+    first, second = recipes
+    clients[1].post(f'/api/recipes/{first}/shopping_cart/')
+    clients[1].post(f'/api/recipes/{second}/shopping_cart/')
+    response = clients[1].get('/api/recipes/download_shopping_cart/')
+    content = b''.join(response.streaming_content).decode()
+    assert 'молоко (мл) — 25' in content
+    assert clients[1].get(
+        '/api/recipes/download_shopping_cart/',
+        HTTP_IF_NONE_MATCH=response['ETag']
+    ).status_code == 304
+
+
+@pytest.mark.parametrize('export_format,media_type', (
+    ('csv', 'text/csv'), ('ndjson', 'application/x-ndjson')
+))
+def test_download_formats(clients, recipes, export_format, media_type):
+    for recipe in recipes:
+        clients[1].post(f'/api/recipes/{recipe}/shopping_cart/')
+    response = clients[1].get(
+        '/api/recipes/download_shopping_cart/', {'format': export_format}
+    )
+    assert response.status_code == 200
+    assert response['Content-Type'].startswith(media_type)
+    assert response['Content-Disposition'] == (
+        f'attachment; filename="shopping_cart.{export_format}"'
+    )
+    lines = b''.join(response.streaming_content).decode().splitlines()
+    if export_format == 'csv':
+        assert lines == [
+            'name,measurement_unit,amount', 'абрикосы,г,10', 'молоко,мл,25',
+            'мука,г,7'
+        ]
+    else:
+        assert [json.loads(line) for line in lines] == [
+            {'name': 'абрикосы', 'measurement_unit': 'г', 'amount': 10},
+            {'name': 'молоко', 'measurement_unit': 'мл', 'amount': 25},
+            {'name': 'мука', 'measurement_unit': 'г', 'amount': 7},
+        ]
+
+
+def test_download_format_from_accept_header(clients, recipes):
+    clients[1].post(f'/api/recipes/{recipes[0]}/shopping_cart/')
+    response = clients[1].get(
+        '/api/recipes/download_shopping_cart/', HTTP_ACCEPT='text/csv'
+    )
+    assert response['Content-Type'].startswith('text/csv')
+    text = clients[1].get('/api/recipes/download_shopping_cart/')
+    assert response['ETag'] != text['ETag']
+
+
+def test_download_is_streamed_in_chunks(monkeypatch, clients, recipes):
+    monkeypatch.setattr(services, 'SHOPPING_LIST_CHUNK_SIZE', 1)
+    clients[1].post(f'/api/recipes/{recipes[1]}/shopping_cart/')
+    response = clients[1].get(
+        '/api/recipes/download_shopping_cart/', {'format': 'ndjson'}
+    )
+    assert response.streaming
+    assert len(list(response.streaming_content)) == 2
+
+
+def test_download_empty_list(clients):
+    response = clients[1].get('/api/recipes/download_shopping_cart/')
+    assert b''.join(response.streaming_content).decode() == (
+        'Ваш список покупок пуст.'
+    )
+
+
+def test_orm_changes_rebuild_totals(users, clients, ingredients, recipes,
+                                    django_capture_on_commit_callbacks):
+    apricots, milk, _, salt = ingredients
+    first, second = recipes
+    clients[1].post(f'/api/recipes/{second}/shopping_cart/')
+    version = get_version(users[1])
+    with django_capture_on_commit_callbacks(execute=True):
+        ShoppingCart.objects.create(user=users[1], recipe_id=first)
+    assert get_amounts(users[1]) == {
+        'абрикосы': 10, 'молоко': 25, 'мука': 7
+    }
+    with django_capture_on_commit_callbacks(execute=True):
+        IngredientInRecipe.objects.filter(
+            recipe_id=first, ingredients=apricots
+        ).update(amount=3)
+        IngredientInRecipe.objects.create(
+            recipe_id=first, ingredients=salt, amount=2
+        )
+    assert get_amounts(users[1]) == {
+        'абрикосы': 3, 'молоко': 25, 'мука': 7, 'соль': 2
+    }
+    with django_capture_on_commit_callbacks(execute=True):
+        Ingredient.objects.filter(pk=milk.pk).delete()
+    assert get_amounts(users[1]) == {'абрикосы': 3, 'мука': 7, 'соль': 2}
+    assert get_version(users[1]) > version
+
+
+def test_deleting_author_rebuilds_totals(users, clients, recipes,
+                                         django_capture_on_commit_callbacks):
+    for recipe in recipes:
+        clients[1].post(f'/api/recipes/{recipe}/shopping_cart/')
+    with django_capture_on_commit_callbacks(execute=True):
+        users[0].delete()
+    assert get_amounts(users[1]) == {}
+
+
+def test_rebuild_command(users, clients, recipes):
+    first, second = recipes
+    clients[1].post(f'/api/recipes/{first}/shopping_cart/')
+    clients[2].post(f'/api/recipes/{second}/shopping_cart/')
+    ShoppingListItem.objects.update(amount=1)
+    call_command('rebuild_shopping_lists', users[1].id, stdout=None)
+    assert get_amounts(users[1]) == {'абрикосы': 10, 'молоко': 20}
+    assert get_amounts(users[2]) == {'молоко': 1, 'мука': 1}
+    call_command('rebuild_shopping_lists', stdout=None)
+    assert get_amounts(users[2]) == {'молоко': 5, 'мука': 7}
+
+
+def test_rebuild_counts_shared_recipes_once(users, clients, recipes):
+    first, second = recipes
+    for client in clients:
+        client.post(f'/api/recipes/{first}/shopping_cart/')
+    clients[1].post(f'/api/recipes/{second}/shopping_cart/')
+    call_command('rebuild_shopping_lists', users[1].id, stdout=None)
+    assert get_amounts(users[1]) == {
+        'абрикосы': 10, 'молоко': 25, 'мука': 7
+    }
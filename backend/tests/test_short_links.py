@@ -0,0 +1,71 @@
+import pytest
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from recipes.constants import SHORT_CODE_LENGTH
+from recipes.models import Recipe
+from recipes.services import generate_short_hash
+from recipes.short_links import short_link_resolver
+
+
+class Rollback(Exception):
+    pass
+
+
+@pytest.fixture
+def fresh_resolver():
+    short_link_resolver._entries.clear()
+    yield short_link_resolver
+    short_link_resolver._entries.clear()
+
+
+def test_short_link_redirects(clients, ingredients, create_recipe):
+    recipe = create_recipe(clients[0], 'Рецепт', {ingredients[0]: 1})
+    link = clients[0].get(f'/api/recipes/{recipe}/get-link/').json()
+    response = clients[1].get(link['short-link'])
+    assert response.status_code == 301
+    assert response['Location'].endswith(f'/recipes/{recipe}/')
+
+
+def test_rolled_back_recipe_is_not_cached(users, fresh_resolver,
+                                          django_capture_on_commit_callbacks):
+    with pytest.raises(Rollback):
+        with django_capture_on_commit_callbacks(execute=True):
+            with transaction.atomic():
+                recipe = Recipe.objects.create(
+                    author=users[0], name='Рецепт', text='Описание',
+                    cooking_time=1, image='recipes/image.png'
+                )
+                short_hash = recipe.short_hash
+                raise Rollback
+    assert fresh_resolver.resolve(short_hash) is None
+
+
+def test_short_codes_are_distinct():
+    codes = {generate_short_hash(pk) for pk in range(1, 20001)}
+    assert len(codes) == 20000
+    assert {len(code) for code in codes} == {SHORT_CODE_LENGTH}
+
+
+@pytest.mark.parametrize('pk', (0, -1, 62 ** SHORT_CODE_LENGTH))
+def test_short_code_rejects_out_of_range_keys(pk):
+    with pytest.raises(ValueError):
+        generate_short_hash(pk)
+
+
+def test_short_code_written_on_insert(users):
+    with CaptureQueriesContext(connection) as queries:
+        recipe = Recipe.objects.create(
+            author=users[0], name='Рецепт', text='Описание',
+            cooking_time=1, image='recipes/image.png'
+        )
+    assert not any(
+        query['sql'].startswith('UPDATE') for query in queries.captured_queries
+    )
+    recipe.refresh_from_db()
+    assert recipe.short_hash == generate_short_hash(recipe.pk)
+    second = Recipe.objects.create(
+        author=users[0], name='Другой рецепт', text='Описание',
+        cooking_time=1, image='recipes/image.png'
+    )
+    assert second.pk > recipe.pk
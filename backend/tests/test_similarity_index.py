@@ -0,0 +1,77 @@
+import os
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+
+from api import views
+from recipes.similarity import read_pointer
+
+
+def test_previous_version_is_kept(settings, tmp_path, clients, ingredients,
+                                  create_recipe):
+    settings.SIMILARITY_INDEX_DIR = str(tmp_path / 'index')
+    create_recipe(clients[0], 'Рецепт', {ingredients[0]: 1})
+    versions = []
+    for _ in range(3):
+        call_command('build_similarity_index', '--full', stdout=StringIO())
+        versions.append(read_pointer(settings.SIMILARITY_INDEX_DIR))
+    assert sorted(os.listdir(settings.SIMILARITY_INDEX_DIR)) == sorted(
+        ['CURRENT', *versions[1:]]
+    )
+
+
+@pytest.fixture
+def similar_recipes(settings, tmp_path, clients, ingredients, create_recipe):
+    settings.SIMILARITY_INDEX_DIR = str(tmp_path / 'index')
+    apricots, milk, flour, salt = ingredients
+    recipes = [
+        create_recipe(clients[0], name, dict.fromkeys(items, 1))
+        for name, items in (
+            ('Основа', (apricots, milk, flour)),
+            ('Такой же', (apricots, milk, flour)),
+            ('Похожий', (apricots, milk)),
+            ('Далёкий', (apricots, salt)),
+            ('Другой', (salt,)),
+        )
+    ]
+    call_command('build_similarity_index', '--full', stdout=StringIO())
+    return recipes
+
+
+def get_similar(client, recipe, **params):
+    return client.get(f'/api/recipes/{recipe}/similar/', params)
+
+
+def test_similar_recipes_are_ranked(clients, similar_recipes):
+    base, same, close, far, _ = similar_recipes
+    response = get_similar(clients[1], base)
+    assert response.status_code == 200, response.content
+    assert [
+        (item['id'], item['similarity']) for item in response.json()
+    ] == [(same, 1.0), (close, 0.6667), (far, 0.25)]
+
+
+def test_similar_limit(monkeypatch, clients, similar_recipes):
+    base, same, close, *_ = similar_recipes
+    response = get_similar(clients[1], base, limit=2)
+    assert [item['id'] for item in response.json()] == [same, close]
+    monkeypatch.setattr(views, 'SIMILAR_RECIPES_MAX_LIMIT', 1)
+    response = get_similar(clients[1], base, limit=10)
+    assert [item['id'] for item in response.json()] == [same]
+
+
+@pytest.mark.parametrize('limit', ('0', '-5', '1.5', 'abc'))
+def test_similar_rejects_invalid_limit(clients, similar_recipes, limit):
+    response = get_similar(clients[1], similar_recipes[0], limit=limit)
+    assert response.status_code == 400
+    assert 'limit' in response.json()
+
+
+def test_recipe_missing_from_index(clients, ingredients, create_recipe,
+                                   similar_recipes):
+    recipe = create_recipe(clients[0], 'Новый', {ingredients[0]: 1})
+    response = get_similar(clients[1], recipe)
+    assert response.status_code == 200
+    assert response.json() == []
+    assert get_similar(clients[1], recipe + 1).status_code == 404
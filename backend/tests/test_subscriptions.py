@@ -0,0 +1,60 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+
+def create_recipes(client, author, ingredients, create_recipe, count):
+    return [
+        create_recipe(client, f'{author} {number}', {ingredients[0]: 1})
+        for number in range(count)
+    ]
+
+
+def get_subscriptions(client, **params):
+    response = client.get('/api/users/subscriptions/', params)
+    assert response.status_code == 200, response.content
+    return {
+        author['id']: author for author in response.json()['results']
+    }
+
+
+def test_latest_recipes_per_author(users, clients, ingredients,
+                                   create_recipe):
+    first = create_recipes(clients[0], 'a', ingredients, create_recipe, 3)
+    second = create_recipes(clients[1], 'b', ingredients, create_recipe, 1)
+    for author in users[:2]:
+        clients[2].post(f'/api/users/{author.id}/subscribe/')
+    authors = get_subscriptions(clients[2], recipes_limit=2)
+    assert [
+        recipe['id'] for recipe in authors[users[0].id]['recipes']
+    ] == [first[2], first[1]]
+    assert authors[users[0].id]['recipes_count'] == 3
+    assert [
+        recipe['id'] for recipe in authors[users[1].id]['recipes']
+    ] == second
+    assert authors[users[1].id]['recipes_count'] == 1
+    authors = get_subscriptions(clients[2])
+    assert len(authors[users[0].id]['recipes']) == 3
+
+
+def test_queries_do_not_grow_with_authors(users, clients, ingredients,
+                                          create_recipe):
+    create_recipes(clients[0], 'a', ingredients, create_recipe, 2)
+    clients[2].post(f'/api/users/{users[0].id}/subscribe/')
+    with CaptureQueriesContext(connection) as single:
+        get_subscriptions(clients[2], recipes_limit=1)
+    create_recipes(clients[1], 'b', ingredients, create_recipe, 2)
+    clients[2].post(f'/api/users/{users[1].id}/subscribe/')
+    with CaptureQueriesContext(connection) as double:
+        get_subscriptions(clients[2], recipes_limit=1)
+    assert len(double) == len(single)
+
+
+def test_subscribe_response_counts_recipes(users, clients, ingredients,
+                                           create_recipe):
+    create_recipes(clients[0], 'a', ingredients, create_recipe, 2)
+    response = clients[1].post(
+        f'/api/users/{users[0].id}/subscribe/?recipes_limit=1'
+    )
+    assert response.status_code == 201, response.content
+    assert response.json()['recipes_count'] == 2
+    assert len(response.json()['recipes']) == 1
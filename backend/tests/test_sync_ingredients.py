@@ -0,0 +1,71 @@
+import io
+import json
+
+import pytest
+from django.core.management import CommandError, call_command
+
+from recipes.management.commands.sync_ingredients import iter_json_rows
+from recipes.models import CatalogChecksum, Ingredient
+
+
+def write_catalog(path, rows):
+    path.write_text(json.dumps(rows, ensure_ascii=False), encoding='utf-8')
+    return str(path)
+
+
+def sync(path, *args):
+    output = io.StringIO()
+    call_command('sync_ingredients', path, *args, stdout=output)
+    return output.getvalue()
+
+
+@pytest.mark.parametrize('content, position', (
+    ('[1, 2]', 1),
+    ('  [{"name": "соль", "measurement_unit": "г"}, ["a", "b"]]', 46),
+))
+def test_json_items_must_be_objects(db, tmp_path, content, position):
+    path = tmp_path / 'catalog.json'
+    path.write_text(content, encoding='utf-8')
+    with pytest.raises(CommandError, match=f'позиции {position}'):
+        sync(str(path))
+
+
+def test_json_is_read_in_chunks(monkeypatch):
+    from recipes.management.commands import sync_ingredients
+    monkeypatch.setattr(sync_ingredients, 'CATALOG_READ_CHUNK_SIZE', 7)
+    data = json.dumps([
+        {'name': f'ингредиент {number}', 'measurement_unit': 'г'}
+        for number in range(100)
+    ])
+    assert len(list(iter_json_rows(io.StringIO(data)))) == 100
+    with pytest.raises(ValueError):
+        list(iter_json_rows(io.StringIO(data[:-5])))
+
+
+def test_unchanged_catalog_is_skipped_after_sync(db, tmp_path):
+    path = write_catalog(tmp_path / 'catalog.json', [
+        {'name': 'соль', 'measurement_unit': 'г'},
+    ])
+    sync(path)
+    write_catalog(tmp_path / 'catalog.json', [
+        {'name': 'соль', 'measurement_unit': 'кг'},
+    ])
+    assert 'обновлено: 1' in sync(path)
+    assert 'не изменился' in sync(path)
+    assert Ingredient.objects.get().measurement_unit == 'кг'
+
+
+def test_catalog_changes_reset_checksums(db, tmp_path):
+    first = write_catalog(tmp_path / 'first.json', [
+        {'name': 'соль', 'measurement_unit': 'г'},
+    ])
+    second = write_catalog(tmp_path / 'second.json', [
+        {'name': 'мука', 'measurement_unit': 'г'},
+    ])
+    sync(first)
+    sync(second)
+    assert list(CatalogChecksum.objects.values_list('source', flat=True)) == [
+        second
+    ]
+    Ingredient.objects.create(name='сахар', measurement_unit='г')
+    assert not CatalogChecksum.objects.exists()
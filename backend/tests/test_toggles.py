@@ -0,0 +1,96 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from api import services
+from recipes.models import Favorite, ShoppingCart, ShoppingListItem
+
+
+@pytest.fixture(params=(True, False), ids=('returning', 'fallback'))
+def returning(request, monkeypatch):
+    if request.param and not services.supports_returning():
+        pytest.skip('База не поддерживает RETURNING.')
+    monkeypatch.setattr(services, 'supports_returning', lambda: request.param)
+    return request.param
+
+
+@pytest.fixture
+def recipes(clients, ingredients, create_recipe):
+    apricots, milk, flour, _ = ingredients
+    return [
+        create_recipe(clients[0], 'Компот', {apricots: 10, milk: 20}),
+        create_recipe(clients[0], 'Блины', {milk: 5, flour: 7}),
+        create_recipe(clients[0], 'Каша', {milk: 2}),
+    ]
+
+
+def get_amounts(user):
+    return dict(ShoppingListItem.objects.filter(
+        shopping_list__user=user
+    ).values_list('ingredient__name', 'amount'))
+
+
+@pytest.mark.parametrize('model,url', (
+    (Favorite, 'favorite'), (ShoppingCart, 'shopping_cart')
+))
+def test_single_toggle(users, clients, recipes, returning, model, url):
+    client, recipe = clients[1], recipes[0]
+    with CaptureQueriesContext(connection) as queries:
+        response = client.post(f'/api/recipes/{recipe}/{url}/')
+    assert response.status_code == 201, response.content
+    assert response.json()['id'] == recipe
+    assert returning == any(
+        'RETURNING recipe_id' in query['sql']
+        for query in queries.captured_queries
+    )
+    assert client.post(f'/api/recipes/{recipe}/{url}/').status_code == 400
+    assert model.objects.filter(user=users[1], recipe_id=recipe).exists()
+    assert client.delete(f'/api/recipes/{recipe}/{url}/').status_code == 204
+    assert client.delete(f'/api/recipes/{recipe}/{url}/').status_code == 400
+    assert not model.objects.filter(user=users[1]).exists()
+    missing = recipes[-1] + 1
+    assert client.post(f'/api/recipes/{missing}/{url}/').status_code == 404
+
+
+def test_toggle_updates_relations(clients, recipes, returning):
+    client, recipe = clients[1], recipes[0]
+    assert not client.get(f'/api/recipes/{recipe}/').json()['is_favorited']
+    client.post(f'/api/recipes/{recipe}/favorite/')
+    assert client.get(f'/api/recipes/{recipe}/').json()['is_favorited']
+    client.delete(f'/api/recipes/{recipe}/favorite/')
+    assert not client.get(f'/api/recipes/{recipe}/').json()['is_favorited']
+
+
+def test_bulk_cart_toggles(users, clients, recipes, returning):
+    client = clients[1]
+    first, second, third = recipes
+    client.post(f'/api/recipes/{first}/shopping_cart/')
+    response = client.post(
+        '/api/recipes/shopping_cart/', {'recipes': recipes}, format='json'
+    )
+    assert response.status_code == 200, response.content
+    assert sorted(response.json()['added']) == [second, third]
+    assert get_amounts(users[1]) == {'абрикосы': 10, 'молоко': 27, 'мука': 7}
+    response = client.delete(
+        '/api/recipes/shopping_cart/', {'recipes': [first, second]},
+        format='json'
+    )
+    assert response.status_code == 200, response.content
+    assert sorted(response.json()['removed']) == [first, second]
+    assert get_amounts(users[1]) == {'молоко': 2}
+    response = client.delete(
+        '/api/recipes/shopping_cart/', {'recipes': [first]}, format='json'
+    )
+    assert response.json()['removed'] == []
+    assert list(ShoppingCart.objects.filter(user=users[1]).values_list(
+        'recipe_id', flat=True
+    )) == [third]
+
+
+def test_bulk_toggle_rejects_missing_recipes(clients, recipes, returning):
+    response = clients[1].post(
+        '/api/recipes/favorite/', {'recipes': [recipes[0], recipes[-1] + 1]},
+        format='json'
+    )
+    assert response.status_code == 400
+    assert not Favorite.objects.exists()
@@ -0,0 +1,108 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+from django.core.files.uploadedfile import (
+    SimpleUploadedFile, TemporaryUploadedFile
+)
+from PIL import Image
+
+from api import fields, images
+from recipes.models import Recipe
+
+
+@pytest.fixture
+def recipe_data(ingredients, tags):
+    return {
+        'ingredients': [{'id': ingredients[0].id, 'amount': 10}],
+        'tags': [tag.id for tag in tags],
+        'name': 'Рецепт',
+        'text': 'Описание',
+        'cooking_time': 10,
+    }
+
+
+def post_recipe(client, data, image):
+    return client.post('/api/recipes/', {
+        'data': json.dumps(data), 'image': image
+    }, format='multipart')
+
+
+def test_recipe_from_multipart(clients, recipe_data, image_file):
+    response = post_recipe(clients[0], recipe_data, image_file('red'))
+    assert response.status_code == 201, response.content
+    recipe = Recipe.objects.get(pk=response.json()['id'])
+    assert [tag.id for tag in recipe.tags.all()] == recipe_data['tags']
+    with Image.open(recipe.image) as image:
+        assert image.getpixel((0, 0)) == (255, 0, 0)
+
+
+def test_upload_is_spooled_to_disk(monkeypatch, clients, recipe_data,
+                                   image_file):
+    uploads = []
+    validate = fields.validate_image_header
+
+    def record_upload(file):
+        uploads.append(file)
+        validate(file)
+
+    monkeypatch.setattr(fields, 'validate_image_header', record_upload)
+    response = post_recipe(clients[0], recipe_data, image_file('red'))
+    assert response.status_code == 201, response.content
+    assert [type(file) for file in uploads] == [TemporaryUploadedFile]
+
+
+def test_avatar_from_multipart(users, clients, image_file):
+    response = clients[0].put(
+        '/api/users/me/avatar/', {'avatar': image_file('blue')},
+        format='multipart'
+    )
+    assert response.status_code == 200, response.content
+    users[0].refresh_from_db()
+    with Image.open(users[0].avatar) as image:
+        assert image.getpixel((0, 0)) == (0, 0, 255)
+
+
+def test_oversized_image_is_rejected(monkeypatch, clients, recipe_data,
+                                     image_file):
+    monkeypatch.setattr(fields, 'MAX_IMAGE_SIDE', 2)
+    response = post_recipe(
+        clients[0], recipe_data, image_file('red', size=(3, 1))
+    )
+    assert response.status_code == 400
+    assert 'image' in response.json()
+    assert not Recipe.objects.exists()
+
+
+def test_non_image_is_rejected(clients, recipe_data):
+    response = post_recipe(clients[0], recipe_data, SimpleUploadedFile(
+        'photo.png', b'not an image', 'image/png'
+    ))
+    assert response.status_code == 400
+    assert 'image' in response.json()
+
+
+@pytest.mark.parametrize('payload', ('{"name": ', '[1, 2]'))
+def test_invalid_json_part(clients, image_file, payload):
+    response = clients[0].post('/api/recipes/', {
+        'data': payload, 'image': image_file('red')
+    }, format='multipart')
+    assert response.status_code == 400
+
+
+def test_same_named_image_is_replaced(monkeypatch, clients, recipe_data,
+                                      image_file,
+                                      django_capture_on_commit_callbacks):
+    monkeypatch.setattr(images, 'derivative_executor', SimpleNamespace(
+        submit=lambda *args: None
+    ))
+    response = post_recipe(clients[0], recipe_data, image_file('red'))
+    assert response.status_code == 201, response.content
+    recipe_id = response.json()['id']
+    with django_capture_on_commit_callbacks(execute=True):
+        response = clients[0].patch(f'/api/recipes/{recipe_id}/', {
+            'data': json.dumps(recipe_data), 'image': image_file('blue')
+        }, format='multipart')
+    assert response.status_code == 200, response.content
+    with Image.open(Recipe.objects.get(pk=recipe_id).image) as image:
+        assert image.getpixel((0, 0)) == (0, 0, 255)
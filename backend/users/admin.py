@@ -93,6 +93,7 @@ class UserAdmin(BaseUserAdmin):
 @admin.register(Subscriptions)
 class SubscriptionsAdmin(admin.ModelAdmin):
     """Админка для подписок пользователей."""
+    ordering = ('author',)
     list_display = (
         'user',
         'author',
@@ -0,0 +1,23 @@
+from django.db import migrations, models
+
+from recipes.operations import AddIndexConcurrently
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('users', '0002_auto_20250611_0717'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='subscriptions',
+            options={'verbose_name': 'Подписка', 'verbose_name_plural': 'Подписки'},
+        ),
+        AddIndexConcurrently(
+            model_name='subscriptions',
+            index=models.Index(fields=['user', 'author'], name='subscription_user_author_idx'),
+        ),
+    ]
@@ -78,7 +78,6 @@ class Subscriptions(models.Model):
     )
 
     class Meta:
-        ordering = ('author',)
         verbose_name = 'Подписка'
         verbose_name_plural = 'Подписки'
         constraints = (
@@ -87,6 +86,12 @@ class Subscriptions(models.Model):
                 name='unique_author_user'
             ),
         )
+        indexes = (
+            models.Index(
+                fields=('user', 'author'),
+                name='subscription_user_author_idx'
+            ),
+        )
 
     def clean(self):
         if self.author == self.user: